@@ -0,0 +1,172 @@
+"""
+Qt models over the tournament data.
+"""
+
+from PySide import QtCore
+
+
+class StandingsModel(QtCore.QAbstractTableModel):
+    """
+    Players of the tournament in the order of the standings.
+
+    The displayed values are cached per row, refresh() reorders the rows
+    and notifies the views only about the rows that changed.
+
+    set_round() shows the standings after a closed round instead, read
+    from its snapshot (see Tournament.round_standings). set_search() shows
+    only the players matching a search (see lookup.PlayerIndex.query).
+    """
+
+    # (header, player attribute)
+    COLUMNS = (
+        ("ID", "uid"),
+        ("Name", "name"),
+        ("Faction", "faction"),
+        ("Team", "team"),
+        ("Country", "country"),
+        ("TP", "tp"),
+        ("SoS", "sos"),
+        ("CP", "cp"),
+        ("KP", "kp"),
+    )
+    # columns aligned to the right
+    NUMBERS = 5
+
+    def __init__(self, tournament, parent = None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.tournament = tournament
+        # round shown, None for the current standings
+        self.round = None
+        self.search = ""
+        self.players = []
+        self.values = []
+        self.row_of = {}
+        self._load()
+
+    def _snapshot(self):
+        snapshots = self.tournament.snapshots
+        if self.round is not None and self.round < len(snapshots):
+            return snapshots[self.round]
+        return None
+
+    def _row_values(self, p):
+        snapshot = self._snapshot()
+        values = []
+        for name, attr in self.COLUMNS:
+            if snapshot is not None and attr in snapshot.totals:
+                values.append(u"%s" % snapshot.total(attr, p))
+            else:
+                values.append(u"%s" % getattr(p, attr))
+        return tuple(values)
+
+    def _standings(self):
+        if self.round is None:
+            ordered = self.tournament.standings()
+        else:
+            ordered = self.tournament.round_standings(self.round)
+        if self.search:
+            found = set(p.uid for p in self.tournament.index.query(self.search))
+            return [p for p, key in ordered if p.uid in found]
+        return [p for p, key in ordered]
+
+    def _load(self):
+        self.players = self._standings()
+        self.values = [self._row_values(p) for p in self.players]
+        self.row_of = dict((p.uid, row) for row, p in enumerate(self.players))
+
+    def set_tournament(self, tournament):
+        self.beginResetModel()
+        self.tournament = tournament
+        self.round = None
+        self._load()
+        self.endResetModel()
+
+    def set_round(self, rnd):
+        """Show the standings after round `rnd`, None for the current ones."""
+        self.beginResetModel()
+        self.round = rnd
+        self._load()
+        self.endResetModel()
+
+    def set_search(self, text):
+        """Show only the players matching the text, all if it's empty."""
+        self.beginResetModel()
+        self.search = text
+        self._load()
+        self.endResetModel()
+
+    def refresh(self):
+        """Re-read the standings, after results or players changed."""
+        players = self._standings()
+        if len(players) != len(self.players) or \
+           any(p.uid not in self.row_of for p in players):
+            self.set_round(self.round)
+            return
+
+        if players != self.players:
+            # move the rows, keeping the selection on the same players
+            self.layoutAboutToBeChanged.emit()
+            old_players = self.players
+            old_values = self.values
+            old_row_of = self.row_of
+            self.players = players
+            self.row_of = dict((p.uid, row) for row, p in enumerate(players))
+            self.values = [old_values[old_row_of[p.uid]] for p in players]
+
+            persistent = self.persistentIndexList()
+            moved = [self.index(self.row_of[old_players[i.row()].uid], i.column())
+                     for i in persistent]
+            self.changePersistentIndexList(persistent, moved)
+            self.layoutChanged.emit()
+
+        self._update_rows(range(len(self.players)))
+
+    def player_changed(self, p):
+        """Update the row of the player, after he was edited."""
+        self._update_rows([self.row_of[p.uid]])
+
+    def _update_rows(self, rows):
+        """Re-read the values of the rows, emit dataChanged for changed runs."""
+        changed = []
+        for row in rows:
+            values = self._row_values(self.players[row])
+            if values != self.values[row]:
+                self.values[row] = values
+                changed.append(row)
+
+        last = len(self.COLUMNS) - 1
+        i = 0
+        while i < len(changed):
+            j = i
+            while j + 1 < len(changed) and changed[j + 1] == changed[j] + 1:
+                j += 1
+            self.dataChanged.emit(self.index(changed[i], 0),
+                                  self.index(changed[j], last))
+            i = j + 1
+
+    def player(self, row):
+        return self.players[row]
+
+    def rowCount(self, parent = QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.players)
+
+    def columnCount(self, parent = QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+
+    def data(self, index, role = QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == QtCore.Qt.DisplayRole:
+            return self.values[index.row()][index.column()]
+        if role == QtCore.Qt.TextAlignmentRole and index.column() >= self.NUMBERS:
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role = QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.COLUMNS[section][0]
+        return None
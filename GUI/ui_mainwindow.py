@@ -64,34 +64,15 @@ class Ui_MainWindow(object):
         self.b_addPlayer.setObjectName("b_addPlayer")
         self.gridLayout.addWidget(self.b_addPlayer, 1, 4, 1, 1)
         self.verticalLayout.addLayout(self.gridLayout)
-        self.t_players = QtGui.QTableWidget(self.tab_players)
+        self.e_search = QtGui.QLineEdit(self.tab_players)
+        self.e_search.setObjectName("e_search")
+        self.verticalLayout.addWidget(self.e_search)
+        self.t_players = QtGui.QTableView(self.tab_players)
         self.t_players.setEditTriggers(QtGui.QAbstractItemView.NoEditTriggers)
         self.t_players.setAlternatingRowColors(True)
-        self.t_players.setRowCount(5)
-        self.t_players.setColumnCount(10)
+        self.t_players.setSelectionBehavior(QtGui.QAbstractItemView.SelectRows)
+        self.t_players.setSortingEnabled(False)
         self.t_players.setObjectName("t_players")
-        self.t_players.setColumnCount(10)
-        self.t_players.setRowCount(5)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(0, item)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(1, item)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(2, item)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(3, item)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(4, item)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(5, item)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(6, item)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(7, item)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(8, item)
-        item = QtGui.QTableWidgetItem()
-        self.t_players.setHorizontalHeaderItem(9, item)
         self.t_players.horizontalHeader().setDefaultSectionSize(100)
         self.t_players.horizontalHeader().setSortIndicatorShown(False)
         self.t_players.horizontalHeader().setStretchLastSection(True)
@@ -153,6 +134,9 @@ class Ui_MainWindow(object):
         self.b_editPlayer = QtGui.QPushButton(self.tab_players)
         self.b_editPlayer.setObjectName("b_editPlayer")
         self.gridLayout_4.addWidget(self.b_editPlayer, 2, 5, 1, 1)
+        self.b_dropPlayer = QtGui.QPushButton(self.tab_players)
+        self.b_dropPlayer.setObjectName("b_dropPlayer")
+        self.gridLayout_4.addWidget(self.b_dropPlayer, 2, 6, 1, 1)
         self.verticalLayout.addLayout(self.gridLayout_4)
         self.tabWidget.addTab(self.tab_players, "")
         self.tab_pairings = QtGui.QWidget()
@@ -165,7 +149,6 @@ class Ui_MainWindow(object):
         self.label_5.setObjectName("label_5")
         self.horizontalLayout_2.addWidget(self.label_5)
         self.c_pairRound = QtGui.QComboBox(self.tab_pairings)
-        self.c_pairRound.setEnabled(False)
         self.c_pairRound.setObjectName("c_pairRound")
         self.horizontalLayout_2.addWidget(self.c_pairRound)
         spacerItem = QtGui.QSpacerItem(40, 20, QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Minimum)
@@ -202,6 +185,14 @@ class Ui_MainWindow(object):
         self.verticalLayout_4.setObjectName("verticalLayout_4")
         self.horizontalLayout_4 = QtGui.QHBoxLayout()
         self.horizontalLayout_4.setObjectName("horizontalLayout_4")
+        self.label_29 = QtGui.QLabel(self.tab_results)
+        self.label_29.setObjectName("label_29")
+        self.horizontalLayout_4.addWidget(self.label_29)
+        self.s_resultRound = QtGui.QSpinBox(self.tab_results)
+        self.s_resultRound.setMinimum(1)
+        self.s_resultRound.setMaximum(1)
+        self.s_resultRound.setObjectName("s_resultRound")
+        self.horizontalLayout_4.addWidget(self.s_resultRound)
         self.label_6 = QtGui.QLabel(self.tab_results)
         self.label_6.setObjectName("label_6")
         self.horizontalLayout_4.addWidget(self.label_6)
@@ -397,9 +388,14 @@ class Ui_MainWindow(object):
         self.actionLoad_tournament_state.setObjectName("actionLoad_tournament_state")
         self.actionLoad_Players = QtGui.QAction(MainWindow)
         self.actionLoad_Players.setObjectName("actionLoad_Players")
+        self.actionResult_server = QtGui.QAction(MainWindow)
+        self.actionResult_server.setCheckable(True)
+        self.actionResult_server.setObjectName("actionResult_server")
         self.menuFile.addAction(self.actionSave_tournament_state)
         self.menuFile.addAction(self.actionLoad_tournament_state)
         self.menuFile.addAction(self.actionLoad_Players)
+        self.menuFile.addSeparator()
+        self.menuFile.addAction(self.actionResult_server)
         self.menubar.addAction(self.menuFile.menuAction())
 
         self.retranslateUi(MainWindow)
@@ -415,12 +411,15 @@ class Ui_MainWindow(object):
         MainWindow.setTabOrder(self.c_faction_2, self.e_team_2)
         MainWindow.setTabOrder(self.e_team_2, self.e_country_2)
         MainWindow.setTabOrder(self.e_country_2, self.b_editPlayer)
-        MainWindow.setTabOrder(self.b_editPlayer, self.tabWidget)
-        MainWindow.setTabOrder(self.tabWidget, self.t_players)
+        MainWindow.setTabOrder(self.b_editPlayer, self.b_dropPlayer)
+        MainWindow.setTabOrder(self.b_dropPlayer, self.tabWidget)
+        MainWindow.setTabOrder(self.tabWidget, self.e_search)
+        MainWindow.setTabOrder(self.e_search, self.t_players)
         MainWindow.setTabOrder(self.t_players, self.c_pairRound)
         MainWindow.setTabOrder(self.c_pairRound, self.b_startNextRound)
         MainWindow.setTabOrder(self.b_startNextRound, self.t_pairings)
-        MainWindow.setTabOrder(self.t_pairings, self.e_tblnum)
+        MainWindow.setTabOrder(self.t_pairings, self.s_resultRound)
+        MainWindow.setTabOrder(self.s_resultRound, self.e_tblnum)
         MainWindow.setTabOrder(self.e_tblnum, self.e_pAuid)
         MainWindow.setTabOrder(self.e_pAuid, self.e_pAname)
         MainWindow.setTabOrder(self.e_pAname, self.c_pAfaction)
@@ -453,16 +452,6 @@ class Ui_MainWindow(object):
         self.label.setText(QtGui.QApplication.translate("MainWindow", "Name", None, QtGui.QApplication.UnicodeUTF8))
         self.label_4.setText(QtGui.QApplication.translate("MainWindow", "Country", None, QtGui.QApplication.UnicodeUTF8))
         self.b_addPlayer.setText(QtGui.QApplication.translate("MainWindow", "Add", None, QtGui.QApplication.UnicodeUTF8))
-        self.t_players.setSortingEnabled(False)
-        self.t_players.horizontalHeaderItem(0).setText(QtGui.QApplication.translate("MainWindow", "ID", None, QtGui.QApplication.UnicodeUTF8))
-        self.t_players.horizontalHeaderItem(1).setText(QtGui.QApplication.translate("MainWindow", "Name", None, QtGui.QApplication.UnicodeUTF8))
-        self.t_players.horizontalHeaderItem(2).setText(QtGui.QApplication.translate("MainWindow", "Faction", None, QtGui.QApplication.UnicodeUTF8))
-        self.t_players.horizontalHeaderItem(3).setText(QtGui.QApplication.translate("MainWindow", "Team", None, QtGui.QApplication.UnicodeUTF8))
-        self.t_players.horizontalHeaderItem(4).setText(QtGui.QApplication.translate("MainWindow", "Country", None, QtGui.QApplication.UnicodeUTF8))
-        self.t_players.horizontalHeaderItem(5).setText(QtGui.QApplication.translate("MainWindow", "TP", None, QtGui.QApplication.UnicodeUTF8))
-        self.t_players.horizontalHeaderItem(6).setText(QtGui.QApplication.translate("MainWindow", "SoS", None, QtGui.QApplication.UnicodeUTF8))
-        self.t_players.horizontalHeaderItem(7).setText(QtGui.QApplication.translate("MainWindow", "CP", None, QtGui.QApplication.UnicodeUTF8))
-        self.t_players.horizontalHeaderItem(8).setText(QtGui.QApplication.translate("MainWindow", "KP", None, QtGui.QApplication.UnicodeUTF8))
         self.label_19.setText(QtGui.QApplication.translate("MainWindow", "Edit Player", None, QtGui.QApplication.UnicodeUTF8))
         self.label_21.setText(QtGui.QApplication.translate("MainWindow", "Name", None, QtGui.QApplication.UnicodeUTF8))
         self.label_20.setText(QtGui.QApplication.translate("MainWindow", "ID", None, QtGui.QApplication.UnicodeUTF8))
@@ -481,15 +470,18 @@ class Ui_MainWindow(object):
         self.c_faction_2.setItemText(9, QtGui.QApplication.translate("MainWindow", "Legion", None, QtGui.QApplication.UnicodeUTF8))
         self.c_faction_2.setItemText(10, QtGui.QApplication.translate("MainWindow", "Minions", None, QtGui.QApplication.UnicodeUTF8))
         self.b_editPlayer.setText(QtGui.QApplication.translate("MainWindow", "Save", None, QtGui.QApplication.UnicodeUTF8))
+        self.b_dropPlayer.setText(QtGui.QApplication.translate("MainWindow", "Drop", None, QtGui.QApplication.UnicodeUTF8))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.tab_players), QtGui.QApplication.translate("MainWindow", "Players", None, QtGui.QApplication.UnicodeUTF8))
-        self.label_5.setText(QtGui.QApplication.translate("MainWindow", "Show pairings for round:", None, QtGui.QApplication.UnicodeUTF8))
+        self.label_5.setText(QtGui.QApplication.translate("MainWindow", "Show round:", None, QtGui.QApplication.UnicodeUTF8))
         self.b_startNextRound.setText(QtGui.QApplication.translate("MainWindow", "Start next round", None, QtGui.QApplication.UnicodeUTF8))
         self.t_pairings.horizontalHeaderItem(0).setText(QtGui.QApplication.translate("MainWindow", "Table #", None, QtGui.QApplication.UnicodeUTF8))
         self.t_pairings.horizontalHeaderItem(1).setText(QtGui.QApplication.translate("MainWindow", "Player A", None, QtGui.QApplication.UnicodeUTF8))
         self.t_pairings.horizontalHeaderItem(2).setText(QtGui.QApplication.translate("MainWindow", "Player B", None, QtGui.QApplication.UnicodeUTF8))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.tab_pairings), QtGui.QApplication.translate("MainWindow", "Pairings", None, QtGui.QApplication.UnicodeUTF8))
+        self.label_29.setText(QtGui.QApplication.translate("MainWindow", "Round:", None, QtGui.QApplication.UnicodeUTF8))
         self.label_6.setText(QtGui.QApplication.translate("MainWindow", "Table number:", None, QtGui.QApplication.UnicodeUTF8))
         self.e_tblnum.setInputMask(QtGui.QApplication.translate("MainWindow", "009; ", None, QtGui.QApplication.UnicodeUTF8))
+        self.e_search.setPlaceholderText(QtGui.QApplication.translate("MainWindow", "Search: name, team:..., faction:..., country:...", None, QtGui.QApplication.UnicodeUTF8))
         self.e_tblnum.setPlaceholderText(QtGui.QApplication.translate("MainWindow", "___", None, QtGui.QApplication.UnicodeUTF8))
         self.e_pAcp.setInputMask(QtGui.QApplication.translate("MainWindow", "9; ", None, QtGui.QApplication.UnicodeUTF8))
         self.e_pAcp.setPlaceholderText(QtGui.QApplication.translate("MainWindow", "_", None, QtGui.QApplication.UnicodeUTF8))
@@ -546,4 +538,5 @@ class Ui_MainWindow(object):
         self.actionSave_tournament_state.setText(QtGui.QApplication.translate("MainWindow", "Save tournament state", None, QtGui.QApplication.UnicodeUTF8))
         self.actionLoad_tournament_state.setText(QtGui.QApplication.translate("MainWindow", "Load tournament state", None, QtGui.QApplication.UnicodeUTF8))
         self.actionLoad_Players.setText(QtGui.QApplication.translate("MainWindow", "Load Players", None, QtGui.QApplication.UnicodeUTF8))
+        self.actionResult_server.setText(QtGui.QApplication.translate("MainWindow", "Result server", None, QtGui.QApplication.UnicodeUTF8))
 
@@ -0,0 +1,62 @@
+"""
+Work done outside of the GUI thread.
+"""
+
+import time
+
+from PySide import QtCore
+
+from controller import PairingCancelled
+
+
+class Task(QtCore.QThread):
+    """
+    Runs function(progress) in its own thread.
+
+    progress(step, done, total) emits the progress signal (at most every
+    `interval` seconds, and on every new step), and raises PairingCancelled
+    once cancel() was called. When the thread finishes, .result holds the
+    return value, or .error the exception raised.
+    """
+
+    progress = QtCore.Signal(str, int, int)
+
+    def __init__(self, function, parent = None, interval = 0.1):
+        QtCore.QThread.__init__(self, parent)
+        self.function = function
+        self.interval = interval
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self._step = None
+        self._reported = 0
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report(self, step, done = 0, total = 0):
+        if self.cancelled:
+            raise PairingCancelled("Cancelled")
+        now = time.time()
+        if step != self._step or now - self._reported >= self.interval:
+            self._step = step
+            self._reported = now
+            self.progress.emit(step, done, total)
+
+    def run(self):
+        try:
+            self.result = self.function(self.report)
+        except Exception as e:
+            self.error = e
+
+
+class Relay(QtCore.QObject):
+    """
+    Passes (round, table) of results recorded in other threads (see
+    result_server.ResultDesk.listeners) to the GUI thread.
+    """
+
+    result_recorded = QtCore.Signal(int, int)
+
+    def __call__(self, rnd, table):
+        self.result_recorded.emit(rnd, table)
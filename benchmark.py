@@ -0,0 +1,172 @@
+"""
+Benchmark of the pairing engines on synthetic tournaments.
+
+For every field size and pairing engine a tournament is played (see
+synthetic), and each round reports:
+    time       - seconds spent in create_pairings
+    standings  - of that, seconds spent ordering the players
+    tables     - of that, seconds spent assigning the tables
+    memory     - peak memory of the process in MB
+    rematches, same_team, repeat_tables - quality of the pairings
+
+Every case runs in a fresh process, so the peak memory belongs to it.
+Results can be saved as JSON and compared to a previous run:
+
+    python benchmark.py --sizes 16 256 4096 --save before.json
+    python benchmark.py --sizes 16 256 4096 --compare before.json
+"""
+
+import sys
+import json
+import argparse
+import platform
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import instrumentation
+import pairing
+import synthetic
+from controller import Tournament
+
+DEFAULT_SIZES = (16, 64, 256, 1024)
+
+
+def peak_memory():
+    """Peak memory of the process in MB, None if unknown."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on Mac OS, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return rss / 1024.0 / 1024
+    return rss / 1024.0
+
+
+def run_case(size, engine, rounds, seed):
+    """Play the tournament, returns list of per-round dicts."""
+    t = Tournament(synthetic.FieldGenerator().players(size, seed), size / 2,
+                   pairing_engine = engine, seed = seed)
+    games = synthetic.ResultGenerator(seed)
+    t.instrumentation = instrumentation.Instrumentation()
+
+    stats = []
+    for rnd in range(rounds):
+        t.create_pairings()
+        report = t.instrumentation.reports[-1]
+        timings = report["timings"]
+        counters = report["counters"]
+        stats.append({"round": rnd + 1, "time": report["total"],
+                      "standings": timings.get("ordering", 0) + timings.get("grouping", 0),
+                      "tables": timings.get("tables", 0),
+                      "memory": peak_memory(),
+                      "rematches": counters.get("rematches", 0),
+                      "same_team": counters.get("same_team", 0),
+                      "repeat_tables": counters.get("repeat_tables", 0),
+                      "fallbacks": counters.get("fallbacks", 0)})
+        games.play_round(t)
+    return stats
+
+
+def _run_case(args):
+    return run_case(*args)
+
+
+def run(sizes, engines, rounds, seed):
+    """{"engine/size": per-round stats}, each case in its own process."""
+    results = {}
+    for size in sizes:
+        for engine in engines:
+            pool = multiprocessing.Pool(1)
+            try:
+                stats = pool.apply(_run_case, ((size, engine, rounds, seed),))
+            finally:
+                pool.close()
+                pool.join()
+            results["%s/%d" % (engine, size)] = stats
+            report_case(engine, size, stats)
+    return results
+
+
+def summary(stats):
+    return {"time": sum(r["time"] for r in stats),
+            "max_time": max(r["time"] for r in stats),
+            "memory": stats[-1]["memory"],
+            "rematches": sum(r["rematches"] for r in stats),
+            "same_team": sum(r["same_team"] for r in stats),
+            "repeat_tables": sum(r["repeat_tables"] for r in stats),
+            "fallbacks": sum(r.get("fallbacks", 0) for r in stats)}
+
+
+def report_case(engine, size, stats):
+    print "%s, %d players" % (engine, size)
+    print "  round     time standings   tables  memory rematch team repeat fallback"
+    for r in stats:
+        print "  %5d %8.3f %9.3f %8.3f %7s %7d %4d %6d %8d" % (r["round"],
+            r["time"], r["standings"], r["tables"],
+            "%.1f" % r["memory"] if r["memory"] is not None else "-",
+            r["rematches"], r["same_team"], r["repeat_tables"], r["fallbacks"])
+    sys.stdout.flush()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the changes against the baseline, returns number of regressions:
+    total time over `tolerance` times the baseline, or worse pairings.
+    """
+    regressions = 0
+    print "case                 time (base)         rematch team repeat"
+    for case in sorted(results):
+        if case not in baseline:
+            continue
+        new = summary(results[case])
+        old = summary(baseline[case])
+        flags = []
+        if new["time"] > old["time"] * tolerance:
+            flags.append("slower")
+        for key in ("rematches", "same_team", "repeat_tables"):
+            if new[key] > old[key]:
+                flags.append(key)
+        regressions += bool(flags)
+        print "%-20s %7.3f (%7.3f) %+7d %+4d %+6d %s" % (case, new["time"],
+            old["time"], new["rematches"] - old["rematches"],
+            new["same_team"] - old["same_team"],
+            new["repeat_tables"] - old["repeat_tables"], " ".join(flags))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Benchmark the pairing engines.")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = DEFAULT_SIZES)
+    parser.add_argument("--engines", nargs = "+", default = sorted(pairing.PAIRING_ENGINES),
+                        choices = sorted(pairing.PAIRING_ENGINES))
+    parser.add_argument("--rounds", type = int, default = 6)
+    parser.add_argument("--seed", type = int, default = 1)
+    parser.add_argument("--save", help = "write the results to a JSON file")
+    parser.add_argument("--compare", help = "JSON file of a previous run")
+    parser.add_argument("--tolerance", type = float, default = 1.2,
+                        help = "allowed slowdown against the compared run")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.engines, args.rounds, args.seed)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(),
+                       "machine": platform.machine(),
+                       "rounds": args.rounds, "seed": args.seed,
+                       "results": results}, f, indent = 1, sort_keys = True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
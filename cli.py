@@ -0,0 +1,314 @@
+"""
+Command line interface, running the tournament without the GUI.
+
+The tournament is kept in the same files as in the GUI (save.sqlite and
+save.journal by default, see journal.Journal), so each command continues
+where the previous one ended:
+
+    python cli.py import players_list.csv
+    python cli.py next-round
+    python cli.py results round1.csv
+    python cli.py amend 1 4 20 3 75 0 0 40 --reason "swapped scores"
+    python cli.py drop 17
+    python cli.py register "Late Comer" Cryx --team Brno
+    python cli.py standings
+    python cli.py export standings.csv
+
+Team events (teams of 3 by the team of the players) pair the rounds and
+print the team standings by
+
+    python cli.py team-round 3
+    python cli.py team-standings 3
+
+Result files are semicolon separated rows
+    table;tp_a;cp_a;kp_a;tp_b;cp_b;kp_b[;faction_a;faction_b]
+with players A and B in the order of the pairings. Factions default to the
+first faction of the player.
+"""
+
+import sys
+import csv
+import argparse
+
+import teams
+import csv_worker
+import journal
+from controller import Player, TournamentException
+
+
+def _out(line = u""):
+    sys.stdout.write((u"%s\n" % line).encode("utf-8"))
+
+
+def _err(line):
+    sys.stderr.write((u"%s\n" % line).encode("utf-8"))
+
+
+def cmd_import(t, args):
+    t.clear()
+    errors = []
+    summary = t.add_players(Player(uid = uid, **p) for uid, p in
+        enumerate(csv_worker.iter_players(args.file, args.encoding, errors), 1))
+    for line_no, message in errors:
+        _err(u"line %s: %s" % (line_no, message))
+    _out(u"%(added)s players, %(tables)s tables" % summary)
+
+
+def cmd_next_round(t, args):
+    if len(t.active_players) < 3:
+        raise TournamentException("At least 3 active players are required to start a round")
+    missing = missing_results(t)
+    if missing:
+        raise TournamentException("Results for tables %r are not filled" % missing)
+
+    t.create_pairings()
+    print_pairings(t, t.current_round)
+
+
+def cmd_results(t, args):
+    if t.current_round < 0:
+        raise TournamentException("No round started")
+
+    errors = []
+    recorded = 0
+    pairings = t.pairings[-1]
+    with open(args.file, "rb") as f:
+        reader = csv.reader(f, delimiter = ';')
+        for row in reader:
+            line_no = reader.line_num
+            row = [field.strip() for field in row]
+            if not any(row):
+                continue
+            try:
+                table = int(row[0])
+                scores = [int(field) for field in row[1:7]]
+            except (ValueError, IndexError):
+                errors.append((line_no, "Expected table and 6 numbers"))
+                continue
+            if table not in pairings:
+                errors.append((line_no, "No game on table %s" % table))
+                continue
+
+            pA, pB = pairings[table]
+            factionA = row[7].decode("utf-8") if len(row) > 7 and row[7] else pA.factions[0]
+            factionB = row[8].decode("utf-8") if len(row) > 8 and row[8] else pB.factions[0]
+            t.record_result(table, tuple(scores[:3]) + (factionA,),
+                            tuple(scores[3:]) + (factionB,))
+            recorded += 1
+
+    for line_no, message in errors:
+        _err(u"line %s: %s" % (line_no, message))
+    missing = missing_results(t)
+    _out(u"%s results recorded, %s tables missing" % (recorded, len(missing)))
+
+
+def cmd_amend(t, args):
+    rnd = args.round - 1
+    if not 0 <= rnd <= t.current_round:
+        raise TournamentException("No round %s" % args.round)
+    if args.table not in t.pairings[rnd]:
+        raise TournamentException("No game on table %s in round %s" % (args.table, args.round))
+
+    # factions default to those already recorded
+    pA, pB = t.pairings[rnd][args.table]
+    factionA = args.faction_a or (pB.result(rnd)[3] if pB.has_result(rnd) else pA.factions[0])
+    factionB = args.faction_b or (pA.result(rnd)[3] if pA.has_result(rnd) else pB.factions[0])
+    differ = t.amend_result(rnd, args.table,
+                            tuple(args.scores[:3]) + (factionA,),
+                            tuple(args.scores[3:]) + (factionB,), args.reason,
+                            args.check)
+    _out(u"Round %s table %s amended" % (args.round, args.table))
+    if differ:
+        _out(u"Pairings of rounds %s would have been different" %
+             u", ".join(u"%s" % (r + 1) for r in differ))
+
+
+def _player(t, uid):
+    if uid not in t.players:
+        raise TournamentException("No player with ID %s" % uid)
+    return t.players[uid]
+
+
+def cmd_drop(t, args):
+    p = _player(t, args.uid)
+    t.drop_player(p)
+    _out(u"%s dropped, %s players active" % (p.name, len(t.active_players)))
+
+
+def cmd_reenter(t, args):
+    p = _player(t, args.uid)
+    t.reenter_player(p)
+    _out(u"%s re-entered, %s players active" % (p.name, len(t.active_players)))
+
+
+def cmd_register(t, args):
+    uid = max([int(uid) for uid in t.players if uid.isdigit()] or [0]) + 1
+    p = Player(args.name, args.factions, args.team, args.country, uid = uid)
+    t.add_player(p)
+    _out(u"%s registered with ID %s" % (p.name, p.uid))
+
+
+def cmd_standings(t, args):
+    rnd = t.current_round if args.round is None else args.round - 1
+    if args.round is not None and not 0 <= rnd <= t.current_round:
+        raise TournamentException("No round %s" % (rnd + 1))
+    rows = standings_rows(t, rnd)
+    if args.top:
+        rows = rows[:args.top]
+    for row in rows:
+        _out(u"\t".join(u"%s" % value for value in row))
+
+
+def cmd_pairings(t, args):
+    rnd = t.current_round if args.round is None else args.round - 1
+    if not 0 <= rnd <= t.current_round:
+        raise TournamentException("No round %s" % (rnd + 1))
+    print_pairings(t, rnd)
+
+
+def cmd_team_round(t, args):
+    missing = missing_results(t)
+    if missing:
+        raise TournamentException("Results for tables %r are not filled" % missing)
+
+    matches, bye = teams.TeamTournament(t, args.size).create_pairings()
+    for block, (teamA, teamB) in sorted(matches.items()):
+        first = block * args.size + 1
+        _out(u"Tables %s-%s\t%s\t%s" % (first, first + args.size - 1,
+                                         teamA.name, teamB.name))
+    if bye is not None:
+        _out(u"Bye\t%s" % bye.name)
+    print_pairings(t, t.current_round)
+
+
+def cmd_team_standings(t, args):
+    for rank, (team, key) in enumerate(teams.TeamTournament(t, args.size).standings(), 1):
+        _out(u"\t".join(u"%s" % value for value in (rank, team.name) + key))
+
+
+def cmd_export(t, args):
+    with open(args.file, "wb") as f:
+        writer = csv.writer(f, delimiter = ';')
+        writer.writerow(["rank", "uid", "name", "factions", "team", "country"]
+                        + list(t.tiebreakers))
+        for row in standings_rows(t):
+            writer.writerow([(u"%s" % value).encode("utf-8") for value in row])
+
+
+def missing_results(t):
+    """Tables of the current round without a result."""
+    rnd = t.current_round
+    if rnd < 0:
+        return []
+    return sorted(table for table, (pA, pB) in t.pairings[rnd].items()
+                  if not (pA.has_result(rnd) and pB.has_result(rnd)))
+
+
+def standings_rows(t, rnd = None):
+    """Standings after the round `rnd`, the current ones by default."""
+    if rnd is None:
+        ordered = t.standings()
+    else:
+        ordered = t.round_standings(rnd)
+    rows = []
+    for rank, (p, key) in enumerate(ordered, 1):
+        rows.append([rank, p.uid, p.name, p.faction, p.team, p.country] + list(key))
+    return rows
+
+
+def print_pairings(t, rnd):
+    _out(u"Round %s" % (rnd + 1))
+    pairs = t.pairings[rnd]
+    for table in sorted(pairs):
+        pA, pB = pairs[table]
+        _out(u"%s\t%s %s\t%s %s" % (table, pA.uid, pA.name, pB.uid, pB.name))
+    bye = t.byes[rnd]
+    if bye is not None:
+        _out(u"Bye\t%s %s" % (bye.uid, bye.name))
+
+
+def parser():
+    parser = argparse.ArgumentParser(description = "Run the tournament without the GUI.")
+    parser.add_argument("--state", default = "save",
+                        help = "tournament files, without the extension (default: save)")
+    commands = parser.add_subparsers()
+    text = lambda s: s.decode("utf-8")
+
+    p = commands.add_parser("import", help = "replace the players by the CSV roster")
+    p.add_argument("file")
+    p.add_argument("--encoding", default = "utf-8")
+    p.set_defaults(command = cmd_import)
+
+    p = commands.add_parser("next-round", help = "pair the next round")
+    p.set_defaults(command = cmd_next_round)
+
+    p = commands.add_parser("results", help = "record results of the current round")
+    p.add_argument("file")
+    p.set_defaults(command = cmd_results)
+
+    p = commands.add_parser("amend", help = "correct a result of any round")
+    p.add_argument("round", type = int, help = "1-based")
+    p.add_argument("table", type = int)
+    p.add_argument("scores", type = int, nargs = 6, metavar = "N",
+                   help = "tp_a cp_a kp_a tp_b cp_b kp_b")
+    p.add_argument("--faction-a", type = text)
+    p.add_argument("--faction-b", type = text)
+    p.add_argument("--reason", default = "", type = text)
+    p.add_argument("--check", action = "store_true",
+                   help = "tell which later pairings would have been different (slow)")
+    p.set_defaults(command = cmd_amend)
+
+    p = commands.add_parser("drop", help = "stop pairing a player")
+    p.add_argument("uid")
+    p.set_defaults(command = cmd_drop)
+
+    p = commands.add_parser("reenter", help = "pair a dropped player again")
+    p.add_argument("uid")
+    p.set_defaults(command = cmd_reenter)
+
+    p = commands.add_parser("register", help = "add a player, also during the tournament")
+    p.add_argument("name", type = text)
+    p.add_argument("factions", type = text, help = "comma separated")
+    p.add_argument("--team", default = u"", type = text)
+    p.add_argument("--country", default = u"", type = text)
+    p.set_defaults(command = cmd_register)
+
+    p = commands.add_parser("standings", help = "print the standings")
+    p.add_argument("--top", type = int)
+    p.add_argument("--round", type = int, help = "standings after the round, 1-based")
+    p.set_defaults(command = cmd_standings)
+
+    p = commands.add_parser("pairings", help = "print pairings of a round")
+    p.add_argument("--round", type = int, help = "1-based, current round by default")
+    p.set_defaults(command = cmd_pairings)
+
+    p = commands.add_parser("team-round", help = "pair the next round of a team event")
+    p.add_argument("size", type = int, help = "players in a team")
+    p.set_defaults(command = cmd_team_round)
+
+    p = commands.add_parser("team-standings", help = "print the team standings")
+    p.add_argument("size", type = int, help = "players in a team")
+    p.set_defaults(command = cmd_team_standings)
+
+    p = commands.add_parser("export", help = "write the standings to a CSV file")
+    p.add_argument("file")
+    p.set_defaults(command = cmd_export)
+
+    return parser
+
+
+def main(argv = None):
+    args = parser().parse_args(argv)
+    j = journal.Journal(args.state)
+    try:
+        args.command(j.open(), args)
+    except TournamentException as e:
+        _err(u"error: %s" % e)
+        return 1
+    finally:
+        j.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
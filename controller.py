@@ -1,7 +1,17 @@
 import uuid
+import bisect
 import pprint
 import random
 import copy
+import time
+import hashlib
+
+import instrumentation
+import lookup
+import pairing
+import results
+import standings
+import tables
 
 class TournamentException(Exception):
     pass
@@ -9,11 +19,36 @@ class TournamentException(Exception):
 class PlayerUidCollision(TournamentException):
     pass
 
+class NotEnoughTables(TournamentException):
+    pass
+
+class UnknownByePolicy(TournamentException):
+    pass
+
+class PairingCancelled(TournamentException):
+    pass
+
+class UnknownRound(TournamentException):
+    pass
+
+class UnknownTable(TournamentException):
+    pass
+
+def _no_progress(step, done, total):
+    pass
+
 def debug(s):
     pprint.pprint(s)
     print ""
 
 class Player(object):
+    """
+    Player's results live in the tournament's ResultStore, the player is
+    just a view of his row in it.
+    """
+    __slots__ = ("uid", "name", "factions", "team", "country", "is_playing",
+                 "index", "_store")
+    
     def __init__(self, name, factions, team = "", country = "", uid = None):
         self.uid = str(uid)
         if uid is None:
@@ -26,12 +61,9 @@ class Player(object):
         self.team = team
         self.country  = country
         
-        self._tp = []
-        self._cp = []
-        self._kp = [] #Enemy Models Destroyed
-        self.opponents_played = []
-        self.tables_played = []
-        self.factions_played = []
+        # set by ResultStore.add_player
+        self.index = None
+        self._store = None
         
         self.is_playing = True
     
@@ -39,22 +71,59 @@ class Player(object):
     def faction(self):
         return ", ".join(self.factions)
     
+    def _total(self, name):
+        if self._store is None:
+            return 0
+        return getattr(self._store, name)[self.index]
+    
     @property
     def tp(self):
-        return sum(self._tp)
+        return self._total("tp")
         
     @property
     def cp(self):
-        return sum(self._cp)
+        return self._total("cp")
     
     @property
     def kp(self):
-        return sum(self._kp)
+        #Enemy Models Destroyed
+        return self._total("kp")
     
     @property
     def sos(self):
         #Strength of schedule is sum of TPs gained by player's opponents.
-        return sum([p.tp for p in self.opponents_played if p is not None])
+        return self._total("sos")
+    
+    def _column(self, name):
+        if self._store is None:
+            return []
+        i = self.index
+        return [columns[name][i] for columns in self._store.rounds]
+    
+    @property
+    def opponents_played(self):
+        """Opponent of each round, None for bye."""
+        return [self._store.players[j] if j >= 0 else None
+                for j in self._column("opponent")]
+    
+    @property
+    def tables_played(self):
+        return [t or None for t in self._column("table")]
+    
+    @property
+    def factions_played(self):
+        """Faction the opponent used in each round."""
+        return [self._store.faction_name(f) for f in self._column("faction")]
+    
+    def has_result(self, rnd):
+        return self._store is not None and self._store.reported(rnd, self.index)
+    
+    def result(self, rnd):
+        """(tp, cp, kp, faction the opponent used) of the round."""
+        columns = self._store.rounds[rnd]
+        i = self.index
+        return (columns["tp"][i], columns["cp"][i], columns["kp"][i],
+                self._store.faction_name(columns["faction"][i]))
     
     def __str__(self):
         return "(%s) %s - %s" % (self.uid, self.name, self.faction)
@@ -63,195 +132,652 @@ class Player(object):
         return pprint.pformat("(%s) %s" % (self.uid, self.name))
 
 class Tournament(object):
-    def __init__(self, players = None, tables = 0, saved_state = None, points = 50):
-        self.players = {}
-        if players is not None:
-            for player in players:
-                self.add_player(player)
-                
-        self.tables = tables
+    def __init__(self, players = None, tables = None, saved_state = None, points = 50,
+                 pairing_engine = "blossom", seed = None, bye_policy = "random",
+                 tiebreakers = standings.DEFAULT_TIEBREAKERS, h2h = False,
+                 late_join = (0, 0, 0)):
+        # every change of the state is appended to the journal, if set
+        # (see journal.Journal)
+        self.journal = None
+        # timing of the round generation, see instrumentation.Instrumentation
+        self.instrumentation = instrumentation.NULL
         
+        self.players = {}
+        self.results = results.ResultStore()
+        self.penalties = pairing.PenaltyIndex()
+        # players by name, team, faction and country, see lookup.PlayerIndex
+        self.index = lookup.PlayerIndex()
+        # players still playing in order of registration, and their indexes
+        self._active = []
+        self._active_indexes = []
+        # round in which each player (by index) registered, -1 before the
+        # first one
+        self.joined = []
+        # (tp, cp, kp) for each round missed by a late registered player
+        self.late_join = tuple(late_join)
         self.pairings = []
         self.byes = []
         self.current_round = -1
+        # half the number of players, unless set explicitly, see _joined
+        self.tables = 0
+        if players is not None:
+            self.add_players(players)
+        if tables is not None:
+            self.tables = tables
+        
         self.points = points
+        self.pairing_engine = pairing_engine
+        # player uid -> table the player always plays on
+        self.fixed_tables = {}
+        # number of repeated tables in each round
+        self.table_repeats = []
+        # number of tables in each round
+        self.round_tables = []
+        # tables of a match in each round, 1 but in team rounds (see
+        # start_round)
+        self.round_blocks = []
+        # round -> name of the team with bye, see award
+        self.team_byes = {}
+        # standings.Snapshot after each closed round
+        self.snapshots = []
+        # corrections of the results, see amend_result
+        self.amendments = []
+        # see _select_bye
+        self.bye_policy = bye_policy
+        # player uid -> number of byes
+        self.bye_counts = {}
+        # see standings.order
+        self.tiebreakers = tiebreakers
+        self.h2h = h2h
+        
+        # all the randomness of round N comes from Random(_round_seed(N))
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng = random.Random(self._round_seed(0))
+    
+    def _round_seed(self, rnd):
+        return int(hashlib.sha1("%s:%d" % (self.seed, rnd)).hexdigest()[:16], 16)
     
-    def add_player(self, p):
+    def _log(self, op, **data):
+        if self.journal is not None:
+            self.journal.append(op, **data)
+    
+    @staticmethod
+    def _player_data(p):
+        return {"uid": p.uid, "name": p.name, "factions": p.factions,
+                "team": p.team, "country": p.country}
+    
+    def add_player(self, p, late_join = None):
+        """
+        Register the player. Once the tournament started, he gets `late_join`
+        (tp, cp, kp), self.late_join by default, for each round he missed,
+        including the current one.
+        """
         if p.uid not in self.players:
             self.players[p.uid] = p
+            self.results.add_player(p)
+            self.penalties.add_players([p])
+            self.index.add_players([p])
+            late_join = self._joined([p], late_join)
+            self._log("add_player", player = self._player_data(p),
+                      late_join = late_join)
         else:
             raise PlayerUidCollision("Player with UID %s already in tourenamnet" % p.uid)
     
+    def add_players(self, players, late_join = None):
+        """
+        Register many players at once. Late registered players get
+        `late_join`, see add_player.
+        
+        All the UIDs are checked first, so on collision no player is added.
+        Returns summary dict with number of added players, and total number
+        of players and tables.
+        """
+        players = list(players)
+        uids = set()
+        for p in players:
+            if p.uid in self.players or p.uid in uids:
+                raise PlayerUidCollision("Player with UID %s already in tourenamnet" % p.uid)
+            uids.add(p.uid)
+        
+        for p in players:
+            self.players[p.uid] = p
+        self.results.add_players(players)
+        self.penalties.add_players(players)
+        self.index.add_players(players)
+        late_join = self._joined(players, late_join)
+        self._log("add_players", players = [self._player_data(p) for p in players],
+                  late_join = late_join)
+        
+        return {"added": len(players), "players": len(self.players),
+                "tables": self.tables}
+    
+    def edit_player(self, p, name, factions, team, country):
+        p.name = name
+        p.factions = factions
+        p.team = team
+        p.country = country
+        self.penalties.update_player(p)
+        self.index.update_player(p)
+        self._log("edit_player", player = self._player_data(p))
+    
+    def _joined(self, players, late_join):
+        """
+        Add the new players to the active ones, credit them late_join for
+        the missed rounds, and make sure there are tables for everybody
+        (a table count set higher is kept). Returns late_join used.
+        """
+        self.tables = max(self.tables, len(self.players) / 2)
+        # their indexes follow all the others
+        for p in players:
+            self.joined.append(self.current_round)
+            if p.is_playing:
+                self._active.append(p)
+                self._active_indexes.append(p.index)
+        
+        if late_join is None:
+            late_join = self.late_join
+        tp, cp, kp = late_join
+        for rnd in range(self.current_round + 1):
+            for p in players:
+                self.results.set_result(rnd, p.index, tp, cp, kp)
+        return late_join
+    
+    def award(self, players, tp, cp, kp, team = None):
+        """
+        Give the players, not paired in the current round, the result of
+        the round without playing it (e.g. the members of a team with bye,
+        see teams.TeamTournament). The `team` is recorded as the team with
+        bye of the round.
+        """
+        for p in players:
+            self.results.set_result(self.current_round, p.index, tp, cp, kp)
+        if team is not None:
+            self.team_byes[self.current_round] = team
+        self._log("award", uids = [p.uid for p in players], tp = tp, cp = cp,
+                  kp = kp, team = team)
+    
+    def _set_playing(self, p, playing):
+        if p.is_playing == playing:
+            return False
+        p.is_playing = playing
+        i = bisect.bisect_left(self._active_indexes, p.index)
+        if playing:
+            self._active_indexes.insert(i, p.index)
+            self._active.insert(i, p)
+        else:
+            del self._active_indexes[i]
+            del self._active[i]
+        return True
+    
+    def drop_player(self, p):
+        """The player won't be paired in the following rounds."""
+        if self._set_playing(p, False):
+            self._log("drop_player", uid = p.uid)
+    
+    def reenter_player(self, p):
+        """
+        The dropped player is paired again from the next round, keeping
+        his results. The rounds he missed count as not played.
+        """
+        if self._set_playing(p, True):
+            self._log("reenter_player", uid = p.uid)
+    
+    def set_fixed_table(self, p, table):
+        """
+        The player always plays on the `table` from the next round, None
+        releases him (see _assign_tables).
+        """
+        if table is None:
+            self.fixed_tables.pop(p.uid, None)
+        else:
+            self.fixed_tables[p.uid] = table
+        self._log("fixed_tables", tables = self.fixed_tables)
+    
     def clear(self):
         self.players = {}
+        self.results = results.ResultStore()
+        self.penalties = pairing.PenaltyIndex()
+        self.index = lookup.PlayerIndex()
+        self.tables = 0
+        self._active = []
+        self._active_indexes = []
+        self.joined = []
         self.pairings = []
         self.byes = []
+        self.bye_counts = {}
+        self.table_repeats = []
+        self.round_tables = []
+        self.round_blocks = []
+        self.team_byes = {}
+        self.snapshots = []
+        self.amendments = []
         self.current_round = -1
+        self._log("clear")
     
     @property
     def active_players(self):
-        return [p for p in self.players.values() if p.is_playing]
+        """
+        Players still playing, in order of registration (to keep the
+        pairings reproducible). The list is maintained by drop_player,
+        reenter_player and the registration, don't change it.
+        """
+        return self._active
+    
+    def standings(self, players = None, rng = None):
+        """
+        Players (all registered by default) ordered by self.tiebreakers,
+        as list of (player, tie-breaker values) - see standings.order.
+        """
+        if players is None:
+            players = self.results.players
+        return standings.order(self.results, players, self.tiebreakers,
+                               self.h2h, rng)
+    
+    def round_standings(self, rnd):
+        """
+        Standings after the round `rnd` (0-based), like standings(). Those
+        of the closed rounds are read from their snapshot, the current round
+        is still open, so its standings are the current ones.
+        """
+        if rnd < len(self.snapshots):
+            return self.snapshots[rnd].rows(self.results.players)
+        return self.standings()
+    
+    def _close_round(self):
+        """Take the snapshot of the standings after the current round."""
+        while len(self.snapshots) <= self.current_round:
+            self.snapshots.append(standings.Snapshot(self.results, self.standings()))
     
     def _ordered_players(self, return_grouped = True):
         """
-        Splits players into groups according to TP.
-        Then sorts each group according to strength of schedule->cp->enemy_destroyed
-        and returns the list of lists.
+        Splits players into score groups by the first tie-breaker (TP by
+        default). Then sorts each group according to the other tie-breakers
+        (by default strength of schedule->cp->enemy_destroyed) and returns
+        the list of lists. Without tie-breakers all players are one group.
         
         Strength of schedule is sum of TPs gained by player's opponents.
+        Players equal in all of these are ordered randomly.
         """
         
         #first round
         if self.current_round == -1:
-            o = self.active_players
-            random.shuffle(o)
+            with self.instrumentation.timer("ordering"):
+                o = list(self.active_players)
+                self.rng.shuffle(o)
             return ([o], 1)
         
         #other rounds
         
         #sort by score in descending order
-        scored_list = [(p.tp, p.sos, p.cp, p.kp, p) for p in self.active_players]
-        scored_list.sort(reverse = True)
-        ordered_list = [line[-1] for line in scored_list]
+        with self.instrumentation.timer("ordering"):
+            ordered = self.standings(self.active_players, self.rng)
         
         if return_grouped is False:
-            return ordered_list
+            return [p for p, key in ordered]
         
         #divide into groups
-        o = []
-        last_tp = None
-        for p in ordered_list:
-            # when the TP changes, create a new group
-            if last_tp != p.tp:
-                last_tp = p.tp
-                o.append([])
-            o[-1].append(p)
+        with self.instrumentation.timer("grouping"):
+            o = []
+            last_score = None
+            for p, key in ordered:
+                # when the score changes, create a new group
+                if not o or last_score != key[:1]:
+                    last_score = key[:1]
+                    o.append([])
+                o[-1].append(p)
         
         return (o, len(o))
    
     
-    def create_pairings(self):
+    def create_pairings(self, progress = None):
         """
         Take the ordered grouped list of players and create pairings.
         
-        = For each group = 
-        If the group has odd number of players
-            If the group is the last one: randomly select a bye
-            Else: add the top player from next group to this group
-    
-        = For each group =
-        Take the first player and rate the opponents:
+        If there is odd number of players, select a bye (see _select_bye).
+        
+        The groups are then paired by the engine selected by
+        self.pairing_engine (see pairing.PAIRING_ENGINES). Both engines rate
+        the possible opponents by pairing.PenaltyIndex, which basically
+        represents a bit-mask, which (when sorted in an ascending orders)
+        should mitigate "boring" matchups:
             Opponent which he already played against -> +1000 points
             Opponent from the same team -> +100 points
             Opponent has faction the player already played -> +10 points
             Opponent has the same faction -> +1 point
-            
-        Then pick the player with lowest score. The score basically represents
-        a bit-mask, which (when sorted in an ascending orders) should mitigate
-        "boring" matchups.
         
-        Remove the two players from the group (creating pairing), and store them.
+        "greedy" takes the first player of each group and pairs him with
+        the lowest rated opponent, "blossom" finds the pairings with the
+        lowest total rating for the whole round.
+        
+        All random choices use self.rng, seeded from self.seed and the round
+        number, so the round can be regenerated by replay_round().
+        
+        Time spent in each step is reported to self.instrumentation.
+        
+        `progress` is called as progress(step, done, total) during the
+        search for the pairings (done and total are 0 when unknown). It
+        may raise an exception (e.g. PairingCancelled) to stop it, the
+        tournament stays unchanged then.
         """
+        instr = self.instrumentation
+        instr.begin_round(self.current_round + 1, engine = self.pairing_engine,
+                          players = len(self.active_players))
+        try:
+            pairs, bye = self._create_pairings(instr, progress or _no_progress)
+        except Exception as e:
+            instr.end_round(error = "%s: %s" % (type(e).__name__, e))
+            raise
+        instr.end_round()
+        return pairs, bye
+    
+    def _create_pairings(self, instr, progress):
+        progress("ordering", 0, 0)
+        self.rng = random.Random(self._round_seed(self.current_round + 1))
         groups, gcount = self._ordered_players()
+        instr.count("score_groups", gcount)
 
         bye = None
-        pairs = []
-        for i, group in enumerate(groups):
-            if len(group) % 2: # odd number of players
-                if i+1 == gcount: #last group
-                    # select bye from the group and remove him
-                    bye_index = random.randint(0, len(group) - 1)
-                    
-                    if len(self.byes) == len(self.players):
-                        self.byes = []
-                    while group[bye_index] in self.byes:
-                        bye_index = random.randint(0, len(group) - 1)  
-                    bye = group.pop(bye_index)
-                    
-                else:
-                    # move the first from next group to the end of this one
-                    group.append(groups[i+1].pop(0))
-            
-            while len(group):
-                pA = group.pop(0)
-                rated_pBs = []
-                for j, pB in enumerate(group):
-                    score = 0
-                    if pB in pA.opponents_played:
-                        score += 1000
-                    if pB.team and pA.team:
-                        if pB.team == pA.team:
-                            score += 100
-                    if set(pA.factions_played).intersection(set(pB.factions)):
-                        score += 10
-                    if set(pA.factions).intersection(pB.factions):
-                        score += 1
-                    rated_pBs.append((score, j, pB.name))
-                
-                rated_pBs.sort()
-                pB = group.pop(rated_pBs[0][1])
-                pairs.append([pA, pB])
-        
-        
-        pairs = self._assign_tables(pairs)
+        if sum(len(group) for group in groups) % 2:
+            with instr.timer("bye"):
+                bye = self._select_bye(groups)
+                groups = [group for group in groups if group]
+        
+        engine = pairing.PAIRING_ENGINES[self.pairing_engine](progress = progress)
+        with instr.timer("pairing"):
+            pairs = engine.pair(groups, self.penalties)
+        
+        if instr.enabled:
+            for name, n in engine.counters.items():
+                instr.count(name, n)
+            for pA, pB in pairs:
+                penalty = self.penalties.penalty(pA.index, pB.index)
+                instr.count("rematches", penalty >= pairing.REMATCH)
+                instr.count("same_team", penalty % pairing.REMATCH >= pairing.SAME_TEAM)
+        
+        with instr.timer("tables"):
+            pairs = self._assign_tables(pairs, progress)
+        instr.count("repeat_tables", self.table_repeats[-1])
+        
+        with instr.timer("start_round"):
+            self._start_round(pairs, bye)
+        
+        return pairs, bye
+    
+    def _select_bye(self, groups):
+        """
+        Select the bye according to self.bye_policy, and remove him from
+        his group.
+        
+        Only players with the fewest byes (normally those who did not have
+        a bye yet) are eligible, so there always is one.
+            "lowest" - the lowest ranked eligible player
+            "random" - random eligible player from the lowest group that
+                       has any
+            "fewest" - random eligible player regardless of the score
+        """
+        counts = self.bye_counts
+        fewest = min(counts.get(p.uid, 0) for group in groups for p in group)
+        
+        if self.bye_policy == "fewest":
+            candidates = [p for group in groups for p in group
+                          if counts.get(p.uid, 0) == fewest]
+        elif self.bye_policy in ("lowest", "random"):
+            for group in reversed(groups):
+                candidates = [p for p in group if counts.get(p.uid, 0) == fewest]
+                if candidates:
+                    break
+            if self.bye_policy == "lowest":
+                candidates = candidates[-1:]
+        else:
+            raise UnknownByePolicy(self.bye_policy)
+        
+        bye = self.rng.choice(candidates)
+        for group in groups:
+            if bye in group:
+                group.remove(bye)
+                break
+        return bye
+    
+    def start_round(self, pairs, bye = None, block = 1, progress = None):
+        """
+        Start the next round with pairings made elsewhere (e.g. by
+        teams.TeamTournament): `pairs` is a list of [pA, pB], `bye` the
+        player with bye or None.
+        
+        Tables are assigned like in create_pairings, including the fixed
+        tables. With `block` > 1, each `block` consecutive pairs are a match
+        playing on a block of consecutive tables, see tables.assign_blocks.
+        
+        Returns the pairings, {table: (pA, pB)}.
+        """
+        pairs = self._assign_tables(pairs, progress, block)
+        self._start_round(pairs, bye, block)
+        return pairs
+    
+    def _start_round(self, pairs, bye, block = 1):
+        """
+        Store the pairings ({table: (pA, pB)}), bye and tables of a match
+        (see start_round) of the new round.
+        
+        The previous round is closed by it, see round_standings().
+        """
+        self._close_round()
+        rnd = self.results.add_round()
+        for table in sorted(pairs):
+            pA, pB = pairs[table]
+            self.results.add_game(rnd, pA.index, pB.index, table)
+            self.penalties.add_game(pA, pB)
         
         self.current_round += 1
         self.pairings.append(pairs)
         self.byes.append(bye)
+        self.round_tables.append(self.tables)
+        self.round_blocks.append(block)
         
         #FIXME: masters 2013 hardcoded
         if bye is not None:
-            bye._tp.append(1)
-            bye._cp.append(3)
-            bye._kp.append(self.points/2)
-            bye.opponents_played.append(None)
-            bye.tables_played.append(None)
+            self.bye_counts[bye.uid] = self.bye_counts.get(bye.uid, 0) + 1
+            self.results.add_bye(rnd, bye.index, 1, 3, self.points/2)
         
-        return pairs, bye
-                
+        self._log("start_round", tables = self.tables, block = block,
+                  table_repeats = self.table_repeats[-1], bye = bye and bye.uid,
+                  pairs = [(table, pA.uid, pB.uid) for table, (pA, pB) in pairs.items()])
+    
+    def replay_round(self, rnd):
+        """
+        Regenerate pairings of the round `rnd` (0-based) from the seed, and
+        the pairings and results recorded in the previous rounds.
+        
+        The round is generated in a fresh copy of the tournament, with the
+        number of tables the round had (the current one for the next
+        round), so the returned (pairs, bye) refer to copies of the players.
+        """
+        t = Tournament(points = self.points,
+                       pairing_engine = self.pairing_engine, seed = self.seed,
+                       bye_policy = self.bye_policy,
+                       tiebreakers = self.tiebreakers, h2h = self.h2h,
+                       late_join = self.late_join)
+        t.fixed_tables = dict(self.fixed_tables)
+        for p in self.results.players:
+            t.add_player(Player(p.name, list(p.factions), p.team, p.country, uid = p.uid))
+        
+        for r in range(rnd):
+            pairs = {}
+            games = {}
+            for table, (pA, pB) in self.pairings[r].items():
+                pairs[table] = (t.players[pA.uid], t.players[pB.uid])
+                games[table] = (pA.result(r)[:3] + pB.result(r)[3:],
+                                pB.result(r)[:3] + pA.result(r)[3:])
+            bye = self.byes[r]
+            credits = dict((t.results.players[i], result) for i, result in
+                           self.results.credited(r).items())
+            t.tables = self.round_tables[r]
+            t._restore_round(pairs, bye and t.players[bye.uid],
+                             self.table_repeats[r], games, credits,
+                             self.round_blocks[r])
+        
+        # only those who played the round, late registered players were not
+        # there yet, dropped ones not anymore
+        if rnd <= self.current_round:
+            state = self.results.rounds[rnd]["state"]
+            playing = [state[p.index] != results.NOT_PAIRED for p in self.results.players]
+        else:
+            playing = [p.is_playing for p in self.results.players]
+        for q, flag in zip(t.results.players, playing):
+            t._set_playing(q, flag)
+        
+        if rnd < len(self.round_tables):
+            t.tables = self.round_tables[rnd]
+        else:
+            t.tables = self.tables
+        return t.create_pairings()
+    
+    def _restore_round(self, pairs, bye, table_repeats, games, credits = {},
+                       block = 1):
+        """
+        Store an already generated round: pairs ({table: (pA, pB)}), bye,
+        results ({table: (result_a, result_b)}, see record_result) of the
+        reported games, {player: (tp, cp, kp)} credited to those who
+        did not play (see late_join) and tables of a match (see start_round).
+        """
+        self.table_repeats.append(table_repeats)
+        self._start_round(pairs, bye, block)
+        for table, (result_a, result_b) in games.items():
+            self.record_result(table, result_a, result_b)
+        for p, (tp, cp, kp) in credits.items():
+            self.results.set_result(self.current_round, p.index, tp, cp, kp)
+    
+    def verify_round(self, rnd):
+        """
+        Check that replay_round() gives the same pairings and bye as those
+        recorded for round `rnd`.
+        """
+        def uids(pairs, bye):
+            tables = sorted((t, pA.uid, pB.uid) for t, (pA, pB) in pairs.items())
+            return tables, bye and bye.uid
+        
+        replayed = uids(*self.replay_round(rnd))
+        return replayed == uids(self.pairings[rnd], self.byes[rnd])
+    
+    def record_result(self, table, result_a, result_b):
+        """
+        Store the result of the game on `table` in the current round.
+        
+        Results are (tp, cp, kp, faction) tuples for both players of the
+        pairing, faction being the one the player used in the game. If the
+        result was already filled, it gets overwritten.
+        """
+        self._set_result(self.current_round, table, result_a, result_b)
+        self._log("record_result", table = table, result_a = result_a,
+                  result_b = result_b)
+    
+    def _set_result(self, rnd, table, result_a, result_b):
+        pA, pB = self.pairings[rnd][table]
+        tpA, cpA, kpA, factionA = result_a
+        tpB, cpB, kpB, factionB = result_b
+        
+        edit = pA.has_result(rnd)
+        self.results.set_result(rnd, pA.index, tpA, cpA, kpA, factionB)
+        self.results.set_result(rnd, pB.index, tpB, cpB, kpB, factionA)
+        if edit:
+            self.penalties.update_player(pA)
+            self.penalties.update_player(pB)
+        else:
+            self.penalties.add_faced(pA, factionB)
+            self.penalties.add_faced(pB, factionA)
+    
+    def amend_result(self, rnd, table, result_a, result_b, reason = "",
+                     report = False):
+        """
+        Correct the result of the game on `table` in the round `rnd`
+        (0-based, any round played so far), results as in record_result().
+        
+        Only what the game counts into is updated: totals of both players
+        and SoS of their opponents (see ResultStore.set_result), and the
+        same in the snapshots of the rounds closed since (see
+        standings.Snapshot.amend). The correction is added to
+        self.amendments, with the `reason`.
+        
+        With `report`, returns the later rounds whose pairings would have
+        been different with the corrected result (see verify_round), []
+        otherwise - replaying the rounds is much slower than the correction.
+        """
+        if not 0 <= rnd <= self.current_round:
+            raise UnknownRound("No round %s" % (rnd + 1))
+        if table not in self.pairings[rnd]:
+            raise UnknownTable("No table %s in round %s" % (table, rnd + 1))
+        
+        amendment = self._amend(rnd, table, tuple(result_a), tuple(result_b),
+                                reason, time.time())
+        self._log("amend_result", round = rnd, table = table,
+                  result_a = result_a, result_b = result_b, reason = reason,
+                  time = amendment["time"])
+        
+        if not report:
+            return []
+        return [r for r in range(rnd + 1, self.current_round + 1)
+                if not self.verify_round(r)]
+    
+    def _amend(self, rnd, table, result_a, result_b, reason, when):
+        pA, pB = self.pairings[rnd][table]
+        previous = None
+        if pA.has_result(rnd):
+            previous = (pA.result(rnd)[:3] + pB.result(rnd)[3:],
+                        pB.result(rnd)[:3] + pA.result(rnd)[3:])
+        before = (pA.result(rnd)[:3], pB.result(rnd)[:3])
+        
+        self._set_result(rnd, table, result_a, result_b)
+        
+        # the standings after the rounds closed since
+        deltas = {}
+        for p, old in zip((pA, pB), before):
+            deltas[p.index] = tuple(new - value for new, value in
+                                    zip(p.result(rnd)[:3], old))
+        for r in range(rnd, len(self.snapshots)):
+            self.snapshots[r].amend(self.results.rounds[:r + 1], deltas,
+                                    self.tiebreakers, self.h2h)
+        
+        amendment = {"round": rnd, "table": table, "previous": previous,
+                     "result_a": result_a, "result_b": result_b,
+                     "reason": reason, "time": when}
+        self.amendments.append(amendment)
+        return amendment
+
 
-    def _assign_tables(self, pairs):
+    def _assign_tables(self, pairs, progress = None, block = 1):
         """
         Take the pairings, and assign table numbers.
         
-        The priority is, that Player A should not not play on a table he already
-        played on. Then if it's possible, Player B should also play on a table
-        he has not yet played on.
+        The priority is, that players should not play on a table they
+        already played on. Players listed in self.fixed_tables always get
+        their table (accessibility, streaming, ...).
         
-        Create a set of table numbers based on the number of tables.
-            If removing tables Player A played on yields non-empty set:
-                remove tPa from tables
-                If removing tables Player B played on yields non-empty set:
-                    remove tpB from tables
-            elif removing tables Player B played on yields non-empty set:
-                remove tpB from tables
-            
-            randomly choose a table from available tables
-                    
+        All the pairs are assigned at once, as a minimum-cost assignment of
+        pairs to tables (see tables.assign_tables), or of matches of `block`
+        pairs to blocks of tables (see tables.assign_blocks). Number of
+        players that got a table they already played on is stored in
+        self.table_repeats.
         """
+        if len(pairs) > self.tables / block * block:
+            raise NotEnoughTables("%d tables for %d pairs" % (self.tables, len(pairs)))
         
-        table_to_pair = {}
+        if progress is not None:
+            table_progress = lambda done, total: progress("tables", done, total)
+        else:
+            table_progress = None
+        if block > 1:
+            assigned, repeats = tables.assign_blocks(pairs, block, self.tables,
+                                                     self.fixed_tables, table_progress)
+        else:
+            assigned, repeats = tables.assign_tables(pairs, self.tables,
+                                                     self.fixed_tables, table_progress)
+        self.table_repeats.append(repeats)
         
-        tables = set(range(1, self.tables + 1)) #so we number the tables from 1
-        for pA, pB in pairs:
-            t = tables.copy()
-            tA = set(pA.tables_played)
-            tB = set(pB.tables_played)
-            
-            if t - tA:
-                t = t - tA
-                if t - tB:
-                    t = t - tB
-            elif t - tB:
-                    t = t - tB
-            
-            selected_table = random.choice(list(t))
-            tables -= set([selected_table])
+        table_to_pair = {}
+        for (pA, pB), selected_table in zip(pairs, assigned):
             table_to_pair[selected_table] = (pA, pB)
-            pA.tables_played.append(selected_table)
-            pB.tables_played.append(selected_table)
-            pA.opponents_played.append(pB)
-            pB.opponents_played.append(pA)
         
         return table_to_pair
                             
@@ -2,16 +2,82 @@ import csv
 
 HEADER = ['name','factions','team', 'country']
 
-def read_players(fname = "players_list.csv"):
-    d_file = open(fname, "rb")
+FACTIONS = ["Cygnar", "Cryx", "Khador", "Menoth", "Retribution", "Mercs",
+            "Trollbloods", "Skorne", "Circle", "Legion", "Minions"]
+
+# other names of the factions used in registrations
+FACTION_ALIASES = {
+    "Protectorate": "Menoth",
+    "Protectorate of Menoth": "Menoth",
+    "Retribution of Scyrah": "Retribution",
+    "Mercenaries": "Mercs",
+    "Circle Orboros": "Circle",
+    "Legion of Everblight": "Legion",
+}
+
+def iter_players(fname = "players_list.csv", encoding = "utf-8", errors = None,
+                 factions = FACTIONS):
+    """
+    Read the players from the CSV file one by one, without loading the whole
+    file.
     
-    reader = csv.DictReader(d_file, HEADER, delimiter = ';', restval = '')
+    Yields dicts with HEADER keys, 'factions' being a list of known faction
+    names ([u""] if the field is empty). Rows without a name, with unknown
+    factions or repeating the same name and team are skipped, and (line
+    number, message) is appended to the `errors` list (if given) for each
+    of them.
+    """
+    def error(line_no, message):
+        if errors is not None:
+            errors.append((line_no, message))
     
-    data = []
-    for line in reader:
-        data.append(line)
+    known = dict((f.lower(), f) for f in factions)
+    for alias, f in FACTION_ALIASES.items():
+        known.setdefault(alias.lower(), f)
     
-    return data
+    seen = set()
+    d_file = open(fname, "rb")
+    try:
+        reader = csv.reader(d_file, delimiter = ';')
+        for row in reader:
+            line_no = reader.line_num
+            if not any(field.strip() for field in row):
+                continue
+            
+            try:
+                row = [field.decode(encoding).strip() for field in row]
+            except UnicodeDecodeError:
+                error(line_no, "Not a valid %s text" % encoding)
+                continue
+            if line_no == 1:
+                row[0] = row[0].lstrip(u"\ufeff") # BOM
+            
+            line = dict(zip(HEADER, row + [u""] * (len(HEADER) - len(row))))
+            if not line['name']:
+                error(line_no, "Name is missing")
+                continue
+            
+            # empty factions are allowed, the player may not know yet
+            names = [f.strip() for f in line['factions'].split(',') if f.strip()]
+            unknown = [f for f in names if f.lower() not in known]
+            if unknown:
+                error(line_no, "Unknown faction %s" % unknown[0])
+                continue
+            # factions[0] is the default faction of the results
+            line['factions'] = [known[f.lower()] for f in names] or [u""]
+            
+            key = (line['name'].lower(), line['team'].lower())
+            if key in seen:
+                error(line_no, "Duplicate player %s (%s)" % (line['name'], line['team']))
+                continue
+            seen.add(key)
+            
+            yield line
+    finally:
+        d_file.close()
+
+def read_players(fname = "players_list.csv"):
+    return list(iter_players(fname))
 
 def write_dummy_data(fname = "players_list.csv"):
     data = [
@@ -31,6 +97,9 @@ def write_dummy_data(fname = "players_list.csv"):
 if __name__ == "__main__":
 
     #write_dummy_data()
-    for line in read_players_list():
+    errors = []
+    for line in iter_players(errors = errors):
         print line
+    for line_no, message in errors:
+        print "line %s: %s" % (line_no, message)
     
@@ -1,10 +1,14 @@
-import sys, os
+import sys, os, socket
 from PySide import QtCore, QtGui
 
-import cPickle as pickle
+import journal
+import csv_worker
+import result_server
 
 from GUI import ui_mainwindow as ui_mw
-from controller import Player, Tournament
+from GUI import models
+from GUI import workers
+from controller import Player, PairingCancelled, TournamentException
 
 class PMainWindow(QtGui.QMainWindow):
     def __init__(self, parent=None):
@@ -14,9 +18,27 @@ class PMainWindow(QtGui.QMainWindow):
         self.ui.setupUi(self)
         
         self.changes_to_save = False
-        
-        self.tournament = Tournament()
-        self.ui.t_players.setRowCount(0)
+        # running workers.Task by name
+        self.tasks = {}
+        # reads of the tournament waiting for desk.lock by name, see
+        # __read_tournament
+        self.deferred = {}
+        
+        # the tournament is kept in save.sqlite and save.journal, and
+        # restored on start
+        self.journal = journal.Journal("save", compact_every = 0)
+        self.tournament = self.journal.open()
+        
+        # results come also from the stations over the network, see
+        # result_server, the tournament is changed under desk.lock
+        self.desk = result_server.ResultDesk(self.tournament)
+        self.relay = workers.Relay(self)
+        self.relay.result_recorded.connect(self.__result_recorded)
+        self.desk.listeners.append(self.relay)
+        self.result_server = None
+        
+        self.standings_model = models.StandingsModel(self.tournament, self)
+        self.ui.t_players.setModel(self.standings_model)
         self.ui.t_pairings.setRowCount(0)
         
         #Set edit box sizes
@@ -30,22 +52,108 @@ class PMainWindow(QtGui.QMainWindow):
         self.ui.e_pBcp.setFixedSize(metrics.width("8888"), self.ui.e_pBcp.height())
         self.ui.e_pAkp.setFixedSize(metrics.width("888888"), self.ui.e_pAkp.height())
         self.ui.e_pBkp.setFixedSize(metrics.width("888888"), self.ui.e_pBkp.height())
+        
+        self.__show_tournament()
 
     def closeEvent(self, event):
+        for task in self.tasks.values():
+            task.cancel()
+            task.wait()
+        
+        if self.result_server is not None:
+            result_server.stop(self.result_server)
+        
         if self.changes_to_save:
             if self.yes_no_dialog("Unsaved changes", "There are unsaved changes. Do you want to save the tournament state before exitting?"):
-                self.on_actionSave_tournament_state_triggered(True)
+                self.journal.compact()
         
+        self.journal.close()
         event.accept()
 
     def __guiclear(self):
-        self.ui.t_players.clearContents()
-        self.ui.t_players.setRowCount(0)
+        self.desk.set_tournament(self.tournament)
+        self.standings_model.set_tournament(self.tournament)
         self.ui.t_pairings.clearContents()
         self.ui.t_pairings.setRowCount(0)
         self.ui.c_pairRound.clear()
+        self.ui.s_resultRound.setMaximum(1)
         self.ui.b_addPlayer.setEnabled(True)
 
+    def __start_task(self, name, function, on_success, widgets, cancel_button = None):
+        """
+        Run function(progress) in a worker thread (see workers.Task), and
+        on_success(result) in this one when it's done.
+        
+        The widgets are disabled until then, cancel_button (if any) stays
+        enabled and cancels the task instead.
+        """
+        enabled = [(w, w.isEnabled()) for w in widgets]
+        for w in widgets:
+            w.setEnabled(False)
+        if cancel_button is not None:
+            button_text = cancel_button.text()
+            cancel_button.setText("Cancel")
+        
+        task = workers.Task(function, self)
+        task.progress.connect(self.__task_progress)
+        
+        def finished():
+            del self.tasks[name]
+            for w, state in enabled:
+                w.setEnabled(state)
+            if cancel_button is not None:
+                cancel_button.setText(button_text)
+            self.__run_deferred()
+            
+            if isinstance(task.error, PairingCancelled):
+                self.ui.statusbar.showMessage("Cancelled")
+            elif task.error is not None:
+                self.ui.statusbar.clearMessage()
+                QtGui.QMessageBox.critical(self, "Error", "%s" % task.error)
+            else:
+                on_success(task.result)
+        task.finished.connect(finished)
+        
+        self.tasks[name] = task
+        task.start()
+    
+    def __read_tournament(self, name, function):
+        """
+        Run function() under desk.lock, if it's free. A task may hold the
+        lock for the whole pairing, so the GUI thread never waits for it:
+        function() is deferred until the tasks are done, or tried again
+        shortly when no task runs (a result station holds the lock). Only
+        the last deferred function of each name is kept.
+        """
+        if self.desk.lock.acquire(False):
+            try:
+                self.deferred.pop(name, None)
+                function()
+            finally:
+                self.desk.lock.release()
+            return
+        self.deferred[name] = function
+        if not self.tasks:
+            QtCore.QTimer.singleShot(50, self.__run_deferred)
+    
+    def __run_deferred(self):
+        for name, function in self.deferred.items():
+            self.__read_tournament(name, function)
+    
+    def __task_progress(self, step, done, total):
+        if total:
+            self.ui.statusbar.showMessage("%s %d/%d" % (step, done, total))
+        else:
+            self.ui.statusbar.showMessage(step)
+    
+    def __tournament_widgets(self):
+        """Widgets changing the tournament, or reading it meanwhile."""
+        return [self.ui.b_startNextRound, self.ui.b_saveResult,
+                self.ui.b_addPlayer, self.ui.b_editPlayer, self.ui.b_dropPlayer,
+                self.ui.c_pairRound, self.ui.e_search,
+                self.ui.actionLoad_Players, self.ui.actionSave_tournament_state,
+                self.ui.actionLoad_tournament_state]
+
     def yes_no_dialog(self, title, question):
         flags = QtGui.QMessageBox.StandardButton.Yes 
         flags |= QtGui.QMessageBox.StandardButton.No
@@ -59,34 +167,25 @@ class PMainWindow(QtGui.QMainWindow):
 
     # ============ TAB PLAYERS ============
     
-    def __t_players_fill_row(self, rown, player):
-        self.ui.t_players.setItem(rown, 0, QtGui.QTableWidgetItem("%s" % player.uid))
-        self.ui.t_players.setItem(rown, 1, QtGui.QTableWidgetItem("%s" % player.name))
-        self.ui.t_players.setItem(rown, 2, QtGui.QTableWidgetItem("%s" % player.faction))
-        self.ui.t_players.setItem(rown, 3, QtGui.QTableWidgetItem("%s" % player.team))
-        self.ui.t_players.setItem(rown, 4, QtGui.QTableWidgetItem("%s" % player.country))
-        self.ui.t_players.setItem(rown, 5, QtGui.QTableWidgetItem("%s" % player.tp))
-        self.ui.t_players.setItem(rown, 6, QtGui.QTableWidgetItem("%s" % player.sos))
-        self.ui.t_players.setItem(rown, 7, QtGui.QTableWidgetItem("%s" % player.cp))
-        self.ui.t_players.setItem(rown, 8, QtGui.QTableWidgetItem("%s" % player.kp))
-        for column in range(self.ui.t_players.columnCount() - 1):
+    def __t_players_resize_columns(self):
+        # only when the whole table is loaded, it's slow with many players
+        for column in range(self.standings_model.columnCount() - 1):
             self.ui.t_players.resizeColumnToContents(column)
+
+    @QtCore.Slot(str)
+    def on_e_search_textChanged(self, text):
+        self.__read_tournament("search",
+                               lambda: self.standings_model.set_search(text.strip()))
     
-    def __t_players_sort_tournament_order(self):
-        for column in [8,7,6,5]:
-            self.ui.t_players.sortItems(column, QtCore.Qt.SortOrder.DescendingOrder)
+    @QtCore.Slot(QtCore.QModelIndex)
+    def on_t_players_clicked(self, index):
+        # pick the player for editing
+        p = self.standings_model.player(index.row())
+        self.ui.e_pUid.setText(p.uid)
+        self.on_e_pUid_textEdited(p.uid)
     
-    def t_players_add_player(self, player):
-        rown = self.ui.t_players.rowCount()
-        self.ui.t_players.insertRow(rown)
-        self.__t_players_fill_row(rown, player)
-
     def update_t_players_from_tournament(self):
-        self.ui.t_players.clearContents()
-        self.ui.t_players.setRowCount(0)
-        for uid, p in self.tournament.players.iteritems():
-            self.t_players_add_player(p)        
-        self.__t_players_sort_tournament_order()
+        self.__read_tournament("players", self.standings_model.refresh)
 
     # ------------ Add Player ------------
     
@@ -97,12 +196,18 @@ class PMainWindow(QtGui.QMainWindow):
         team = self.ui.e_team.text()
         country = self.ui.e_country.text()
         
-        uid = self.ui.t_players.rowCount()+1
-        p = Player(name, faction, team, country, uid = uid)
-        self.tournament.add_player(p)
-        self.t_players_add_player(p)
+        # late registration
+        missed = self.tournament.current_round + 1
+        if missed and not self.yes_no_dialog("Late registration",
+                "The player gets TP %s, CP %s, KP %s for each of the %s rounds he missed. Continue?" %
+                (self.tournament.late_join + (missed,))):
+            return
         
-        self.tournament.tables = len(self.tournament.players) / 2
+        uid = len(self.tournament.players)+1
+        p = Player(name, faction, team, country, uid = uid)
+        with self.desk.lock:
+            self.tournament.add_player(p)
+        self.update_t_players_from_tournament()
         
         # Mark that there are changes to be saved
         self.changes_to_save = True
@@ -113,6 +218,7 @@ class PMainWindow(QtGui.QMainWindow):
         self.ui.e_name_2.setText("")
         self.ui.e_team_2.setText("")
         self.ui.e_country_2.setText("")
+        self.ui.b_dropPlayer.setText("Drop")
 
     @QtCore.Slot(str)
     def on_e_pUid_textEdited(self, text):
@@ -127,6 +233,7 @@ class PMainWindow(QtGui.QMainWindow):
         self.ui.c_faction_2.setCurrentIndex(index)
         self.ui.e_team_2.setText(p.team)
         self.ui.e_country_2.setText(p.country)
+        self.ui.b_dropPlayer.setText("Drop" if p.is_playing else "Re-enter")
 
     @QtCore.Slot()
     def on_b_editPlayer_clicked(self):
@@ -148,25 +255,45 @@ class PMainWindow(QtGui.QMainWindow):
         if not self.yes_no_dialog("Save changes", "Are you sure?"):
             return
         
-        p.name = name
-        p.factions[0] = faction
-        p.team = team
-        p.country = country
+        factions = [faction] + p.factions[1:]
+        with self.desk.lock:
+            self.tournament.edit_player(p, name, factions, team, country)
         
-        rown = 0
-        for rown in range(self.ui.t_players.rowCount()):
-            if  self.ui.t_players.item(rown, 0).text() == p.uid:
-                break
-        self.__t_players_fill_row(rown, p)
+        self.standings_model.player_changed(p)
         
         self.ui.e_pUid.setText("")
         self.__editplayer_guiclear()
-        self._show_pairings(self.tournament.pairings[-1], self.tournament.byes[-1])
+        rnd = self.ui.c_pairRound.currentIndex()
+        if rnd >= 0:
+            self._show_pairings(self.tournament.pairings[rnd], self.tournament.byes[rnd])
         
         # Mark that there are changes to be saved
         self.changes_to_save = True
         
 
+    @QtCore.Slot()
+    def on_b_dropPlayer_clicked(self):
+        try:
+            p = self.tournament.players[self.ui.e_pUid.text()]
+        except KeyError:
+            QtGui.QMessageBox.warning(self, "Failure", "Player with ID %s does not exist." % self.ui.e_pUid.text())
+            return
+        
+        if p.is_playing:
+            if not self.yes_no_dialog("Drop player", "%s won't be paired in the following rounds. Are you sure?" % p.name):
+                return
+            with self.desk.lock:
+                self.tournament.drop_player(p)
+            self.ui.statusbar.showMessage("%s dropped" % p.name, 3000)
+        else:
+            with self.desk.lock:
+                self.tournament.reenter_player(p)
+            self.ui.statusbar.showMessage("%s re-entered" % p.name, 3000)
+        self.on_e_pUid_textEdited(p.uid)
+        
+        # Mark that there are changes to be saved
+        self.changes_to_save = True
+
     # ============ TAB PAIRINGS ============
 
     def _show_pairings(self, pairings, bye):
@@ -195,6 +322,10 @@ class PMainWindow(QtGui.QMainWindow):
 
     @QtCore.Slot()
     def on_b_startNextRound_clicked(self):
+        if "pairing" in self.tasks:
+            self.tasks["pairing"].cancel()
+            return
+        
         if len(self.tournament.active_players) < 3:
             QtGui.QMessageBox.information(self, "Information", "At least 3 active players are required to start a round.")
             return
@@ -202,7 +333,7 @@ class PMainWindow(QtGui.QMainWindow):
         if self.tournament.current_round > -1:
             missing_results = []
             for table, pair in self.tournament.pairings[-1].items():
-                if (len(pair[0]._tp) != self.tournament.current_round + 1) or (len(pair[1]._tp) != self.tournament.current_round + 1):
+                if not (pair[0].has_result(self.tournament.current_round) and pair[1].has_result(self.tournament.current_round)):
                     missing_results.append(table)
             
             if missing_results:
@@ -210,20 +341,41 @@ class PMainWindow(QtGui.QMainWindow):
                 return
         
         
-        pairs, bye = self.tournament.create_pairings()
-        self._show_pairings(pairs, bye)
-        
+        # results can't be entered while pairing, they change the pairings
+        widgets = [w for w in self.__tournament_widgets()
+                   if w is not self.ui.b_startNextRound]
+        def pair(progress):
+            with self.desk.lock:
+                return self.tournament.create_pairings(progress)
+        self.__start_task("pairing", pair, self.__round_started, widgets,
+                          cancel_button = self.ui.b_startNextRound)
+    
+    def __round_started(self, result):
+        # the pairings are shown by on_c_pairRound_currentIndexChanged
         r = self.tournament.current_round + 1
         self.ui.c_pairRound.addItem("%s" % r)
         index = self.ui.c_pairRound.findText("%s" % r)
         self.ui.c_pairRound.setCurrentIndex(index)
+        self.ui.s_resultRound.setMaximum(r)
+        self.ui.s_resultRound.setValue(r)
 
         self.ui.statusbar.showMessage("Current round: %s" % r)
-        self.ui.b_addPlayer.setEnabled(False)
         
         # Mark that there are changes to be saved
         self.changes_to_save = True
     
+    @QtCore.Slot(int)
+    def on_c_pairRound_currentIndexChanged(self, rnd):
+        if rnd < 0:
+            return
+        self._show_pairings(self.tournament.pairings[rnd], self.tournament.byes[rnd])
+        
+        # standings after the round, the current one is still being played
+        if rnd == self.tournament.current_round:
+            self.standings_model.set_round(None)
+        else:
+            self.standings_model.set_round(rnd)
+    
     # ============ TAB RESULTS ============
     
     def __addResultGuiClear(self):
@@ -240,6 +392,10 @@ class PMainWindow(QtGui.QMainWindow):
         self.ui.c_pAfaction.clear()
         self.ui.c_pBfaction.clear()
     
+    @QtCore.Slot(int)
+    def on_s_resultRound_valueChanged(self, value):
+        self.on_e_tblnum_textEdited(self.ui.e_tblnum.text())
+    
     @QtCore.Slot(str)
     def on_e_tblnum_textEdited(self, text):
         if text == "":
@@ -248,8 +404,10 @@ class PMainWindow(QtGui.QMainWindow):
         if self.tournament.current_round < 0:
             return
         
+        # results of the earlier rounds can be amended
+        cround = self.ui.s_resultRound.value() - 1
         try:
-            pair = self.tournament.pairings[-1][int(text)]
+            pair = self.tournament.pairings[cround][int(text)]
         except KeyError:
             self.__addResultGuiClear()
             return
@@ -267,16 +425,18 @@ class PMainWindow(QtGui.QMainWindow):
             self.ui.c_pBfaction.addItem(faction)
 
         # if the players already played, prefill also the tp/cp/kp/...
-        if len(pair[0]._tp) == (self.tournament.current_round + 1):
-            self.ui.e_pAtp.setText(str(pair[0]._tp[-1]))
-            self.ui.e_pBtp.setText(str(pair[1]._tp[-1]))
-            self.ui.e_pAcp.setText(str(pair[0]._cp[-1]))
-            self.ui.e_pBcp.setText(str(pair[1]._cp[-1]))
-            self.ui.e_pAkp.setText(str(pair[0]._kp[-1]))
-            self.ui.e_pBkp.setText(str(pair[1]._kp[-1]))
-            index = self.ui.c_pAfaction.findText(pair[1].factions_played[-1])
+        if pair[0].has_result(cround):
+            pAtp, pAcp, pAkp, pBfaction = pair[0].result(cround)
+            pBtp, pBcp, pBkp, pAfaction = pair[1].result(cround)
+            self.ui.e_pAtp.setText(str(pAtp))
+            self.ui.e_pBtp.setText(str(pBtp))
+            self.ui.e_pAcp.setText(str(pAcp))
+            self.ui.e_pBcp.setText(str(pBcp))
+            self.ui.e_pAkp.setText(str(pAkp))
+            self.ui.e_pBkp.setText(str(pBkp))
+            index = self.ui.c_pAfaction.findText(pAfaction)
             self.ui.c_pAfaction.setCurrentIndex(index)
-            index = self.ui.c_pBfaction.findText(pair[0].factions_played[-1])
+            index = self.ui.c_pBfaction.findText(pBfaction)
             self.ui.c_pBfaction.setCurrentIndex(index)
     
     @QtCore.Slot()
@@ -294,7 +454,7 @@ class PMainWindow(QtGui.QMainWindow):
         pA = self.tournament.players[pAuid]
         pB = self.tournament.players[pBuid]
         
-        cround = self.tournament.current_round
+        cround = self.ui.s_resultRound.value() - 1
         
         if (pA.tables_played[cround] != table) or (pB.tables_played[cround] != table):
             QtGui.QMessageBox.critical(self, "Critical error", "These players did not play on table %s in round %s" % (table, cround + 1))
@@ -312,34 +472,63 @@ class PMainWindow(QtGui.QMainWindow):
             return
         
         #editing the results
-        if len(pA._tp) == cround + 1:        
+        if pA.has_result(cround):
             if not self.yes_no_dialog("Edit Results", "You are changing once filled results. Are you sure?"):
                 return
-            pA._tp[-1] = int(pAtp)
-            pA._cp[-1] = int(pAcp)
-            pA._kp[-1] = int(pAkp)
-            pA.factions_played[-1] = self.ui.c_pBfaction.currentText()
-            pB._tp[-1] = int(pBtp)
-            pB._cp[-1] = int(pBcp)
-            pB._kp[-1] = int(pBkp)
-            pB.factions_played[-1] = self.ui.c_pAfaction.currentText()
-            
-        else: #adding new results
-            pA._tp.append(int(pAtp))
-            pA._cp.append(int(pAcp))
-            pA._kp.append(int(pAkp))
-            pA.factions_played.append(self.ui.c_pBfaction.currentText())
-            pB._tp.append(int(pBtp))
-            pB._cp.append(int(pBcp))
-            pB._kp.append(int(pBkp))
-            pB.factions_played.append(self.ui.c_pAfaction.currentText())
         
+        result_a = (int(pAtp), int(pAcp), int(pAkp), self.ui.c_pAfaction.currentText())
+        result_b = (int(pBtp), int(pBcp), int(pBkp), self.ui.c_pBfaction.currentText())
+        
+        if cround < self.tournament.current_round:
+            self.__amend_result(cround, table, result_a, result_b)
+            return
+        
+        try:
+            self.desk.submit(cround, table, result_a, result_b)
+        except TournamentException as e:
+            QtGui.QMessageBox.critical(self, "Critical error", "%s" % e)
+            return
+        
+        # the standings are updated by __result_recorded
+        self.__addResultGuiClear()
+        self.ui.e_tblnum.setText("")
+        
+        # Mark that there are changes to be saved
+        self.changes_to_save = True
+    
+    def __amend_result(self, rnd, table, result_a, result_b):
+        reason, ok = QtGui.QInputDialog.getText(self, "Amend result",
+            "Round %s is over, reason of the correction:" % (rnd + 1))
+        if not ok:
+            return
+        
+        # telling which later pairings would differ replays the rounds
+        def amend(progress):
+            progress("Amending")
+            with self.desk.lock:
+                return self.tournament.amend_result(rnd, table, result_a,
+                                                    result_b, reason,
+                                                    report = True)
+        self.__start_task("amend", amend, self.__result_amended,
+                          self.__tournament_widgets())
+    
+    def __result_amended(self, differ):
         self.update_t_players_from_tournament()
         self.__addResultGuiClear()
         self.ui.e_tblnum.setText("")
+        self.ui.statusbar.showMessage("Result amended", 3000)
+        if differ:
+            QtGui.QMessageBox.information(self, "Result amended",
+                "With the corrected result, pairings of rounds %s would have been different." %
+                ", ".join("%s" % (r + 1) for r in differ))
         
         # Mark that there are changes to be saved
         self.changes_to_save = True
+    
+    def __result_recorded(self, rnd, table):
+        self.update_t_players_from_tournament()
+        self.ui.statusbar.showMessage("Result of table %s recorded" % table, 3000)
+        self.changes_to_save = True
 
     # ============ FILE MENU ============
 
@@ -347,18 +536,30 @@ class PMainWindow(QtGui.QMainWindow):
     def on_actionLoad_Players_triggered(self, state):
         if  not self.yes_no_dialog("Load players?", "This will reset the tournament state. Continue?"):
             return
+        
+        errors = []
+        def read(progress):
+            return list(csv_worker.iter_players(errors = errors))
+        
+        self.__start_task("players", read,
+                          lambda players: self.__players_loaded(players, errors),
+                          [self.ui.actionLoad_Players, self.ui.b_startNextRound,
+                           self.ui.actionLoad_tournament_state])
     
-        import csv_worker
-
-        self.tournament.clear()
-        self.__guiclear()
-        for p in csv_worker.read_players():
-            uid = self.ui.t_players.rowCount()+1
-            p = Player(uid = uid, **p)
-            self.tournament.add_player(p)
-            self.t_players_add_player(p)
+    def __players_loaded(self, players, errors):
+        with self.desk.lock:
+            self.tournament.clear()
+            self.__guiclear()
+            self.tournament.add_players(Player(uid = uid, **p) for uid, p in
+                                        enumerate(players, 1))
+        self.update_t_players_from_tournament()
+        self.__t_players_resize_columns()
         
-        self.tournament.tables = len(self.tournament.players) / 2
+        if errors:
+            lines = ["Line %s: %s" % e for e in errors[:20]]
+            if len(errors) > 20:
+                lines.append("... and %s more" % (len(errors) - 20))
+            QtGui.QMessageBox.warning(self, "Skipped players", "\n".join(lines))
         
         # Mark that there are changes to be saved
         self.changes_to_save = True
@@ -367,36 +568,69 @@ class PMainWindow(QtGui.QMainWindow):
     @QtCore.Slot(bool)
     def on_actionSave_tournament_state_triggered(self, state):
         #FIXME: add save file dialog
-        pickle.dump( self.tournament, open( "save.p", "wb" ) )
+        # changes are journaled as they are made, merge them into the
+        # snapshot, the tournament can go on while it's being written
+        with self.desk.lock:
+            state = self.journal.begin_compaction()
+        self.__start_task("save", lambda progress: self.journal.finish_compaction(state),
+                          self.__saved,
+                          [self.ui.actionSave_tournament_state,
+                           self.ui.actionLoad_tournament_state,
+                           self.ui.actionLoad_Players])
         self.changes_to_save = False
+    
+    def __saved(self, result):
+        self.ui.statusbar.showMessage("Saved", 3000)
 
     @QtCore.Slot(bool)
     def on_actionLoad_tournament_state_triggered(self, state):
         #FIXME: add load file dialog
-        self.tournament = pickle.load( open( "save.p", "rb" ) )
+        def load(progress):
+            with self.desk.lock:
+                tournament = self.journal.open()
+                self.desk.set_tournament(tournament)
+                return tournament
+        self.__start_task("load", load, self.__tournament_loaded, self.__tournament_widgets())
+    
+    def __tournament_loaded(self, tournament):
+        self.tournament = tournament
+        self.__show_tournament()
         
-        # fill players table
-        self.__guiclear()
-        for p_uid in sorted(self.tournament.players.keys()):
-            self.t_players_add_player(self.tournament.players[p_uid])
+    @QtCore.Slot(bool)
+    def on_actionResult_server_triggered(self, checked):
+        if not checked:
+            result_server.stop(self.result_server)
+            self.result_server = None
+            self.ui.statusbar.showMessage("Result server stopped", 3000)
+            return
         
-        # sort them according to Masters 2013
-        self.__t_players_sort_tournament_order()
+        try:
+            self.result_server = result_server.start(self.desk)
+        except socket.error as e:
+            self.ui.actionResult_server.setChecked(False)
+            QtGui.QMessageBox.critical(self, "Error", "Result server can't start: %s" % e)
+            return
+        port = self.result_server.server_address[1]
+        self.ui.statusbar.showMessage("Result server on http://%s:%s/" % (socket.gethostname(), port))
+    
+    def __show_tournament(self):
+        # fill players table, sorted according to Masters 2013
+        self.__guiclear()
+        self.__t_players_resize_columns()
         
         # fill current pairing table
+        self.ui.c_pairRound.blockSignals(True)
         for i in range(self.tournament.current_round +1):
             self.ui.c_pairRound.addItem("%s" % (i+1))
-            index = self.ui.c_pairRound.findText("%s" % (i+1))
-            self.ui.c_pairRound.setCurrentIndex(index)
-        
-        self._show_pairings(self.tournament.pairings[-1], self.tournament.byes[-1])
+        self.ui.c_pairRound.setCurrentIndex(self.tournament.current_round)
+        self.ui.c_pairRound.blockSignals(False)
+        self.on_c_pairRound_currentIndexChanged(self.tournament.current_round)
+        self.ui.s_resultRound.setMaximum(max(self.tournament.current_round + 1, 1))
+        self.ui.s_resultRound.setValue(self.tournament.current_round + 1)
         
         # update status bar
         self.ui.statusbar.showMessage("Current round: %s" % (self.tournament.current_round + 1))
         
-        if self.tournament.current_round > -1:
-            self.ui.b_addPlayer.setEnabled(False)
-        
         self.changes_to_save = False
         
 
@@ -0,0 +1,125 @@
+"""
+Timing and counters of the round generation.
+
+Tournament.instrumentation is NULL by default, which does nothing. Setting
+it to an Instrumentation collects a report for every generated round:
+
+    {"round": 3, "players": 120, "engine": "blossom", "total": 0.061,
+     "timings": {"ordering": 0.002, "grouping": 0.0001, "bye": 0.0,
+                 "pairing": 0.041, "tables": 0.016, "start_round": 0.002},
+     "counters": {"penalty_evaluations": 3352, "fallbacks": 0,
+                  "rematches": 0, ...}}
+
+Counters of the pairing engine (see pairing) include "fallbacks", the
+times it had to leave its fast path: groups of the greedy engine that
+took a floater, and blossom rounds matched again over the whole graph
+because of "window_rematches".
+
+Reports are kept in .reports and passed to the hooks (callables taking the
+report) when the round is done, also when its generation failed (the
+report then has "error").
+"""
+
+import timeit
+
+clock = timeit.default_timer
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = clock() - self.start
+        self.timings[self.name] = self.timings.get(self.name, 0) + elapsed
+        return False
+
+
+class NullInstrumentation(object):
+    """Instrumentation switched off."""
+
+    enabled = False
+
+    def begin_round(self, rnd, **info):
+        pass
+
+    def timer(self, name):
+        return _NULL_TIMER
+
+    def count(self, name, n = 1):
+        pass
+
+    def end_round(self, error = None):
+        pass
+
+NULL = NullInstrumentation()
+
+
+class Instrumentation(object):
+    """
+    Collects reports of the generated rounds, `keep` is the number of the
+    last reports to keep (None keeps all).
+    """
+
+    enabled = True
+
+    def __init__(self, keep = None):
+        self.keep = keep
+        self.hooks = []
+        self.reports = []
+        self.report = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def begin_round(self, rnd, **info):
+        self.report = {"round": rnd + 1, "timings": {}, "counters": {}}
+        self.report.update(info)
+        self._start = clock()
+
+    def timer(self, name):
+        if self.report is None:
+            return _NULL_TIMER
+        return _Timer(self.report["timings"], name)
+
+    def count(self, name, n = 1):
+        if self.report is not None:
+            counters = self.report["counters"]
+            counters[name] = counters.get(name, 0) + n
+
+    def end_round(self, error = None):
+        report = self.report
+        if report is None:
+            return
+        self.report = None
+        report["total"] = clock() - self._start
+        if error is not None:
+            report["error"] = error
+
+        self.reports.append(report)
+        if self.keep is not None:
+            del self.reports[:-self.keep]
+        for hook in self.hooks:
+            hook(report)
+
+    def slowest(self, n = 1):
+        """The n reports of the rounds that took the longest."""
+        return sorted(self.reports, key = lambda r: r["total"], reverse = True)[:n]
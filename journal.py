@@ -0,0 +1,274 @@
+"""
+Append-only journal of the tournament changes.
+
+The state lives in two files: a snapshot (see storage) and a journal of the
+changes made after it, one JSON event per line. Every change is appended to
+the journal as it happens, so saving costs only the change, and the journal
+is merged into a new snapshot once it grows long (compaction).
+
+Events are numbered, and the snapshot remembers the number of the last
+event it contains, so a crash during compaction doesn't apply any event
+twice. A crash while writing an event leaves a partial last line, which is
+dropped on the next open.
+"""
+
+import os
+import json
+import threading
+
+import storage
+from controller import Player, Tournament
+
+
+def _player(data):
+    return Player(data["name"], data["factions"], data["team"],
+                  data["country"], uid = data["uid"])
+
+
+def _add_player(t, event):
+    t.add_player(_player(event["player"]), event.get("late_join"))
+
+def _add_players(t, event):
+    t.add_players([_player(data) for data in event["players"]],
+                  event.get("late_join"))
+
+def _edit_player(t, event):
+    data = event["player"]
+    t.edit_player(t.players[data["uid"]], data["name"], data["factions"],
+                  data["team"], data["country"])
+
+def _drop_player(t, event):
+    t.drop_player(t.players[event["uid"]])
+
+def _reenter_player(t, event):
+    t.reenter_player(t.players[event["uid"]])
+
+def _fixed_tables(t, event):
+    t.fixed_tables = dict(event["tables"])
+
+def _clear(t, event):
+    t.clear()
+
+def _start_round(t, event):
+    t.tables = event["tables"]
+    pairs = {}
+    for table, uidA, uidB in event["pairs"]:
+        pairs[table] = (t.players[uidA], t.players[uidB])
+    bye = event["bye"]
+    t._restore_round(pairs, bye and t.players[bye], event["table_repeats"], {},
+                     {}, event.get("block", 1))
+
+def _record_result(t, event):
+    t.record_result(event["table"], tuple(event["result_a"]),
+                    tuple(event["result_b"]))
+
+def _award(t, event):
+    t.award([t.players[uid] for uid in event["uids"]], event["tp"],
+            event["cp"], event["kp"], event.get("team"))
+
+def _amend_result(t, event):
+    t._amend(event["round"], event["table"], tuple(event["result_a"]),
+             tuple(event["result_b"]), event["reason"], event["time"])
+
+
+EVENTS = {
+    "add_player": _add_player,
+    "add_players": _add_players,
+    "edit_player": _edit_player,
+    "drop_player": _drop_player,
+    "reenter_player": _reenter_player,
+    "fixed_tables": _fixed_tables,
+    "clear": _clear,
+    "start_round": _start_round,
+    "record_result": _record_result,
+    "amend_result": _amend_result,
+    "award": _award,
+}
+
+
+class Journal(object):
+    """
+    Journal `path`.journal on top of the snapshot `path`.sqlite. Without
+    a snapshot, the pickle save of the old versions `path`.p (if any) is
+    converted to it.
+
+    Events are flushed to the OS as they are written, which is enough to
+    survive a crash of the program; fsync (surviving a crash of the
+    machine) is done once per `sync_every` events and on sync()/close().
+    After `compact_every` events the journal is compacted, 0 disables it.
+
+    Compaction can also run in another thread: begin_compaction() reads
+    the tournament (in the thread changing it), finish_compaction() writes
+    the snapshot while events are still being appended.
+    """
+
+    def __init__(self, path, sync_every = 16, compact_every = 1000):
+        self.snapshot_file = path + ".sqlite"
+        self.journal_file = path + ".journal"
+        # pickle save of the old versions, see storage.import_pickle
+        self.legacy_file = path + ".p"
+        self.sync_every = sync_every
+        self.compact_every = compact_every
+        self.tournament = None
+        self.seq = 0
+        self.f = None
+        self.unsynced = 0
+        self.uncompacted = 0
+        # size of the journal file, and bytes dropped from its start
+        self.size = 0
+        self.dropped = 0
+        # last event in the snapshot
+        self.snapshot_seq = 0
+        # guards the journal file, and one compaction at a time
+        self.lock = threading.Lock()
+        self.compaction_lock = threading.Lock()
+
+    def open(self, **settings):
+        """
+        Load the snapshot, replay the journal on top of it, and attach the
+        journal to the tournament. Without a snapshot, a new Tournament is
+        created with `settings` and written to the snapshot right away (the
+        settings, e.g. the seed, are in no event).
+        """
+        self.close()
+
+        if not os.path.exists(self.snapshot_file) and os.path.exists(self.legacy_file):
+            # one time conversion of the pickle save of the old versions
+            storage.save(storage.import_pickle(self.legacy_file), self.snapshot_file)
+
+        if os.path.exists(self.snapshot_file):
+            f = storage.TournamentFile(self.snapshot_file)
+            try:
+                t = f.tournament()
+                seq = f.meta().get("journal_seq", 0)
+            finally:
+                f.close()
+        else:
+            t = Tournament(**settings)
+            seq = 0
+            storage.save(t, self.snapshot_file, {"journal_seq": seq})
+
+        # replay the complete lines, and cut off the rest
+        snapshot_seq = seq
+        events = 0
+        end = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "rb") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break
+                    end += len(line)
+                    if event["seq"] <= seq:
+                        continue
+                    EVENTS[event["op"]](t, event)
+                    seq = event["seq"]
+                    events += 1
+
+        self.f = open(self.journal_file, "ab")
+        self.f.truncate(end)
+        self.size = end
+        self.dropped = 0
+        self.snapshot_seq = snapshot_seq
+        self.seq = seq
+        self.uncompacted = events
+        self.tournament = t
+        t.journal = self
+        return t
+
+    def append(self, op, **data):
+        with self.lock:
+            self.seq += 1
+            data["op"] = op
+            data["seq"] = self.seq
+            line = json.dumps(data, separators = (",", ":")) + "\n"
+            self.f.write(line)
+            self.f.flush()
+            self.size += len(line)
+
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every:
+                self._sync()
+            self.uncompacted += 1
+        if self.compact_every and self.uncompacted >= self.compact_every:
+            self.compact()
+
+    def sync(self):
+        with self.lock:
+            self._sync()
+
+    def _sync(self):
+        if self.f is not None and self.unsynced:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.unsynced = 0
+
+    def compact(self):
+        """Write a new snapshot of the tournament, and empty the journal."""
+        self.finish_compaction(self.begin_compaction())
+
+    def begin_compaction(self):
+        """
+        Read the tournament for the snapshot, returns the state to pass to
+        finish_compaction().
+        """
+        with self.lock:
+            return (storage.dump(self.tournament, {"journal_seq": self.seq}),
+                    self.seq, self.dropped + self.size, self.uncompacted)
+
+    def finish_compaction(self, state):
+        """
+        Write the snapshot, and drop the events it contains from the
+        journal, keeping those appended since begin_compaction().
+        """
+        rows, seq, offset, events = state
+        with self.compaction_lock:
+            # a newer snapshot was written meanwhile
+            if seq <= self.snapshot_seq:
+                return
+            tmp = self.snapshot_file + ".tmp"
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            storage.write(rows, tmp)
+            # Windows can't rename over an existing file
+            if os.name == "nt" and os.path.exists(self.snapshot_file):
+                os.remove(self.snapshot_file)
+            os.rename(tmp, self.snapshot_file)
+
+            with self.lock:
+                self.f.flush()
+                with open(self.journal_file, "rb") as f:
+                    f.seek(offset - self.dropped)
+                    rest = f.read()
+                # the events since begin_compaction() are not in the snapshot,
+                # the journal is replaced by them like the snapshot above
+                tmp = self.journal_file + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(rest)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.f.close()
+                try:
+                    if os.name == "nt":
+                        os.remove(self.journal_file)
+                    os.rename(tmp, self.journal_file)
+                finally:
+                    self.f = open(self.journal_file, "ab")
+                self.unsynced = 0
+                self.dropped += self.size - len(rest)
+                self.size = len(rest)
+                self.snapshot_seq = seq
+                self.uncompacted -= events
+
+    def close(self):
+        if self.f is not None:
+            self.sync()
+            with self.lock:
+                self.f.close()
+                self.f = None
+        if self.tournament is not None:
+            self.tournament.journal = None
+            self.tournament = None
@@ -0,0 +1,157 @@
+"""
+Indexes of the tournament's players by name, team, faction and country.
+"""
+
+import bisect
+import unicodedata
+
+
+def normalize(s):
+    """Lower case, without accents and extra spaces."""
+    s = unicodedata.normalize("NFKD", u"%s" % (s or ""))
+    s = u"".join(c for c in s if not unicodedata.combining(c))
+    return u" ".join(s.lower().split())
+
+
+class PlayerIndex(object):
+    """
+    Secondary indexes of the players, by their index (see ResultStore):
+        names      - sorted list of (word, player index) for every word of
+                     every name, searched by prefix with bisect
+        teams, factions, countries - value -> set of player indexes
+    Values are compared normalized (see normalize). Results are lists of
+    players in order of registration.
+    """
+
+    FIELDS = ("team", "faction", "country")
+
+    def __init__(self):
+        self.players = []
+        self.names = []
+        self.teams = {}
+        self.factions = {}
+        self.countries = {}
+        # player index -> (words, team, factions, country) as indexed
+        self.keys = []
+
+    def _keys(self, p):
+        words = tuple(sorted(set(normalize(p.name).split())))
+        return (words, normalize(p.team), tuple(normalize(f) for f in p.factions),
+                normalize(p.country))
+
+    def _link(self, i, keys, link):
+        words, team, factions, country = keys
+        for mapping, values in ((self.teams, [team]), (self.factions, factions),
+                                (self.countries, [country])):
+            for value in values:
+                if link:
+                    mapping.setdefault(value, set()).add(i)
+                else:
+                    mapping[value].discard(i)
+                    if not mapping[value]:
+                        del mapping[value]
+
+    def add_players(self, players):
+        """Add the players, their p.index has to follow the last one."""
+        entries = []
+        for p in players:
+            keys = self._keys(p)
+            self.players.append(p)
+            self.keys.append(keys)
+            self._link(p.index, keys, True)
+            entries.extend((word, p.index) for word in keys[0])
+        if len(entries) > 1:
+            # one sort instead of an insort per name
+            self.names.extend(entries)
+            self.names.sort()
+        else:
+            for entry in entries:
+                bisect.insort(self.names, entry)
+
+    def update_player(self, p):
+        """Re-index the player after his name, team, ... changed."""
+        i = p.index
+        old, new = self.keys[i], self._keys(p)
+        if old == new:
+            return
+        self._link(i, old, False)
+        self._link(i, new, True)
+        if old[0] != new[0]:
+            for word in old[0]:
+                del self.names[bisect.bisect_left(self.names, (word, i))]
+            for word in new[0]:
+                bisect.insort(self.names, (word, i))
+        self.keys[i] = new
+
+    def _players(self, indexes, playing):
+        players = [self.players[i] for i in sorted(indexes)]
+        if playing:
+            players = [p for p in players if p.is_playing]
+        return players
+
+    def _prefix(self, prefix):
+        """Indexes of the players with a word of the name starting by prefix."""
+        prefix = normalize(prefix)
+        found = set()
+        i = bisect.bisect_left(self.names, (prefix,))
+        while i < len(self.names) and self.names[i][0].startswith(prefix):
+            found.add(self.names[i][1])
+            i += 1
+        return found
+
+    def search(self, prefix, playing = False):
+        """
+        Players with a word of the name starting by `prefix`, only those
+        still playing if `playing` is set.
+        """
+        return self._players(self._prefix(prefix), playing)
+
+    def team(self, team, playing = False):
+        return self._players(self.teams.get(normalize(team), ()), playing)
+
+    def faction(self, faction, playing = False):
+        return self._players(self.factions.get(normalize(faction), ()), playing)
+
+    def country(self, country, playing = False):
+        return self._players(self.countries.get(normalize(country), ()), playing)
+
+    def query(self, text, playing = False):
+        """
+        Players matching all the terms of the text: "team:", "faction:" and
+        "country:" terms match the whole value (use quotes around values
+        with spaces), other words are name prefixes.
+        """
+        found = None
+        for term in _terms(text):
+            field, sep, value = term.partition(":")
+            if sep and field in self.FIELDS:
+                mapping = {"team": self.teams, "faction": self.factions,
+                           "country": self.countries}[field]
+                indexes = mapping.get(normalize(value), set())
+            else:
+                indexes = self._prefix(term)
+            found = set(indexes) if found is None else found & indexes
+            if not found:
+                break
+        if found is None:
+            found = range(len(self.players))
+        return self._players(found, playing)
+
+
+def _terms(text):
+    """Split on spaces, keeping the quoted parts together."""
+    terms = []
+    term = []
+    quoted = False
+    for c in text:
+        if c == '"':
+            quoted = not quoted
+        elif c.isspace() and not quoted:
+            if term:
+                terms.append(u"".join(term))
+            term = []
+        else:
+            term.append(c)
+    if term:
+        terms.append(u"".join(term))
+    return terms
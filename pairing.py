@@ -0,0 +1,699 @@
+"""
+Pairing engines.
+
+An engine takes the players split into score groups (as returned by
+Tournament._ordered_players, bye already removed) and returns a list of
+[pA, pB] pairs. Engines are looked up by name in PAIRING_ENGINES.
+"""
+
+# Penalty model, see PenaltyIndex
+REMATCH = 1000
+SAME_TEAM = 100
+FACTION_PLAYED = 10
+SAME_FACTION = 1
+# Penalty for each score group between the two players. Floating two players
+# across groups is still cheaper than a rematch.
+SCORE_GROUP = 400
+
+
+class PenaltyIndex(object):
+    """
+    Compact pairing history of the tournament's players.
+
+    Every player gets an integer index, and the index keeps per-player
+    bitsets (python ints) of opponents played, factions owned and factions
+    faced, plus a team id. Rating a pair is then just a few bitwise ops:
+        Opponent which he already played against -> +1000 points
+        Opponent from the same team -> +100 points
+        Opponent has faction the player already played -> +10 points
+        Opponent has the same faction -> +1 point
+    """
+
+    def __init__(self):
+        self.players = []
+        self.opponents = []
+        self.owned = []
+        self.faced = []
+        self.teams = []
+        self.team_ids = {"": 0}
+        self.faction_ids = {}
+
+    def _faction_bits(self, factions):
+        bits = 0
+        for f in factions:
+            if f is None:
+                continue
+            if f not in self.faction_ids:
+                self.faction_ids[f] = len(self.faction_ids)
+            bits |= 1 << self.faction_ids[f]
+        return bits
+
+    def _team_id(self, team):
+        if team not in self.team_ids:
+            self.team_ids[team] = len(self.team_ids)
+        return self.team_ids[team]
+
+    def add_players(self, players):
+        """
+        Add the players, their p.index (see ResultStore.add_player) has to
+        follow the last one.
+        """
+        n = len(players)
+        self.players.extend(players)
+        self.opponents.extend([0] * n)
+        self.owned.extend([0] * n)
+        self.faced.extend([0] * n)
+        self.teams.extend([0] * n)
+        for p in players:
+            self.update_player(p)
+
+    def update_player(self, p):
+        """Refresh the player's factions, team and faced factions."""
+        i = p.index
+        opponents = 0
+        for o in p.opponents_played:
+            if o is not None:
+                opponents |= 1 << o.index
+        self.opponents[i] = opponents
+        self.owned[i] = self._faction_bits(p.factions)
+        self.faced[i] = self._faction_bits(p.factions_played)
+        self.teams[i] = self._team_id(p.team or "")
+
+    def add_game(self, pA, pB):
+        self.opponents[pA.index] |= 1 << pB.index
+        self.opponents[pB.index] |= 1 << pA.index
+
+    def add_faced(self, p, faction):
+        self.faced[p.index] |= self._faction_bits([faction])
+
+    def penalty(self, a, b):
+        """Rate the game between players with indexes a and b."""
+        score = 0
+        if self.opponents[a] >> b & 1:
+            score += REMATCH
+        if self.teams[a] and self.teams[a] == self.teams[b]:
+            score += SAME_TEAM
+        if self.faced[a] & self.owned[b]:
+            score += FACTION_PLAYED
+        if self.owned[a] & self.owned[b]:
+            score += SAME_FACTION
+        return score
+
+
+class GreedyPairing(object):
+    """
+    The original pairing strategy.
+
+    = For each group =
+    If the group has odd number of players add the top player from next
+    group to this group.
+
+    Take the first player and pair him with the opponent with lowest
+    penalty. Remove the two players from the group, and repeat.
+
+    After pairing, .counters holds the number of penalty evaluations, of
+    players moved to the next group (floaters), and of fallbacks - groups
+    which could not be paired on their own and took a floater.
+
+    `progress` is called as progress("pairing", done, total) for each group.
+    """
+
+    def __init__(self, progress = None):
+        self.progress = progress
+        self.counters = {}
+
+    def pair(self, groups, penalties):
+        pairs = []
+        evaluations = 0
+        floaters = 0
+        fallbacks = 0
+        for i, group in enumerate(groups):
+            if self.progress is not None:
+                self.progress("pairing", i, len(groups))
+            if len(group) % 2: # odd number of players
+                # move the first from next group to the end of this one
+                group.append(groups[i+1].pop(0))
+                floaters += 1
+                fallbacks += 1
+
+            while len(group):
+                pA = group.pop(0)
+                rated_pBs = []
+                for j, pB in enumerate(group):
+                    score = penalties.penalty(pA.index, pB.index)
+                    rated_pBs.append((score, j, pB.name))
+                evaluations += len(group)
+
+                rated_pBs.sort()
+                pB = group.pop(rated_pBs[0][1])
+                pairs.append([pA, pB])
+
+        self.counters = {"penalty_evaluations": evaluations,
+                         "floaters": floaters, "fallbacks": fallbacks}
+        return pairs
+
+
+class BlossomPairing(object):
+    """
+    Pair the whole round at once as a minimum-weight perfect matching.
+
+    Cost of a pair is the PenaltyIndex penalty plus SCORE_GROUP for each
+    score group between the two players. To keep the graph sparse, only
+    players at most `window` positions apart in the standings are considered
+    as opponents (window = None considers everybody). Neighbours in standings
+    are always connected, so a perfect matching always exists.
+
+    If the matching of the window has a rematch, which players further
+    apart might avoid, the round falls back to matching the whole graph.
+
+    After pairing, .counters holds the number of penalty evaluations (edges
+    of the graph, of both matchings on fallback), of pairs across score
+    groups (floaters), of rematches in the matching of the window
+    (window_rematches) and of fallbacks to the whole graph (0 or 1).
+
+    `progress` is called as progress("pairing", done, total) for each stage
+    of the matching.
+    """
+
+    def __init__(self, window = 32, progress = None):
+        self.window = window
+        self.progress = progress
+        self.counters = {}
+
+    def pair(self, groups, penalties):
+        ordered = []
+        group_of = []
+        for i, group in enumerate(groups):
+            ordered.extend(group)
+            group_of.extend([i] * len(group))
+
+        n = len(ordered)
+        window = n if self.window is None else self.window
+
+        mate, evaluations = self._match(ordered, group_of, penalties, window)
+        window_rematches = 0
+        fallbacks = 0
+        if window < n - 1:
+            window_rematches = sum(
+                penalties.penalty(ordered[i].index, ordered[j].index) >= REMATCH
+                for i, j in enumerate(mate) if i < j)
+            if window_rematches:
+                fallbacks += 1
+                mate, more = self._match(ordered, group_of, penalties, n)
+                evaluations += more
+
+        pairs = []
+        floaters = 0
+        for i, j in enumerate(mate):
+            if i < j:
+                pairs.append([ordered[i], ordered[j]])
+                floaters += group_of[i] != group_of[j]
+
+        self.counters = {"penalty_evaluations": evaluations,
+                         "floaters": floaters,
+                         "window_rematches": window_rematches,
+                         "fallbacks": fallbacks}
+        return pairs
+
+    def _match(self, ordered, group_of, penalties, window):
+        """Minimum cost matching of players at most `window` apart, returns
+        the mates (see max_weight_matching) and the number of edges."""
+        n = len(ordered)
+        costs = []
+        for i in range(n):
+            for j in range(i + 1, min(n, i + window + 1)):
+                cost = penalties.penalty(ordered[i].index, ordered[j].index)
+                cost += SCORE_GROUP * (group_of[j] - group_of[i])
+                costs.append((i, j, cost))
+
+        if not costs:
+            return [], 0
+
+        # turn costs into weights, maximum cardinality makes it perfect
+        top = max(c for i, j, c in costs) + 1
+        edges = [(i, j, top - c) for i, j, c in costs]
+        progress = None
+        if self.progress is not None:
+            progress = lambda done, total: self.progress("pairing", done, total)
+        mate = max_weight_matching(edges, maxcardinality = True,
+                                   progress = progress)
+        return mate, len(costs)
+
+
+PAIRING_ENGINES = {
+    "greedy": GreedyPairing,
+    "blossom": BlossomPairing,
+}
+
+
+def max_weight_matching(edges, maxcardinality = False, progress = None):
+    """
+    Compute a maximum-weighted matching in the general undirected weighted
+    graph given by `edges` - list of (i, j, weight) tuples with integer
+    weights and vertices numbered from 0.
+
+    If `maxcardinality` is true, only maximum-cardinality matchings are
+    considered as solutions.
+
+    Returns list `mate`, where mate[i] == j if vertex i is matched to j,
+    and -1 if it is single.
+
+    `progress` is called as progress(stage, stages) before each stage,
+    `stages` being the most stages that can be needed. It may raise an
+    exception to abort the computation.
+
+    Edmonds' blossom algorithm with Galil's primal-dual bookkeeping, O(n^3).
+    Vertices carry dual variables dualvar[v], blossoms dualvar[b] (b >= n),
+    the slack of edge k = (i, j, w) is dualvar[i] + dualvar[j] - 2 * w.
+    Edges are also referred to by their endpoints p = 2*k (i) / 2*k+1 (j).
+    """
+    if not edges:
+        return []
+
+    nedge = len(edges)
+    nvertex = 0
+    for i, j, w in edges:
+        nvertex = max(nvertex, i + 1, j + 1)
+
+    maxweight = max(0, max(w for i, j, w in edges))
+
+    endpoint = [edges[p // 2][p % 2] for p in xrange(2 * nedge)]
+    # neighbend[v] lists remote endpoints of edges incident to v
+    neighbend = [[] for i in xrange(nvertex)]
+    for k, (i, j, w) in enumerate(edges):
+        neighbend[i].append(2 * k + 1)
+        neighbend[j].append(2 * k)
+
+    # mate[v] is the remote endpoint of v's matched edge, -1 if single
+    mate = nvertex * [-1]
+    # label: 0 = free, 1 = S-vertex/blossom, 2 = T-vertex/blossom
+    label = (2 * nvertex) * [0]
+    # endpoint through which the vertex/blossom got its label
+    labelend = (2 * nvertex) * [-1]
+    # top-level blossom the vertex belongs to
+    inblossom = range(nvertex)
+    blossomparent = (2 * nvertex) * [-1]
+    blossomchilds = (2 * nvertex) * [None]
+    blossombase = range(nvertex) + nvertex * [-1]
+    blossomendps = (2 * nvertex) * [None]
+    # least-slack edge to a different S-blossom
+    bestedge = (2 * nvertex) * [-1]
+    blossombestedges = (2 * nvertex) * [None]
+    unusedblossoms = range(nvertex, 2 * nvertex)
+    dualvar = nvertex * [maxweight] + nvertex * [0]
+    allowedge = nedge * [False]
+    queue = []
+
+    def slack(k):
+        i, j, w = edges[k]
+        return dualvar[i] + dualvar[j] - 2 * w
+
+    def blossom_leaves(b):
+        # iterative, blossoms can be nested very deep
+        if b < nvertex:
+            return [b]
+        leaves = []
+        stack = [b]
+        while stack:
+            t = stack.pop()
+            if t < nvertex:
+                leaves.append(t)
+            else:
+                stack.extend(reversed(blossomchilds[t]))
+        return leaves
+
+    def assign_label(w, t, p):
+        b = inblossom[w]
+        label[w] = label[b] = t
+        labelend[w] = labelend[b] = p
+        bestedge[w] = bestedge[b] = -1
+        if t == 1:
+            # b became an S-blossom, scan its vertices
+            queue.extend(blossom_leaves(b))
+        elif t == 2:
+            # b became a T-blossom, label its mate S
+            base = blossombase[b]
+            assign_label(endpoint[mate[base]], 1, mate[base] ^ 1)
+
+    def scan_blossom(v, w):
+        """
+        Trace back from v and w to discover either a new blossom (returns
+        its base vertex) or an augmenting path (returns -1).
+        """
+        path = []
+        base = -1
+        while v != -1 or w != -1:
+            b = inblossom[v]
+            if label[b] & 4:
+                base = blossombase[b]
+                break
+            path.append(b)
+            label[b] = 5
+            if labelend[b] == -1:
+                # reached a single vertex, stop
+                v = -1
+            else:
+                v = endpoint[labelend[b]]
+                b = inblossom[v]
+                v = endpoint[labelend[b]]
+            if w != -1:
+                v, w = w, v
+        for b in path:
+            label[b] = 1
+        return base
+
+    def add_blossom(base, k):
+        v, w, wt = edges[k]
+        bb = inblossom[base]
+        bv = inblossom[v]
+        bw = inblossom[w]
+        b = unusedblossoms.pop()
+        blossombase[b] = base
+        blossomparent[b] = -1
+        blossomparent[bb] = b
+        blossomchilds[b] = path = []
+        blossomendps[b] = endps = []
+        # trace back from v to base
+        while bv != bb:
+            blossomparent[bv] = b
+            path.append(bv)
+            endps.append(labelend[bv])
+            v = endpoint[labelend[bv]]
+            bv = inblossom[v]
+        path.append(bb)
+        path.reverse()
+        endps.reverse()
+        endps.append(2 * k)
+        # trace back from w to base
+        while bw != bb:
+            blossomparent[bw] = b
+            path.append(bw)
+            endps.append(labelend[bw] ^ 1)
+            w = endpoint[labelend[bw]]
+            bw = inblossom[w]
+        label[b] = 1
+        labelend[b] = labelend[bb]
+        dualvar[b] = 0
+        for v in blossom_leaves(b):
+            if label[inblossom[v]] == 2:
+                # former T-vertices become S-vertices
+                queue.append(v)
+            inblossom[v] = b
+        # compute the least-slack edges to neighbouring S-blossoms
+        bestedgeto = {}
+        for bv in path:
+            if blossombestedges[bv] is None:
+                nblists = [[p // 2 for p in neighbend[v]]
+                           for v in blossom_leaves(bv)]
+            else:
+                nblists = [blossombestedges[bv]]
+            for nblist in nblists:
+                for k in nblist:
+                    i, j, wt = edges[k]
+                    if inblossom[j] == b:
+                        i, j = j, i
+                    bj = inblossom[j]
+                    if (bj != b and label[bj] == 1 and
+                        (bj not in bestedgeto or
+                         slack(k) < slack(bestedgeto[bj]))):
+                        bestedgeto[bj] = k
+            blossombestedges[bv] = None
+            bestedge[bv] = -1
+        blossombestedges[b] = bestedgeto.values()
+        bestedge[b] = -1
+        for k in blossombestedges[b]:
+            if bestedge[b] == -1 or slack(k) < slack(bestedge[b]):
+                bestedge[b] = k
+
+    def expand_blossom(b, endstage):
+        # at the end of the stage, zero-dual sub-blossoms get expanded too
+        stack = [b]
+        while stack:
+            b = stack.pop()
+            for s in blossomchilds[b]:
+                blossomparent[s] = -1
+                if s < nvertex:
+                    inblossom[s] = s
+                elif endstage and dualvar[s] == 0:
+                    stack.append(s)
+                else:
+                    for v in blossom_leaves(s):
+                        inblossom[v] = s
+            if endstage:
+                free_blossom(b)
+        if endstage:
+            return
+
+        if label[b] == 2:
+            # relabel the sub-blossoms on the even path from the entry
+            # child to the base
+            entrychild = inblossom[endpoint[labelend[b] ^ 1]]
+            j = blossomchilds[b].index(entrychild)
+            if j & 1:
+                j -= len(blossomchilds[b])
+                jstep = 1
+                endptrick = 0
+            else:
+                jstep = -1
+                endptrick = 1
+            p = labelend[b]
+            while j != 0:
+                label[endpoint[p ^ 1]] = 0
+                label[endpoint[blossomendps[b][j - endptrick] ^ endptrick ^ 1]] = 0
+                assign_label(endpoint[p ^ 1], 2, p)
+                allowedge[blossomendps[b][j - endptrick] // 2] = True
+                j += jstep
+                p = blossomendps[b][j - endptrick] ^ endptrick
+                allowedge[p // 2] = True
+                j += jstep
+            bv = blossomchilds[b][j]
+            label[endpoint[p ^ 1]] = label[bv] = 2
+            labelend[endpoint[p ^ 1]] = labelend[bv] = p
+            bestedge[bv] = -1
+            j += jstep
+            # the odd path sub-blossoms get labelled only if reachable
+            while blossomchilds[b][j] != entrychild:
+                bv = blossomchilds[b][j]
+                if label[bv] == 1:
+                    j += jstep
+                    continue
+                for v in blossom_leaves(bv):
+                    if label[v] != 0:
+                        break
+                if label[v] != 0:
+                    label[v] = 0
+                    label[endpoint[mate[blossombase[bv]]]] = 0
+                    assign_label(v, 2, labelend[v])
+                j += jstep
+        free_blossom(b)
+
+    def free_blossom(b):
+        label[b] = labelend[b] = -1
+        blossomchilds[b] = blossomendps[b] = None
+        blossombase[b] = -1
+        blossombestedges[b] = None
+        bestedge[b] = -1
+        unusedblossoms.append(b)
+
+    def augment_blossom(b, v):
+        """
+        Swap matched/unmatched edges over the path from v to b's base, and
+        make v the new base. Sub-blossoms on the path are augmented as
+        well; they are independent, so a stack is used instead of recursion.
+        """
+        stack = [(b, v)]
+        while stack:
+            b, v = stack.pop()
+            t = v
+            while blossomparent[t] != b:
+                t = blossomparent[t]
+            if t >= nvertex:
+                stack.append((t, v))
+            i = j = blossomchilds[b].index(t)
+            if i & 1:
+                j -= len(blossomchilds[b])
+                jstep = 1
+                endptrick = 0
+            else:
+                jstep = -1
+                endptrick = 1
+            while j != 0:
+                j += jstep
+                t = blossomchilds[b][j]
+                p = blossomendps[b][j - endptrick] ^ endptrick
+                if t >= nvertex:
+                    stack.append((t, endpoint[p]))
+                j += jstep
+                t = blossomchilds[b][j]
+                if t >= nvertex:
+                    stack.append((t, endpoint[p ^ 1]))
+                mate[endpoint[p]] = p ^ 1
+                mate[endpoint[p ^ 1]] = p
+            # rotate, so v becomes the new base
+            blossomchilds[b] = blossomchilds[b][i:] + blossomchilds[b][:i]
+            blossomendps[b] = blossomendps[b][i:] + blossomendps[b][:i]
+            blossombase[b] = v
+
+    def augment_matching(k):
+        v, w, wt = edges[k]
+        for s, p in ((v, 2 * k + 1), (w, 2 * k)):
+            while True:
+                bs = inblossom[s]
+                if bs >= nvertex:
+                    augment_blossom(bs, s)
+                mate[s] = p
+                if labelend[bs] == -1:
+                    # reached the single vertex, stop
+                    break
+                t = endpoint[labelend[bs]]
+                bt = inblossom[t]
+                s = endpoint[labelend[bt]]
+                j = endpoint[labelend[bt] ^ 1]
+                if bt >= nvertex:
+                    augment_blossom(bt, j)
+                mate[j] = labelend[bt]
+                p = labelend[bt] ^ 1
+
+    # Start with a greedy matching of the edges that are tight under the
+    # initial duals (weight == maxweight). All invariants still hold, and
+    # it saves most of the stages when lots of pairs have the best weight.
+    for k, (i, j, w) in enumerate(edges):
+        if w == maxweight and mate[i] == -1 and mate[j] == -1 and i != j:
+            mate[i] = 2 * k + 1
+            mate[j] = 2 * k
+
+    # each stage augments the matching by one edge
+    stages = mate.count(-1) // 2 + 1
+    for stage in xrange(nvertex):
+        if progress is not None:
+            progress(stage, stages)
+        label[:] = (2 * nvertex) * [0]
+        bestedge[:] = (2 * nvertex) * [-1]
+        blossombestedges[nvertex:] = nvertex * [None]
+        allowedge[:] = nedge * [False]
+        queue[:] = []
+
+        for v in xrange(nvertex):
+            if mate[v] == -1 and label[inblossom[v]] == 0:
+                assign_label(v, 1, -1)
+
+        augmented = False
+        while True:
+            # grow the alternating forest from S-vertices
+            while queue and not augmented:
+                v = queue.pop()
+                for p in neighbend[v]:
+                    k = p // 2
+                    w = endpoint[p]
+                    if inblossom[v] == inblossom[w]:
+                        continue
+                    if not allowedge[k]:
+                        kslack = slack(k)
+                        if kslack <= 0:
+                            allowedge[k] = True
+                    if allowedge[k]:
+                        if label[inblossom[w]] == 0:
+                            assign_label(w, 2, p ^ 1)
+                        elif label[inblossom[w]] == 1:
+                            base = scan_blossom(v, w)
+                            if base >= 0:
+                                add_blossom(base, k)
+                            else:
+                                augment_matching(k)
+                                augmented = True
+                                break
+                        elif label[w] == 0:
+                            # w is inside a T-blossom, but not yet reached
+                            label[w] = 2
+                            labelend[w] = p ^ 1
+                    elif label[inblossom[w]] == 1:
+                        b = inblossom[v]
+                        if bestedge[b] == -1 or kslack < slack(bestedge[b]):
+                            bestedge[b] = k
+                    elif label[w] == 0:
+                        if bestedge[w] == -1 or kslack < slack(bestedge[w]):
+                            bestedge[w] = k
+
+            if augmented:
+                break
+
+            # no augmenting path under current duals, compute the dual change
+            deltatype = -1
+            delta = deltaedge = deltablossom = None
+
+            if not maxcardinality:
+                deltatype = 1
+                delta = min(dualvar[:nvertex])
+
+            for v in xrange(nvertex):
+                if label[inblossom[v]] == 0 and bestedge[v] != -1:
+                    d = slack(bestedge[v])
+                    if deltatype == -1 or d < delta:
+                        delta = d
+                        deltatype = 2
+                        deltaedge = bestedge[v]
+
+            for b in xrange(2 * nvertex):
+                if (blossomparent[b] == -1 and label[b] == 1 and
+                    bestedge[b] != -1):
+                    d = slack(bestedge[b]) // 2
+                    if deltatype == -1 or d < delta:
+                        delta = d
+                        deltatype = 3
+                        deltaedge = bestedge[b]
+
+            for b in xrange(nvertex, 2 * nvertex):
+                if (blossombase[b] >= 0 and blossomparent[b] == -1 and
+                    label[b] == 2 and
+                    (deltatype == -1 or dualvar[b] < delta)):
+                    delta = dualvar[b]
+                    deltatype = 4
+                    deltablossom = b
+
+            if deltatype == -1:
+                # no further improvement possible, max cardinality reached
+                deltatype = 1
+                delta = max(0, min(dualvar[:nvertex]))
+
+            for v in xrange(nvertex):
+                if label[inblossom[v]] == 1:
+                    dualvar[v] -= delta
+                elif label[inblossom[v]] == 2:
+                    dualvar[v] += delta
+            for b in xrange(nvertex, 2 * nvertex):
+                if blossombase[b] >= 0 and blossomparent[b] == -1:
+                    if label[b] == 1:
+                        dualvar[b] += delta
+                    elif label[b] == 2:
+                        dualvar[b] -= delta
+
+            if deltatype == 1:
+                # optimum reached
+                break
+            elif deltatype == 2:
+                allowedge[deltaedge] = True
+                i, j, wt = edges[deltaedge]
+                if label[inblossom[i]] == 0:
+                    i, j = j, i
+                queue.append(i)
+            elif deltatype == 3:
+                allowedge[deltaedge] = True
+                i, j, wt = edges[deltaedge]
+                queue.append(i)
+            elif deltatype == 4:
+                expand_blossom(deltablossom, False)
+
+        if not augmented:
+            break
+
+        # expand S-blossoms with zero dual at the end of the stage
+        for b in xrange(nvertex, 2 * nvertex):
+            if (blossomparent[b] == -1 and blossombase[b] >= 0 and
+                label[b] == 1 and dualvar[b] == 0):
+                expand_blossom(b, True)
+
+    for v in xrange(nvertex):
+        if mate[v] >= 0:
+            mate[v] = endpoint[mate[v]]
+
+    return mate
@@ -0,0 +1,279 @@
+"""
+Result entry over the local network.
+
+A small HTTP server (standard library only, so it runs offline on the
+venue network) lets several stations enter the results of the current
+round at once:
+
+    GET  /              - the result entry page for the stations
+    GET  /round         - the current round with all its tables
+    GET  /tables/<n>    - one table
+    POST /tables/<n>    - record the result, body is JSON
+                          {"round": 1, "version": 0,
+                           "a": [tp, cp, kp, faction], "b": [...]}
+                          faction may be omitted (or null), the player's
+                          first faction is used then
+
+Every table has a version, raised with every recorded result. A result
+sent with an older version than the current one is refused (409), so a
+station never overwrites a result it did not see. Rounds are numbered
+from 1.
+
+All access to the tournament goes through ResultDesk, under its lock.
+"""
+
+import json
+import threading
+import BaseHTTPServer
+import SocketServer
+
+from controller import TournamentException, UnknownTable
+
+
+class StaleResult(TournamentException):
+    pass
+
+class InvalidResult(TournamentException):
+    pass
+
+
+class ResultDesk(object):
+    """
+    Result entry of the current round, shared by the GUI and the stations.
+
+    Anything changing the tournament while the server runs has to hold
+    .lock. Listeners are called as listener(rnd, table) after a result
+    is recorded, in the thread that recorded it.
+    """
+
+    def __init__(self, tournament):
+        self.tournament = tournament
+        self.lock = threading.RLock()
+        # (round, table) -> version
+        self.versions = {}
+        self.listeners = []
+
+    def set_tournament(self, tournament):
+        with self.lock:
+            self.tournament = tournament
+            self.versions = {}
+
+    def _table(self, rnd, table):
+        pA, pB = self.tournament.pairings[rnd][table]
+        players = []
+        for p in (pA, pB):
+            player = {"uid": p.uid, "name": p.name, "factions": p.factions,
+                      "result": None}
+            if p.has_result(rnd):
+                player["result"] = p.result(rnd)[:3]
+            players.append(player)
+        # the faction a player used is stored with his opponent
+        for player, opponent in ((players[0], pB), (players[1], pA)):
+            if player["result"] is not None:
+                player["result"] = list(player["result"]) + [opponent.result(rnd)[3]]
+        return {"table": table, "version": self.versions.get((rnd, table), 0),
+                "a": players[0], "b": players[1]}
+
+    def round(self):
+        with self.lock:
+            rnd = self.tournament.current_round
+            if rnd < 0:
+                return {"round": 0, "tables": []}
+            tables = sorted(self.tournament.pairings[rnd])
+            return {"round": rnd + 1,
+                    "tables": [self._table(rnd, table) for table in tables]}
+
+    def table(self, table):
+        with self.lock:
+            rnd = self.tournament.current_round
+            if rnd < 0 or table not in self.tournament.pairings[rnd]:
+                raise UnknownTable("No table %s in the current round" % table)
+            return dict(self._table(rnd, table), round = rnd + 1)
+
+    def submit(self, rnd, table, result_a, result_b, version = None):
+        """
+        Record the result of the table in round `rnd` (0-based, has to be
+        the current one). Unless `version` is None, it has to be the current
+        version of the table. Returns the new version.
+        """
+        with self.lock:
+            t = self.tournament
+            if rnd != t.current_round:
+                raise StaleResult("Round %s is not the current round" % (rnd + 1))
+            if table not in t.pairings[rnd]:
+                raise UnknownTable("No table %s in the current round" % table)
+            current = self.versions.get((rnd, table), 0)
+            if version is not None and version != current:
+                raise StaleResult("Table %s was changed meanwhile" % table)
+
+            t.record_result(table, result_a, result_b)
+            self.versions[(rnd, table)] = current + 1
+            listeners = list(self.listeners)
+
+        for listener in listeners:
+            listener(rnd, table)
+        return current + 1
+
+
+def _parse_result(value, player):
+    """[tp, cp, kp(, faction)] -> (tp, cp, kp, faction)"""
+    if not isinstance(value, list) or len(value) not in (3, 4):
+        raise InvalidResult("Result has to be [tp, cp, kp, faction]")
+    numbers = value[:3]
+    if not all(isinstance(n, (int, long)) and not isinstance(n, bool) and n >= 0
+               for n in numbers):
+        raise InvalidResult("TP, CP and KP have to be numbers")
+    faction = value[3] if len(value) == 4 else None
+    if faction is None:
+        faction = player.factions[0]
+    elif faction not in player.factions:
+        raise InvalidResult("%s does not play %s" % (player.name, faction))
+    return tuple(numbers) + (faction,)
+
+
+class ResultHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def _send(self, code, data, content_type = "application/json"):
+        if content_type == "application/json":
+            data = json.dumps(data)
+        self.send_response(code)
+        self.send_header("Content-Type", "%s; charset=utf-8" % content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _table_number(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "tables" and parts[1].isdigit():
+            return int(parts[1])
+        return None
+
+    def do_GET(self):
+        desk = self.server.desk
+        try:
+            if self.path == "/":
+                self._send(200, PAGE, "text/html")
+            elif self.path == "/round":
+                self._send(200, desk.round())
+            elif self._table_number() is not None:
+                self._send(200, desk.table(self._table_number()))
+            else:
+                self._send(404, {"error": "Not found"})
+        except UnknownTable as e:
+            self._send(404, {"error": "%s" % e})
+
+    def do_POST(self):
+        desk = self.server.desk
+        table = self._table_number()
+        if table is None:
+            self._send(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.getheader("Content-Length") or 0)
+            data = json.loads(self.rfile.read(length))
+            rnd = int(data["round"]) - 1
+            version = int(data["version"])
+            with desk.lock:
+                current = desk.tournament.current_round
+                pairs = desk.tournament.pairings[current] if current >= 0 else {}
+                if rnd == current and table in pairs:
+                    pA, pB = pairs[table]
+                    result_a = _parse_result(data["a"], pA)
+                    result_b = _parse_result(data["b"], pB)
+                else:
+                    result_a = result_b = None
+                version = desk.submit(rnd, table, result_a, result_b, version)
+        except (ValueError, KeyError, TypeError, InvalidResult) as e:
+            self._send(400, {"error": "%s" % e})
+        except UnknownTable as e:
+            self._send(404, {"error": "%s" % e})
+        except StaleResult as e:
+            self._send(409, {"error": "%s" % e, "round": desk.round()["round"]})
+        else:
+            self._send(200, {"table": table, "version": version})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ResultServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, desk, address):
+        BaseHTTPServer.HTTPServer.__init__(self, address, ResultHandler)
+        self.desk = desk
+
+
+def start(desk, host = "", port = 8080):
+    """Start the server in a background thread, stop it by .shutdown()."""
+    server = ResultServer(desk, (host, port))
+    thread = threading.Thread(target = server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Results</title>
+<meta name="viewport" content="width=device-width">
+<style>body{font-family:sans-serif} input{width:4em} td{padding:2px 6px}</style>
+</head><body>
+<h2>Round <span id="round"></span></h2>
+<p>Table <input id="table" type="number" min="1"> <button onclick="load()">Open</button></p>
+<table id="form" hidden>
+<tr><th></th><th>Player</th><th>Faction</th><th>TP</th><th>CP</th><th>KP</th></tr>
+<tr><td>A</td><td id="a_name"></td><td><select id="a_faction"></select></td>
+<td><input id="a_tp"></td><td><input id="a_cp"></td><td><input id="a_kp"></td></tr>
+<tr><td>B</td><td id="b_name"></td><td><select id="b_faction"></select></td>
+<td><input id="b_tp"></td><td><input id="b_cp"></td><td><input id="b_kp"></td></tr>
+<tr><td></td><td><button onclick="save()">Save</button></td></tr>
+</table>
+<p id="message"></p>
+<script>
+var current = null;
+function $(id) { return document.getElementById(id); }
+function request(method, url, body, done) {
+  var r = new XMLHttpRequest();
+  r.open(method, url);
+  r.onload = function() { done(r.status, JSON.parse(r.responseText)); };
+  r.send(body ? JSON.stringify(body) : null);
+}
+function load() {
+  request("GET", "/tables/" + $("table").value, null, function(status, data) {
+    if (status != 200) { $("message").textContent = data.error; $("form").hidden = true; return; }
+    current = data;
+    $("round").textContent = data.round;
+    ["a", "b"].forEach(function(s) {
+      var p = data[s], select = $(s + "_faction");
+      $(s + "_name").textContent = p.uid + " " + p.name;
+      select.innerHTML = "";
+      p.factions.forEach(function(f) { select.add(new Option(f, f)); });
+      ["tp", "cp", "kp"].forEach(function(k, i) { $(s + "_" + k).value = p.result ? p.result[i] : ""; });
+      if (p.result) select.value = p.result[3];
+    });
+    $("form").hidden = false;
+    $("message").textContent = data.a.result ? "Result already entered, saving changes it." : "";
+  });
+}
+function save() {
+  var body = {round: current.round, version: current.version};
+  ["a", "b"].forEach(function(s) {
+    body[s] = ["tp", "cp", "kp"].map(function(k) { return parseInt($(s + "_" + k).value, 10); });
+    body[s].push($(s + "_faction").value);
+  });
+  request("POST", "/tables/" + current.table, body, function(status, data) {
+    if (status == 200) { $("message").textContent = "Table " + data.table + " saved."; $("form").hidden = true; $("table").value = ""; }
+    else if (status == 409) { $("message").textContent = data.error + ", reloaded."; load(); }
+    else { $("message").textContent = data.error; }
+  });
+}
+request("GET", "/round", null, function(status, data) { $("round").textContent = data.round; });
+</script>
+</body></html>
+"""
@@ -0,0 +1,167 @@
+"""
+Columnar storage of the tournament results.
+"""
+
+from array import array
+
+# state of a player in a round
+NOT_PAIRED = 0
+GAME = 1
+BYE = 2
+
+
+class ResultStore(object):
+    """
+    Results of all the players of a tournament.
+
+    Every player gets an integer index, and every round is a set of columns
+    (arrays indexed by the player index):
+        state     - NOT_PAIRED, GAME or BYE
+        opponent  - index of the opponent, -1 if none
+        table     - table number, 0 if none
+        tp/cp/kp  - points gained in the round
+        faction   - id of the faction the opponent used, -1 if unknown
+        reported  - 1 if the result is filled
+    Running totals of TP, CP, KP and the strength of schedule (sum of TPs
+    of the player's opponents) are kept in arrays too, and updated on every
+    change, so reading them is O(1).
+    """
+
+    COLUMNS = (("state", "b", NOT_PAIRED), ("opponent", "i", -1),
+               ("table", "i", 0), ("tp", "i", 0), ("cp", "i", 0),
+               ("kp", "i", 0), ("faction", "h", -1), ("reported", "b", 0))
+
+    def __init__(self):
+        self.players = []
+        self.rounds = []
+        self.tp = array("i")
+        self.cp = array("i")
+        self.kp = array("i")
+        self.sos = array("i")
+        self.factions = []
+        self.faction_ids = {}
+
+    def __len__(self):
+        return len(self.players)
+
+    def faction_id(self, faction):
+        if faction is None:
+            return -1
+        if faction not in self.faction_ids:
+            self.faction_ids[faction] = len(self.factions)
+            self.factions.append(faction)
+        return self.faction_ids[faction]
+
+    def faction_name(self, fid):
+        if fid < 0:
+            return None
+        return self.factions[fid]
+
+    def add_player(self, p):
+        self.add_players([p])
+
+    def add_players(self, players):
+        """Give the players their indexes, and extend all the columns."""
+        for p in players:
+            p.index = len(self.players)
+            p._store = self
+            self.players.append(p)
+        n = len(players)
+        for totals in (self.tp, self.cp, self.kp, self.sos):
+            totals.extend(array("i", [0]) * n)
+        for columns in self.rounds:
+            for name, typecode, default in self.COLUMNS:
+                columns[name].extend(array(typecode, [default]) * n)
+
+    def add_round(self):
+        n = len(self.players)
+        columns = {}
+        for name, typecode, default in self.COLUMNS:
+            columns[name] = array(typecode, [default]) * n
+        self.rounds.append(columns)
+        return len(self.rounds) - 1
+
+    def add_game(self, rnd, a, b, table):
+        """Pair players a and b on the table, opponent's TPs count to SoS."""
+        columns = self.rounds[rnd]
+        for i, j in ((a, b), (b, a)):
+            columns["state"][i] = GAME
+            columns["opponent"][i] = j
+            columns["table"][i] = table
+            self.sos[i] += self.tp[j]
+
+    def add_bye(self, rnd, i, tp, cp, kp):
+        self.rounds[rnd]["state"][i] = BYE
+        self.set_result(rnd, i, tp, cp, kp)
+
+    def set_result(self, rnd, i, tp, cp, kp, faction = None):
+        """
+        Fill (or overwrite) the player's result of the round, and update
+        the totals, including SoS of everybody who played him.
+        """
+        columns = self.rounds[rnd]
+        d_tp = tp - columns["tp"][i]
+        self.tp[i] += d_tp
+        self.cp[i] += cp - columns["cp"][i]
+        self.kp[i] += kp - columns["kp"][i]
+        columns["tp"][i] = tp
+        columns["cp"][i] = cp
+        columns["kp"][i] = kp
+        columns["faction"][i] = self.faction_id(faction)
+        columns["reported"][i] = 1
+
+        if d_tp:
+            for j in self.opponents(i):
+                if j >= 0:
+                    self.sos[j] += d_tp
+
+    def opponents(self, i):
+        return [columns["opponent"][i] for columns in self.rounds]
+
+    def played(self, i):
+        """Rounds in which the player was paired or had a bye."""
+        return [r for r, columns in enumerate(self.rounds)
+                if columns["state"][i] != NOT_PAIRED]
+
+    def reported(self, rnd, i):
+        return bool(self.rounds[rnd]["reported"][i])
+
+    def credited(self, rnd):
+        """{index: (tp, cp, kp)} of the players with a result in the round
+        without playing it (late registration)."""
+        columns = self.rounds[rnd]
+        state, reported = columns["state"], columns["reported"]
+        return dict((i, (columns["tp"][i], columns["cp"][i], columns["kp"][i]))
+                    for i in xrange(len(self.players))
+                    if state[i] == NOT_PAIRED and reported[i])
+
+    def prefix(self, count):
+        """
+        Store of the first `count` rounds (sharing the players and the round
+        columns) with its own totals, i.e. the state after round count - 1.
+        """
+        store = ResultStore()
+        store.players = self.players
+        store.rounds = self.rounds[:count]
+        store.factions = self.factions
+        store.faction_ids = self.faction_ids
+        store.recompute_totals()
+        return store
+
+    def recompute_totals(self):
+        """Rebuild the running totals from the round columns."""
+        n = len(self.players)
+        for name in ("tp", "cp", "kp"):
+            totals = array("i", [0]) * n
+            if self.rounds:
+                totals = array("i", [sum(col) for col in
+                    zip(*[columns[name] for columns in self.rounds])])
+            setattr(self, name, totals)
+
+        sos = array("i", [0]) * n
+        for columns in self.rounds:
+            opponent = columns["opponent"]
+            for i in xrange(n):
+                if opponent[i] >= 0:
+                    sos[i] += self.tp[opponent[i]]
+        self.sos = sos
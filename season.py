@@ -0,0 +1,332 @@
+"""
+Season rankings across many tournaments.
+
+A season is an SQLite database. Every added event contributes one entry per
+player, and the running totals of the players and their faction stats are
+updated right then, so ranking queries read only the totals and never the
+events themselves:
+
+    events    id, name, players, rounds, added
+    players   pid, identity, name, country
+    entries   event, pid, rank, points, tp, sos, cp, kp, games, wins
+    entry_factions  event, pid, faction, games, wins
+    totals    pid, events, points, tp, sos, cp, kp, games, wins, best_rank
+    factions  pid, faction, games, wins
+
+UIDs are per event, so players are matched across events by identity(),
+their name and country. Different spellings of the same player are joined
+by alias().
+
+    python season.py season.sqlite add save.sqlite --name "Masters 2013"
+    python season.py season.sqlite standings --top 20
+"""
+
+import sys
+import time
+import argparse
+import sqlite3
+
+import storage
+from controller import TournamentException
+from lookup import normalize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, name TEXT UNIQUE,
+    players INTEGER, rounds INTEGER, added REAL);
+CREATE TABLE IF NOT EXISTS players (pid INTEGER PRIMARY KEY,
+    identity TEXT UNIQUE, name TEXT, country TEXT);
+CREATE TABLE IF NOT EXISTS aliases (identity TEXT PRIMARY KEY, pid INTEGER);
+CREATE TABLE IF NOT EXISTS entries (event INTEGER, pid INTEGER, rank INTEGER,
+    points REAL, tp INTEGER, sos INTEGER, cp INTEGER, kp INTEGER,
+    games INTEGER, wins INTEGER, PRIMARY KEY (event, pid));
+CREATE INDEX IF NOT EXISTS entries_pid ON entries (pid);
+CREATE TABLE IF NOT EXISTS entry_factions (event INTEGER, pid INTEGER,
+    faction TEXT, games INTEGER, wins INTEGER, PRIMARY KEY (event, pid, faction));
+CREATE TABLE IF NOT EXISTS totals (pid INTEGER PRIMARY KEY, events INTEGER,
+    points REAL, tp INTEGER, sos INTEGER, cp INTEGER, kp INTEGER,
+    games INTEGER, wins INTEGER, best_rank INTEGER);
+CREATE INDEX IF NOT EXISTS totals_points ON totals (points DESC, tp DESC, sos DESC);
+CREATE TABLE IF NOT EXISTS factions (pid INTEGER, faction TEXT, games INTEGER,
+    wins INTEGER, PRIMARY KEY (pid, faction));
+"""
+
+# summed into totals
+TOTALS = ("points", "tp", "sos", "cp", "kp", "games", "wins")
+
+
+class UnknownEvent(TournamentException):
+    pass
+
+class DuplicateEvent(TournamentException):
+    pass
+
+class IdentityConflict(TournamentException):
+    pass
+
+
+def identity(name, country = ""):
+    """Key of the player across events: name and country, see
+    lookup.normalize."""
+    return u"%s|%s" % (normalize(name), normalize(country))
+
+
+def field_points(rank, players):
+    """
+    Season points for the `rank` (1-based) among `players`: 100 for the
+    winner, spread evenly down to 100/players for the last one, so events
+    of different sizes weigh the same.
+    """
+    return 100.0 * (players - rank + 1) / players
+
+
+def event_entries(t, scoring = field_points):
+    """
+    Entries of the players of the tournament, as list of dicts with the
+    player's name, country, rank, points (see `scoring`), totals and
+    {faction: (games, wins)}.
+    """
+    ordered = t.standings()
+    entries = []
+    for rank, (p, key) in enumerate(ordered, 1):
+        games = wins = 0
+        factions = {}
+        for rnd, opponent in enumerate(p.opponents_played):
+            if opponent is None or not p.has_result(rnd):
+                continue
+            tp = p.result(rnd)[0]
+            # the faction he used is stored with the opponent
+            faction = opponent.result(rnd)[3] if opponent.has_result(rnd) else None
+            won = int(tp > opponent.result(rnd)[0])
+            games += 1
+            wins += won
+            if faction is not None:
+                played, won_with = factions.get(faction, (0, 0))
+                factions[faction] = (played + 1, won_with + won)
+        entries.append({"name": p.name, "country": p.country, "rank": rank,
+                        "points": scoring(rank, len(ordered)), "tp": p.tp,
+                        "sos": p.sos, "cp": p.cp, "kp": p.kp, "games": games,
+                        "wins": wins, "factions": factions})
+    return entries
+
+
+class Season(object):
+    """
+    Season database `fname`, `scoring(rank, players)` gives the season
+    points of an event result.
+    """
+
+    def __init__(self, fname, scoring = field_points):
+        self.conn = sqlite3.connect(fname)
+        self.conn.executescript(SCHEMA)
+        self.scoring = scoring
+
+    def close(self):
+        self.conn.close()
+
+    def _pid(self, name, country):
+        key = identity(name, country)
+        row = self.conn.execute("SELECT pid FROM aliases WHERE identity = ?",
+                                (key,)).fetchone()
+        if row is None:
+            row = self.conn.execute("SELECT pid FROM players WHERE identity = ?",
+                                    (key,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self.conn.execute("INSERT INTO players (identity, name, country) "
+                                 "VALUES (?, ?, ?)", (key, name, country)).lastrowid
+
+    def add_tournament(self, t, name):
+        """Add the results of the Tournament as the event `name`."""
+        if self.conn.execute("SELECT 1 FROM events WHERE name = ?", (name,)).fetchone():
+            raise DuplicateEvent("Event %s is already in the season" % name)
+
+        entries = event_entries(t, self.scoring)
+        with self.conn:
+            pids = [self._pid(e["name"], e["country"]) for e in entries]
+            if len(set(pids)) < len(pids):
+                twice = [e["name"] for e, pid in zip(entries, pids)
+                         if pids.count(pid) > 1]
+                raise IdentityConflict("%s appears twice in %s" % (twice[0], name))
+            event = self.conn.execute("INSERT INTO events (name, players, rounds, added) "
+                "VALUES (?, ?, ?, ?)", (name, len(entries), len(t.pairings),
+                                        time.time())).lastrowid
+            for e, pid in zip(entries, pids):
+                values = [e[column] for column in TOTALS]
+                self.conn.execute("INSERT INTO entries VALUES (?, ?, ?, %s)" %
+                                  ", ".join("?" * len(TOTALS)),
+                                  [event, pid, e["rank"]] + values)
+                self.conn.executemany("INSERT INTO entry_factions VALUES (?, ?, ?, ?, ?)",
+                    [(event, pid, f, games, wins) for f, (games, wins) in
+                     e["factions"].items()])
+                self._add_totals(pid, values, e["rank"], e["factions"], 1)
+        return event
+
+    def add_file(self, fname, name):
+        """Add the tournament saved in the file (see storage)."""
+        return self.add_tournament(storage.load(fname), name)
+
+    def _add_totals(self, pid, values, rank, factions, sign):
+        self.conn.execute("INSERT OR IGNORE INTO totals VALUES (?, 0, %s, NULL)" %
+                          ", ".join("0" * len(TOTALS)), (pid,))
+        self.conn.execute("UPDATE totals SET events = events + ?, %s WHERE pid = ?" %
+                          ", ".join("%s = %s + ?" % (c, c) for c in TOTALS),
+                          [sign] + [sign * v for v in values] + [pid])
+        if sign > 0:
+            self.conn.execute("UPDATE totals SET best_rank = ? WHERE pid = ? "
+                              "AND (best_rank IS NULL OR best_rank > ?)",
+                              (rank, pid, rank))
+        for faction, (games, wins) in factions.items():
+            self.conn.execute("INSERT OR IGNORE INTO factions VALUES (?, ?, 0, 0)",
+                              (pid, faction))
+            self.conn.execute("UPDATE factions SET games = games + ?, wins = wins + ? "
+                              "WHERE pid = ? AND faction = ?",
+                              (sign * games, sign * wins, pid, faction))
+
+    def _entry_factions(self, event, pid):
+        return dict((f, (games, wins)) for f, games, wins in self.conn.execute(
+            "SELECT faction, games, wins FROM entry_factions "
+            "WHERE event = ? AND pid = ?", (event, pid)))
+
+    def remove_event(self, name):
+        """Take the event out of the season, subtracting it from the totals."""
+        row = self.conn.execute("SELECT id FROM events WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise UnknownEvent("No event %s in the season" % name)
+        event = row[0]
+        with self.conn:
+            for row in self.conn.execute("SELECT pid, rank, %s FROM entries "
+                    "WHERE event = ?" % ", ".join(TOTALS), (event,)).fetchall():
+                pid, rank, values = row[0], row[1], row[2:]
+                self._add_totals(pid, values, rank,
+                                 self._entry_factions(event, pid), -1)
+                # best rank of the remaining events
+                self.conn.execute("UPDATE totals SET best_rank = (SELECT MIN(rank) "
+                    "FROM entries WHERE pid = ? AND event != ?) WHERE pid = ?",
+                    (pid, event, pid))
+            for table in ("entries", "entry_factions"):
+                self.conn.execute("DELETE FROM %s WHERE event = ?" % table, (event,))
+            self.conn.execute("DELETE FROM totals WHERE events = 0")
+            self.conn.execute("DELETE FROM events WHERE id = ?", (event,))
+
+    def alias(self, name, country, same_name, same_country):
+        """
+        Join the player `name` (from `country`) into `same_name`, so his
+        results count to the other one, now and in the events added later.
+        """
+        pid = self._pid(name, country)
+        target = self._pid(same_name, same_country)
+        if pid == target:
+            return
+        if self.conn.execute("SELECT 1 FROM entries a JOIN entries b "
+                "ON a.event = b.event WHERE a.pid = ? AND b.pid = ?",
+                (pid, target)).fetchone():
+            raise IdentityConflict("%s and %s played in the same event" % (name, same_name))
+
+        key = self.conn.execute("SELECT identity FROM players WHERE pid = ?",
+                                (pid,)).fetchone()[0]
+        with self.conn:
+            for row in self.conn.execute("SELECT event, rank, %s FROM entries "
+                    "WHERE pid = ?" % ", ".join(TOTALS), (pid,)).fetchall():
+                event, rank, values = row[0], row[1], row[2:]
+                self._add_totals(target, values, rank,
+                                 self._entry_factions(event, pid), 1)
+            for table in ("entries", "entry_factions"):
+                self.conn.execute("UPDATE %s SET pid = ? WHERE pid = ?" % table,
+                                  (target, pid))
+            for table in ("totals", "factions", "players"):
+                self.conn.execute("DELETE FROM %s WHERE pid = ?" % table, (pid,))
+            self.conn.execute("UPDATE aliases SET pid = ? WHERE pid = ?", (target, pid))
+            self.conn.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?)", (key, target))
+
+    def events(self):
+        return [dict(zip(("name", "players", "rounds"), row)) for row in
+                self.conn.execute("SELECT name, players, rounds FROM events ORDER BY id")]
+
+    def standings(self, top = None, min_events = 1):
+        """
+        Season ranking by points, then TP and SoS, as list of dicts, only
+        the players with at least `min_events` events.
+        """
+        sql = ("SELECT p.name, p.country, t.events, %s, t.best_rank FROM totals t "
+               "JOIN players p ON p.pid = t.pid WHERE t.events >= ? "
+               "ORDER BY t.points DESC, t.tp DESC, t.sos DESC" %
+               ", ".join("t.%s" % c for c in TOTALS))
+        params = [min_events]
+        if top is not None:
+            sql += " LIMIT ?"
+            params.append(top)
+        columns = ("name", "country", "events") + TOTALS + ("best_rank",)
+        return [dict(zip(columns, row)) for row in self.conn.execute(sql, params)]
+
+    def player(self, name, country = ""):
+        """The player's results by event, in order the events were added."""
+        row = self.conn.execute("SELECT pid FROM aliases WHERE identity = ? UNION ALL "
+                                "SELECT pid FROM players WHERE identity = ?",
+                                (identity(name, country),) * 2).fetchone()
+        if row is None:
+            return []
+        columns = ("event", "players", "rank") + TOTALS
+        return [dict(zip(columns, r)) for r in self.conn.execute(
+            "SELECT ev.name, ev.players, e.rank, %s FROM entries e "
+            "JOIN events ev ON ev.id = e.event WHERE e.pid = ? ORDER BY ev.id" %
+            ", ".join("e.%s" % c for c in TOTALS), (row[0],))]
+
+    def factions(self):
+        """Games and wins by faction over the season, most played first."""
+        return [dict(zip(("faction", "games", "wins", "players"), row)) for row in
+                self.conn.execute("SELECT faction, SUM(games), SUM(wins), COUNT(*) "
+                                  "FROM factions WHERE games > 0 GROUP BY faction "
+                                  "ORDER BY SUM(games) DESC")]
+
+
+def _out(line = u""):
+    sys.stdout.write((u"%s\n" % line).encode("utf-8"))
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Season rankings across tournaments.")
+    parser.add_argument("season", help = "season database")
+    commands = parser.add_subparsers(dest = "command")
+
+    p = commands.add_parser("add", help = "add a saved tournament")
+    p.add_argument("file")
+    p.add_argument("--name", required = True, type = lambda s: s.decode("utf-8"))
+
+    p = commands.add_parser("standings", help = "print the season ranking")
+    p.add_argument("--top", type = int)
+    p.add_argument("--min-events", type = int, default = 1)
+
+    p = commands.add_parser("player", help = "print results of a player")
+    p.add_argument("name", type = lambda s: s.decode("utf-8"))
+    p.add_argument("--country", default = u"", type = lambda s: s.decode("utf-8"))
+
+    commands.add_parser("factions", help = "print the faction stats")
+    args = parser.parse_args(argv)
+
+    season = Season(args.season)
+    try:
+        if args.command == "add":
+            season.add_file(args.file, args.name)
+            _out(u"%s added, %s events" % (args.name, len(season.events())))
+        elif args.command == "standings":
+            for rank, r in enumerate(season.standings(args.top, args.min_events), 1):
+                _out(u"%s\t%s\t%s\t%s\t%.1f\t%s\t%s" % (rank, r["name"], r["country"],
+                     r["events"], r["points"], r["tp"], r["sos"]))
+        elif args.command == "player":
+            for r in season.player(args.name, args.country):
+                _out(u"%s\t%s/%s\t%.1f\t%s" % (r["event"], r["rank"], r["players"],
+                                               r["points"], r["tp"]))
+        elif args.command == "factions":
+            for r in season.factions():
+                _out(u"%s\t%s\t%s\t%.1f %%" % (r["faction"], r["games"], r["wins"],
+                                               100.0 * r["wins"] / r["games"]))
+    except TournamentException as e:
+        sys.stderr.write((u"error: %s\n" % e).encode("utf-8"))
+        return 1
+    finally:
+        season.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
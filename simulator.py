@@ -0,0 +1,202 @@
+"""
+Monte Carlo simulation of whole tournaments.
+
+Plays many synthetic tournaments (see synthetic) through the Tournament API,
+to choose the number of rounds, the bye policy or the pairing penalties
+before an event. For each setting it reports, per tournament:
+    rematches   - games of players who already played each other
+    same_team   - games of teammates
+    undefeated  - players who won all the rounds
+    stability   - rank correlation of the standings after the last two
+                  rounds, 1.0 means the last round changed nothing
+    top         - share of the top players (--top) after the previous round
+                  that stay on top after the last one
+
+Results of the games are either coin flips ("random"), or decided by hidden
+skills, the better player winning with the Elo-like probability ("elo",
+--spread of the skills, see synthetic.ResultGenerator).
+
+Tournament i is played with seed `seed + i` whichever worker plays it, so
+the results don't depend on the number of workers, and any tournament can
+be replayed alone. The tournaments are spread over a process pool in
+chunks:
+
+    python simulator.py --players 64 --rounds 5 --runs 2000
+    python simulator.py --players 65 --bye-policy lowest --penalty SAME_TEAM=500
+"""
+
+import sys
+import json
+import math
+import argparse
+import multiprocessing
+
+import pairing
+import synthetic
+from controller import Tournament
+
+MODELS = ("random", "elo")
+STATS = ("rematches", "same_team", "undefeated", "stability", "top")
+
+# FieldGenerator of the worker process, reading the roster once
+_field = None
+
+
+def _init_worker(penalties):
+    """Set the pairing penalties ({name: value}) in the worker process."""
+    global _field
+    _field = synthetic.FieldGenerator()
+    for name, value in penalties.items():
+        setattr(pairing, name, value)
+
+
+def _ranks(ordered):
+    return dict((p.uid, rank) for rank, (p, key) in enumerate(ordered))
+
+
+def rank_correlation(before, after):
+    """Spearman's rank correlation of two standings of the same players."""
+    n = len(after)
+    if n < 2:
+        return 1.0
+    rank = _ranks(before)
+    d2 = sum((rank[p.uid] - i) ** 2 for i, (p, key) in enumerate(after))
+    return 1 - 6.0 * d2 / (n * (n * n - 1))
+
+
+def play(players, rounds, seed, engine = "blossom", bye_policy = "random",
+         model = "elo", spread = 1.0, top = 8, field = None):
+    """Play one tournament, returns dict of STATS."""
+    field = field or synthetic.FieldGenerator()
+    t = Tournament(field.players(players, seed), players / 2,
+                   pairing_engine = engine, seed = seed, bye_policy = bye_policy)
+    games = synthetic.ResultGenerator(seed, spread if model == "elo" else 0)
+
+    rematches = same_team = 0
+    for rnd in range(rounds):
+        t.create_pairings()
+        earlier = t.results.rounds[:rnd]
+        for pA, pB in t.pairings[rnd].values():
+            if any(columns["opponent"][pA.index] == pB.index for columns in earlier):
+                rematches += 1
+            if pA.team and pA.team == pB.team:
+                same_team += 1
+        games.play_round(t)
+
+    final = t.standings()
+    if rounds > 1:
+        previous = t.round_standings(rounds - 2)
+    else:
+        previous = final
+    top_before = set(p.uid for p, key in previous[:top])
+    top_after = set(p.uid for p, key in final[:top])
+    return {"rematches": rematches, "same_team": same_team,
+            "undefeated": sum(1 for p in t.results.players if p.tp == rounds),
+            "stability": rank_correlation(previous, final),
+            "top": len(top_before & top_after) / float(max(len(top_after), 1))}
+
+
+def _play_chunk(args):
+    settings, seeds = args
+    return [play(seed = seed, field = _field, **settings) for seed in seeds]
+
+
+def simulate(runs, seed = 1, workers = None, chunk = 20, penalties = None,
+             **settings):
+    """
+    Play `runs` tournaments with seeds seed..seed+runs-1 in `workers`
+    processes (all the CPUs by default), `settings` being the arguments of
+    play(). Returns list of STATS dicts, in the order of the seeds.
+    """
+    seeds = range(seed, seed + runs)
+    chunks = [(settings, seeds[i:i + chunk]) for i in range(0, runs, chunk)]
+    pool = multiprocessing.Pool(workers, _init_worker, (penalties or {},))
+    try:
+        results = pool.map(_play_chunk, chunks)
+    finally:
+        pool.close()
+        pool.join()
+    return [stats for chunk_stats in results for stats in chunk_stats]
+
+
+def summary(results):
+    """{stat: {"mean", "stdev", "min", "max"}}, and share of the tournaments
+    without rematches and with a single undefeated player."""
+    n = len(results)
+    stats = {}
+    for name in STATS:
+        values = [r[name] for r in results]
+        mean = sum(values) / float(n)
+        variance = sum((v - mean) ** 2 for v in values) / max(n - 1, 1)
+        stats[name] = {"mean": mean, "stdev": math.sqrt(variance),
+                       "min": min(values), "max": max(values)}
+    stats["no_rematch"] = sum(1 for r in results if not r["rematches"]) / float(n)
+    stats["one_undefeated"] = sum(1 for r in results if r["undefeated"] == 1) / float(n)
+    return stats
+
+
+def report(stats, runs):
+    print "%d tournaments" % runs
+    print "  %-12s %8s %8s %8s %8s" % ("", "mean", "stdev", "min", "max")
+    for name in STATS:
+        s = stats[name]
+        print "  %-12s %8.3f %8.3f %8.3f %8.3f" % (name, s["mean"], s["stdev"],
+                                                s["min"], s["max"])
+    print "  without rematches   %5.1f %%" % (100 * stats["no_rematch"])
+    print "  single undefeated   %5.1f %%" % (100 * stats["one_undefeated"])
+
+
+def penalty(value):
+    """NAME=points, NAME being one of the penalties in pairing"""
+    name, _, points = value.partition("=")
+    if name not in ("REMATCH", "SAME_TEAM", "FACTION_PLAYED", "SAME_FACTION",
+                    "SCORE_GROUP"):
+        raise argparse.ArgumentTypeError("unknown penalty %s" % name)
+    try:
+        return name, int(points)
+    except ValueError:
+        raise argparse.ArgumentTypeError("penalty %s is not a number" % name)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Simulate many tournaments.")
+    parser.add_argument("--players", type = int, default = 64)
+    parser.add_argument("--rounds", type = int, default = 5)
+    parser.add_argument("--runs", type = int, default = 1000)
+    parser.add_argument("--seed", type = int, default = 1)
+    parser.add_argument("--workers", type = int, help = "default: number of CPUs")
+    parser.add_argument("--chunk", type = int, default = 20,
+                        help = "tournaments sent to a worker at once")
+    parser.add_argument("--engine", default = "blossom",
+                        choices = sorted(pairing.PAIRING_ENGINES))
+    parser.add_argument("--bye-policy", default = "random",
+                        choices = ("random", "lowest", "fewest"))
+    parser.add_argument("--model", default = "elo", choices = MODELS)
+    parser.add_argument("--spread", type = float, default = 1.0,
+                        help = "spread of the player skills of the elo model")
+    parser.add_argument("--top", type = int, default = 8)
+    parser.add_argument("--penalty", type = penalty, action = "append", default = [],
+                        metavar = "NAME=POINTS", help = "override a pairing penalty")
+    parser.add_argument("--save", help = "write the results to a JSON file")
+    args = parser.parse_args(argv)
+
+    settings = {"players": args.players, "rounds": args.rounds,
+                "engine": args.engine, "bye_policy": args.bye_policy,
+                "model": args.model, "spread": args.spread, "top": args.top}
+    penalties = dict(args.penalty)
+    results = simulate(args.runs, args.seed, args.workers, args.chunk,
+                       penalties, **settings)
+    s = summary(results)
+    report(s, args.runs)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"settings": settings, "penalties": penalties,
+                       "runs": args.runs, "seed": args.seed,
+                       "summary": s, "results": results},
+                      f, indent = 1, sort_keys = True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Standings and tie-breakers.
+
+Tie-breakers are computed for the whole field at once from the columns of
+the ResultStore, and the players are ordered by a single sort on the key
+tuples.
+"""
+
+from array import array
+
+DEFAULT_TIEBREAKERS = ("tp", "sos", "cp", "kp")
+
+
+def opponents_sos(store):
+    """Sum of the strength of schedule of the player's opponents."""
+    osos = array("i", [0]) * len(store.players)
+    sos = store.sos
+    for columns in store.rounds:
+        opponent = columns["opponent"]
+        for i, j in enumerate(opponent):
+            if j >= 0:
+                osos[i] += sos[j]
+    return osos
+
+
+TIEBREAKERS = {
+    "tp": lambda store: store.tp,
+    "sos": lambda store: store.sos,
+    "cp": lambda store: store.cp,
+    "kp": lambda store: store.kp,
+    "osos": opponents_sos,
+}
+
+
+def head_to_head(store, a, b):
+    """Number of games player a won against b, minus games he lost."""
+    return _head_to_head(store.rounds, a, b)
+
+
+def _head_to_head(rounds, a, b):
+    score = 0
+    for columns in rounds:
+        if columns["opponent"][a] == b and columns["reported"][a]:
+            tp = columns["tp"]
+            score += cmp(tp[a], tp[b])
+    return score
+
+
+def order(store, players, tiebreakers = DEFAULT_TIEBREAKERS, h2h = False,
+          rng = None):
+    """
+    Order the players by the tie-breakers, all in descending order.
+
+    If `h2h` is set, two players equal in all the tie-breakers are ordered
+    by the result of their games. Players still equal are ordered randomly
+    when `rng` is given, in order of registration otherwise.
+
+    Returns list of (player, key) tuples, key being the tuple of the
+    tie-breaker values.
+    """
+    columns = [TIEBREAKERS[name](store) for name in tiebreakers]
+    keys = zip(*columns)
+    if not keys:
+        keys = [()] * len(store.players)
+
+    if rng is not None:
+        last = dict((p.index, rng.random()) for p in players)
+    else:
+        last = dict((p.index, -p.index) for p in players)
+
+    ordered = sorted(players, key = lambda p: (keys[p.index], last[p.index]),
+                     reverse = True)
+
+    if h2h:
+        indexes = [p.index for p in ordered]
+        _order_pairs(store.rounds, indexes, keys)
+        ordered = [store.players[i] for i in indexes]
+
+    return [(p, keys[p.index]) for p in ordered]
+
+
+def _order_pairs(rounds, ordered, keys):
+    """
+    Order each two players (indexes in `ordered`, changed in place) equal
+    in all the tie-breakers (`keys` by index) by the result of their games.
+    """
+    i = 0
+    while i < len(ordered):
+        j = i + 1
+        while j < len(ordered) and keys[ordered[j]] == keys[ordered[i]]:
+            j += 1
+        if j - i == 2:
+            a, b = ordered[i], ordered[i + 1]
+            if _head_to_head(rounds, b, a) > 0:
+                ordered[i], ordered[i + 1] = b, a
+        i = j
+
+
+class Snapshot(object):
+    """
+    Standings at one moment (typically after a round), kept compactly as
+    arrays: the player indexes in order, the tie-breaker values (one array
+    per tie-breaker) and the totals of TP, SoS, CP and KP by player index.
+
+    Players registered after the snapshot are not in it.
+    """
+
+    TOTALS = ("tp", "sos", "cp", "kp")
+
+    __slots__ = ("order", "keys", "totals")
+
+    def __init__(self, store, ordered):
+        self.order = array("i", [p.index for p, key in ordered])
+        width = len(ordered[0][1]) if ordered else 0
+        self.keys = [array("i", [key[k] for p, key in ordered])
+                     for k in range(width)]
+        self.totals = dict((name, array("i", getattr(store, name)))
+                           for name in self.TOTALS)
+
+    def __len__(self):
+        return len(self.order)
+
+    def rows(self, players):
+        """
+        List of (player, key) like order() returns, `players` being the
+        players by index (ResultStore.players).
+        """
+        keys = zip(*self.keys) or [()] * len(self.order)
+        return [(players[i], key) for i, key in zip(self.order, keys)]
+
+    def total(self, name, p):
+        return self.totals[name][p.index]
+
+    def amend(self, rounds, deltas, tiebreakers = DEFAULT_TIEBREAKERS,
+              h2h = False):
+        """
+        Count a corrected result into the snapshot, `rounds` being the round
+        columns up to the snapshot and `deltas` {player index: (tp, cp, kp)
+        difference}. Only the values the result counts into are updated:
+        the totals of the players, SoS of their opponents and OSoS of the
+        opponents' opponents. The players are then ordered again, like by
+        order() without `rng`.
+        """
+        changed = dict((name, {}) for name in ("tp", "cp", "kp", "sos", "osos"))
+        for i, diff in deltas.items():
+            for name, value in zip(("tp", "cp", "kp"), diff):
+                changed[name][i] = changed[name].get(i, 0) + value
+        for columns in rounds:
+            opponent = columns["opponent"]
+            for i, diff in deltas.items():
+                j = opponent[i]
+                if j >= 0:
+                    changed["sos"][j] = changed["sos"].get(j, 0) + diff[0]
+        if "osos" in tiebreakers:
+            for columns in rounds:
+                opponent = columns["opponent"]
+                for j, diff in changed["sos"].items():
+                    k = opponent[j]
+                    if k >= 0:
+                        changed["osos"][k] = changed["osos"].get(k, 0) + diff
+
+        for name in self.TOTALS:
+            for i, diff in changed[name].items():
+                self.totals[name][i] += diff
+        position = dict((i, n) for n, i in enumerate(self.order))
+        for k, name in enumerate(tiebreakers):
+            for i, diff in changed[name].items():
+                self.keys[k][position[i]] += diff
+
+        keys = dict(zip(self.order, zip(*self.keys) or [()] * len(self.order)))
+        ordered = sorted(self.order, key = lambda i: (keys[i], -i), reverse = True)
+        if h2h:
+            _order_pairs(rounds, ordered, keys)
+        self.order = array("i", ordered)
+        self.keys = [array("i", [keys[i][k] for i in ordered])
+                     for k in range(len(self.keys))]
@@ -0,0 +1,427 @@
+"""
+Tournament save files.
+
+The tournament is stored in an SQLite database as flat tables, players are
+referenced by their integer index:
+
+    meta        key -> JSON value (schema version, settings, seed, ...)
+    players     idx, uid, name, factions (JSON list), team, country,
+                is_playing, joined (round of the registration, -1 before
+                the first one)
+    rounds      rnd, bye (player idx or NULL), table_repeats, tables,
+                block (tables of a match, see Tournament.start_round),
+                team_bye (name of the team with bye or NULL)
+    pairings    rnd, table_no, a, b
+    results     rnd, idx, tp, cp, kp, faction (the opponent used)
+    fixed_tables  uid, table_no
+    amendments  seq, rnd, table_no, previous, result_a, result_b (JSON),
+                reason, time - the corrections of results
+
+Version 2 added the amendments, players.joined and rounds.tables. Version 1
+files are read as if nobody registered late, every round had the current
+number of tables and no result was corrected, and upgraded when written.
+Version 3 added rounds.block and rounds.team_bye, all the rounds of the
+older versions are read as individual ones.
+
+Saving replaces the content in a single transaction. TournamentFile reads
+just the parts it is asked for, load() builds the whole Tournament.
+
+Older versions pickled the Tournament to save.p, import_pickle() converts
+such a file (journal.Journal does it once, when there is no save file yet):
+
+    python storage.py convert save.p save.sqlite
+"""
+
+import sys
+import json
+import sqlite3
+import cPickle
+import copy_reg
+import argparse
+
+from controller import Player, Tournament, TournamentException
+
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS players (idx INTEGER PRIMARY KEY, uid TEXT UNIQUE,
+    name TEXT, factions TEXT, team TEXT, country TEXT, is_playing INTEGER,
+    joined INTEGER);
+CREATE TABLE IF NOT EXISTS rounds (rnd INTEGER PRIMARY KEY, bye INTEGER,
+    table_repeats INTEGER, tables INTEGER, block INTEGER, team_bye TEXT);
+CREATE TABLE IF NOT EXISTS pairings (rnd INTEGER, table_no INTEGER,
+    a INTEGER, b INTEGER, PRIMARY KEY (rnd, table_no));
+CREATE TABLE IF NOT EXISTS results (rnd INTEGER, idx INTEGER, tp INTEGER,
+    cp INTEGER, kp INTEGER, faction TEXT, PRIMARY KEY (rnd, idx));
+CREATE TABLE IF NOT EXISTS fixed_tables (uid TEXT PRIMARY KEY,
+    table_no INTEGER);
+CREATE TABLE IF NOT EXISTS amendments (seq INTEGER PRIMARY KEY, rnd INTEGER,
+    table_no INTEGER, previous TEXT, result_a TEXT, result_b TEXT,
+    reason TEXT, time REAL);
+"""
+
+# Tournament attributes stored in meta
+SETTINGS = ("tables", "points", "pairing_engine", "seed", "bye_policy",
+            "tiebreakers", "h2h", "late_join")
+
+
+class UnsupportedSaveVersion(TournamentException):
+    pass
+
+class LegacySaveFile(TournamentException):
+    pass
+
+SQLITE_HEADER = "SQLite format 3\0"
+
+
+def _check_version(conn):
+    """Version of the file, None if it's empty."""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+    if row is None:
+        return None
+    version = json.loads(row[0])
+    if version > SCHEMA_VERSION:
+        raise UnsupportedSaveVersion("Save file version %s, supported %s" %
+                                     (version, SCHEMA_VERSION))
+    return version
+
+
+# upgrades of the tables from the previous versions
+MIGRATIONS = {
+    1: ("ALTER TABLE players ADD COLUMN joined INTEGER",
+        "ALTER TABLE rounds ADD COLUMN tables INTEGER"),
+    2: ("ALTER TABLE rounds ADD COLUMN block INTEGER",
+        "ALTER TABLE rounds ADD COLUMN team_bye TEXT"),
+}
+
+
+TABLES = ("meta", "players", "rounds", "pairings", "results", "fixed_tables",
+          "amendments")
+
+
+def dump(t, meta = None):
+    """
+    Rows of all the tables, as {table: list of rows}. This is the only part
+    of saving that reads the tournament, so the rows can be written by
+    write() in another thread while the tournament goes on.
+    """
+    values = dict(meta or {})
+    values["schema_version"] = SCHEMA_VERSION
+    for key in SETTINGS:
+        values[key] = getattr(t, key)
+
+    rows = dict((table, []) for table in TABLES)
+    rows["meta"] = [(key, json.dumps(value)) for key, value in values.items()]
+    rows["players"] = [(p.index, p.uid, p.name, json.dumps(p.factions), p.team,
+                        p.country, int(p.is_playing), t.joined[p.index])
+                       for p in t.results.players]
+
+    for rnd, pairs in enumerate(t.pairings):
+        bye = t.byes[rnd]
+        rows["rounds"].append((rnd, bye and bye.index, t.table_repeats[rnd],
+                               t.round_tables[rnd], t.round_blocks[rnd],
+                               t.team_byes.get(rnd)))
+        for table, (pA, pB) in pairs.items():
+            rows["pairings"].append((rnd, table, pA.index, pB.index))
+        for p in t.results.players:
+            if p.has_result(rnd):
+                rows["results"].append((rnd, p.index) + p.result(rnd))
+
+    rows["fixed_tables"] = t.fixed_tables.items()
+    rows["amendments"] = [(seq, a["round"], a["table"], json.dumps(a["previous"]),
+                           json.dumps(a["result_a"]), json.dumps(a["result_b"]),
+                           a["reason"], a["time"])
+                          for seq, a in enumerate(t.amendments)]
+    return rows
+
+
+def write(rows, fname):
+    """Replace the content of the file by the rows from dump()."""
+    conn = sqlite3.connect(fname)
+    try:
+        conn.executescript(SCHEMA)
+        version = _check_version(conn)
+        if version is not None:
+            for v in range(version, SCHEMA_VERSION):
+                for statement in MIGRATIONS[v]:
+                    conn.execute(statement)
+        with conn:
+            for table in TABLES:
+                conn.execute("DELETE FROM %s" % table)
+                if rows[table]:
+                    marks = ", ".join("?" * len(rows[table][0]))
+                    conn.executemany("INSERT INTO %s VALUES (%s)" % (table, marks),
+                                     rows[table])
+    finally:
+        conn.close()
+
+
+def save(t, fname, meta = None):
+    """
+    Write the tournament to the file, `meta` is a dict of extra values to
+    store in the meta table.
+    """
+    write(dump(t, meta), fname)
+
+
+class TournamentFile(object):
+    """
+    Read access to a save file, without loading the whole tournament.
+    """
+
+    def __init__(self, fname):
+        with open(fname, "rb") as f:
+            header = f.read(len(SQLITE_HEADER))
+        if header and header != SQLITE_HEADER:
+            raise LegacySaveFile("%s is not a save file of this version. Pickle "
+                                 "saves (save.p) of older versions can be "
+                                 "converted by: python storage.py convert %s "
+                                 "save.sqlite" % (fname, fname))
+        self.conn = sqlite3.connect(fname)
+        self.version = _check_version(self.conn) or SCHEMA_VERSION
+
+    def close(self):
+        self.conn.close()
+
+    def meta(self):
+        return dict((key, json.loads(value)) for key, value in
+                    self.conn.execute("SELECT key, value FROM meta"))
+
+    def players(self):
+        """Iterate over the players as dicts, in order of registration."""
+        joined = "joined" if self.version >= 2 else "-1"
+        cursor = self.conn.execute("SELECT idx, uid, name, factions, team, "
+                                   "country, is_playing, %s FROM players "
+                                   "ORDER BY idx" % joined)
+        for row in cursor:
+            yield dict(zip(("index", "uid", "name", "factions", "team",
+                            "country", "is_playing", "joined"), row))
+
+    def round_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM rounds").fetchone()[0]
+
+    def round(self, rnd):
+        """
+        Pairings of the round as ({table: (a, b)}, bye), players being
+        referenced by index, bye being None if there was none.
+        """
+        row = self.conn.execute("SELECT bye FROM rounds WHERE rnd = ?", (rnd,)).fetchone()
+        pairs = dict((table, (a, b)) for table, a, b in self.conn.execute(
+            "SELECT table_no, a, b FROM pairings WHERE rnd = ?", (rnd,)))
+        return pairs, row and row[0]
+
+    def results(self, rnd):
+        """{player index: (tp, cp, kp, faction the opponent used)}"""
+        return dict((idx, (tp, cp, kp, faction)) for idx, tp, cp, kp, faction in
+            self.conn.execute("SELECT idx, tp, cp, kp, faction FROM results "
+                              "WHERE rnd = ?", (rnd,)))
+
+    def table_repeats(self, rnd):
+        return self.conn.execute("SELECT table_repeats FROM rounds WHERE rnd = ?",
+                                 (rnd,)).fetchone()[0]
+
+    def tables(self, rnd):
+        """Number of tables in the round, None if not known (version 1)."""
+        if self.version < 2:
+            return None
+        return self.conn.execute("SELECT tables FROM rounds WHERE rnd = ?",
+                                 (rnd,)).fetchone()[0]
+
+    def block(self, rnd):
+        """Tables of a match in the round, see Tournament.start_round."""
+        if self.version < 3:
+            return 1
+        return self.conn.execute("SELECT block FROM rounds WHERE rnd = ?",
+                                 (rnd,)).fetchone()[0]
+
+    def team_byes(self):
+        """{round: name of the team with bye}"""
+        if self.version < 3:
+            return {}
+        return dict(self.conn.execute("SELECT rnd, team_bye FROM rounds "
+                                      "WHERE team_bye IS NOT NULL"))
+
+    def fixed_tables(self):
+        return dict(self.conn.execute("SELECT uid, table_no FROM fixed_tables"))
+
+    def amendments(self):
+        """The corrections of results, see Tournament.amend_result."""
+        if self.version < 2:
+            return []
+        def results(value):
+            value = json.loads(value)
+            return value and tuple(tuple(result) for result in value)
+        return [{"round": rnd, "table": table, "previous": results(previous),
+                 "result_a": tuple(json.loads(result_a)),
+                 "result_b": tuple(json.loads(result_b)),
+                 "reason": reason, "time": time}
+                for rnd, table, previous, result_a, result_b, reason, time in
+                self.conn.execute("SELECT rnd, table_no, previous, result_a, "
+                                  "result_b, reason, time FROM amendments "
+                                  "ORDER BY seq")]
+
+    def tournament(self):
+        """Build the whole Tournament."""
+        meta = self.meta()
+        t = Tournament(points = meta["points"],
+                       pairing_engine = meta["pairing_engine"],
+                       seed = meta["seed"], bye_policy = meta["bye_policy"],
+                       tiebreakers = tuple(meta["tiebreakers"]),
+                       h2h = meta["h2h"],
+                       late_join = meta.get("late_join", (0, 0, 0)))
+
+        players = []
+        joined = []
+        for row in self.players():
+            p = Player(row["name"], json.loads(row["factions"]), row["team"],
+                       row["country"], uid = row["uid"])
+            p.is_playing = bool(row["is_playing"])
+            players.append(p)
+            joined.append(row["joined"])
+        t.fixed_tables = self.fixed_tables()
+
+        # the players are registered when they did, so the snapshots of the
+        # standings taken at the start of each round are those of the time
+        rounds = self.round_count()
+        results = []
+        registered = 0
+        for rnd in range(rounds + 1):
+            late = []
+            while registered < len(players) and joined[registered] < rnd:
+                late.append(players[registered])
+                registered += 1
+            if late:
+                t.add_players(late, (0, 0, 0))
+                # what they got for the rounds they missed
+                for r in range(rnd):
+                    for p in late:
+                        if p.index in results[r]:
+                            t.results.set_result(r, p.index, *results[r][p.index][:3])
+            if rnd == rounds:
+                break
+
+            pairs, bye = self.round(rnd)
+            results.append(self.results(rnd))
+            paired = set(i for pair in pairs.values() for i in pair) | set([bye])
+            games = {}
+            for table, (a, b) in pairs.items():
+                if a in results[rnd] and b in results[rnd]:
+                    games[table] = (results[rnd][a][:3] + results[rnd][b][3:],
+                                    results[rnd][b][:3] + results[rnd][a][3:])
+                pairs[table] = (players[a], players[b])
+            # results of those who did not play, see Tournament.late_join
+            credits = dict((players[i], result[:3]) for i, result in results[rnd].items()
+                           if i not in paired and i < registered)
+            t.tables = self.tables(rnd) or meta["tables"]
+            t._restore_round(pairs, None if bye is None else players[bye],
+                             self.table_repeats(rnd), games, credits,
+                             self.block(rnd))
+        t.tables = meta["tables"]
+        t.team_byes = self.team_byes()
+        # the results already include them
+        t.amendments = self.amendments()
+        return t
+
+
+def load(fname):
+    f = TournamentFile(fname)
+    try:
+        return f.tournament()
+    finally:
+        f.close()
+
+
+class _Pickled(object):
+    """Attributes of a pickled Tournament or Player of the old versions."""
+
+
+# the only globals old pickles refer to
+_PICKLED = {("controller", "Tournament"): _Pickled,
+            ("controller", "Player"): _Pickled,
+            ("copy_reg", "_reconstructor"): copy_reg._reconstructor,
+            ("__builtin__", "object"): object}
+
+
+def _find_global(module, name):
+    if (module, name) not in _PICKLED:
+        raise LegacySaveFile("Unexpected %s.%s in the pickle save" % (module, name))
+    return _PICKLED[module, name]
+
+
+def import_pickle(fname):
+    """
+    Build the Tournament from the pickle save of the old versions, where
+    players kept their results in lists (_tp, _cp, _kp, factions_played
+    of the games, the bye rounds included in all but the factions).
+    """
+    with open(fname, "rb") as f:
+        unpickler = cPickle.Unpickler(f)
+        unpickler.find_global = _find_global
+        try:
+            old = unpickler.load()
+        except (cPickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+            raise LegacySaveFile("%s is not a pickle save: %s" % (fname, e))
+
+    t = Tournament(points = getattr(old, "points", 50))
+    uids = sorted(old.players, key = lambda uid: (not uid.isdigit(),
+                                                  uid.zfill(20), uid))
+    players = {}
+    for uid in uids:
+        q = old.players[uid]
+        p = Player(q.name, list(q.factions), q.team, q.country, uid = uid)
+        p.is_playing = q.is_playing
+        players[id(q)] = p
+    t.add_players([players[id(old.players[uid])] for uid in uids])
+    t.tables = old.tables
+
+    def result(q, rnd, game):
+        """(tp, cp, kp, faction the opponent used), None if not reported."""
+        if len(q._tp) <= rnd:
+            return None
+        faction = None
+        if game < len(q.factions_played):
+            faction = q.factions_played[game] or None
+        return (q._tp[rnd], q._cp[rnd], q._kp[rnd], faction)
+
+    # games played by each player so far, to index factions_played
+    games_played = dict((id(q), 0) for q in old.players.values())
+    for rnd, pairs in enumerate(old.pairings):
+        restored = {}
+        games = {}
+        repeats = 0
+        for table, (qA, qB) in pairs.items():
+            restored[table] = (players[id(qA)], players[id(qB)])
+            repeats += table in qA.tables_played[:rnd]
+            repeats += table in qB.tables_played[:rnd]
+            a = result(qA, rnd, games_played[id(qA)])
+            b = result(qB, rnd, games_played[id(qB)])
+            if a is not None and b is not None:
+                games[table] = (a[:3] + b[3:], b[:3] + a[3:])
+            games_played[id(qA)] += 1
+            games_played[id(qB)] += 1
+        bye = old.byes[rnd]
+        t._restore_round(restored, bye and players[id(bye)], repeats, games)
+    return t
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Tournament save files.")
+    commands = parser.add_subparsers()
+    p = commands.add_parser("convert", help = "convert a pickle save of the old versions")
+    p.add_argument("pickle")
+    p.add_argument("save")
+    args = parser.parse_args(argv)
+
+    try:
+        t = import_pickle(args.pickle)
+    except TournamentException as e:
+        sys.stderr.write("error: %s\n" % e)
+        return 1
+    save(t, args.save)
+    print "%d players, %d rounds" % (len(t.players), len(t.pairings))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Synthetic tournaments for benchmarks and simulations.
+
+Fields are generated with the faction popularity and team sizes of a real
+roster (orig_players_list.csv by default), results of the games from
+hidden player skills.
+"""
+
+import os
+import math
+import random
+
+import csv_worker
+from controller import Player
+
+ROSTER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      "orig_players_list.csv")
+
+
+class FieldGenerator(object):
+    """
+    Generates players with factions and teams distributed as in the roster.
+    Every known faction gets some weight, even if missing in the roster.
+    """
+
+    def __init__(self, roster = ROSTER):
+        counts = dict((f, 1) for f in csv_worker.FACTIONS)
+        teams = {}
+        players = 0
+        for p in csv_worker.iter_players(roster):
+            players += 1
+            for f in p["factions"]:
+                if f:
+                    counts[f] = counts.get(f, 0) + 1
+            if p["team"]:
+                teams[p["team"]] = teams.get(p["team"], 0) + 1
+
+        self.factions = sorted(counts)
+        self.faction_weights = [counts[f] for f in self.factions]
+        self.team_sizes = sorted(teams.values()) or [1]
+        self.unaffiliated = 1 - float(sum(teams.values())) / max(players, 1)
+
+    def _faction(self, rng):
+        x = rng.uniform(0, sum(self.faction_weights))
+        for f, weight in zip(self.factions, self.faction_weights):
+            x -= weight
+            if x <= 0:
+                return f
+        return self.factions[-1]
+
+    def players(self, n, seed = 0):
+        """List of n players, with uids 1..n."""
+        rng = random.Random(seed)
+        teams = []
+        team = 0
+        while len(teams) < n:
+            if rng.random() < self.unaffiliated:
+                teams.append("")
+                continue
+            team += 1
+            teams.extend(["Team %d" % team] * rng.choice(self.team_sizes))
+        teams = teams[:n]
+        rng.shuffle(teams)
+
+        return [Player("Player %d" % uid, [self._faction(rng)], teams[uid - 1],
+                       uid = uid) for uid in range(1, n + 1)]
+
+
+class ResultGenerator(object):
+    """
+    Results of games between players with hidden skills (normal
+    distribution), the better player wins with the Elo-like probability.
+    """
+
+    def __init__(self, seed = 0, spread = 1.0):
+        self.rng = random.Random(seed)
+        self.spread = spread
+        self.skills = {}
+
+    def skill(self, p):
+        if p.uid not in self.skills:
+            self.skills[p.uid] = self.rng.gauss(0, self.spread)
+        return self.skills[p.uid]
+
+    def game(self, pA, pB):
+        """(result_a, result_b) for Tournament.record_result"""
+        rng = self.rng
+        win_a = 1 / (1 + math.exp(self.skill(pB) - self.skill(pA)))
+        a_won = rng.random() < win_a
+        cp = sorted([rng.randint(0, 5), rng.randint(0, 5)], reverse = True)
+        kp = sorted([rng.randint(0, 50), rng.randint(0, 50)], reverse = True)
+        if not a_won:
+            cp.reverse()
+            kp.reverse()
+        return ((int(a_won), cp[0], kp[0], pA.factions[0]),
+                (int(not a_won), cp[1], kp[1], pB.factions[0]))
+
+    def play_round(self, t):
+        """Record results of all the games of the current round."""
+        for table, (pA, pB) in sorted(t.pairings[t.current_round].items()):
+            t.record_result(table, *self.game(pA, pB))
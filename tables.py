@@ -0,0 +1,190 @@
+"""
+Table assignment.
+
+Assigning tables to the pairs of a round is a bipartite assignment problem
+(pairs x tables), where the cost of putting a pair on a table is the number
+of its players who already played on that table.
+
+Matches of teams play on blocks of consecutive tables, see assign_blocks.
+"""
+
+INF = float("inf")
+
+
+def assign_tables(pairs, tables, fixed = None, progress = None):
+    """
+    Assign a table number (1..tables) to each of the [pA, pB] pairs.
+
+    `fixed` maps player uid to the table the player has to play on
+    (accessibility, streaming, ...). Pairs with such a player get the table,
+    the rest is solved at once as a minimum-cost assignment.
+
+    Returns list of table numbers (in the order of `pairs`) and the number
+    of players placed on a table they already played on. There has to be
+    at least as many tables as pairs.
+
+    `progress` is passed to min_cost_assignment.
+    """
+    return _assign(pairs, range(1, tables + 1), fixed, progress)
+
+
+def _assign(pairs, table_numbers, fixed, progress = None):
+    """assign_tables() to the tables of the list."""
+    fixed = fixed or {}
+    assigned = [None] * len(pairs)
+    free_tables = set(table_numbers)
+    for i, (pA, pB) in enumerate(pairs):
+        for p in (pA, pB):
+            t = fixed.get(p.uid)
+            if t in free_tables:
+                assigned[i] = t
+                free_tables.remove(t)
+                break
+
+    rows = [i for i in range(len(pairs)) if assigned[i] is None]
+    columns = sorted(free_tables)
+    column_of = dict((t, j) for j, t in enumerate(columns))
+
+    # only the tables the players already played on cost anything
+    costs = []
+    for i in rows:
+        row = {}
+        for p in pairs[i]:
+            for t in p.tables_played:
+                if t in column_of:
+                    j = column_of[t]
+                    row[j] = row.get(j, 0) + 1
+        costs.append(row)
+
+    for row, column in zip(rows, min_cost_assignment(costs, len(columns), progress)):
+        assigned[row] = columns[column]
+
+    repeats = 0
+    for (pA, pB), t in zip(pairs, assigned):
+        repeats += pA.tables_played.count(t) > 0
+        repeats += pB.tables_played.count(t) > 0
+
+    return assigned, repeats
+
+
+def assign_blocks(pairs, size, tables, fixed = None, progress = None):
+    """
+    Like assign_tables, for pairs making matches of `size` consecutive
+    pairs, each match playing on a block of consecutive tables (block k
+    being tables k*size+1..(k+1)*size).
+
+    A match with a player of `fixed` gets the block of his table. The other
+    matches get the blocks as a minimum-cost assignment, the cost being the
+    players who already played on a table of the block, and then the
+    distance from the block of the match's position (so the first matches
+    keep the first blocks unless that repeats tables). Within the blocks,
+    the pairs get the tables by assign_tables.
+    """
+    fixed = fixed or {}
+    matches = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+    blocks = tables / size
+    block_of = [None] * len(matches)
+    free_blocks = set(range(blocks))
+    for k, match in enumerate(matches):
+        for pair in match:
+            for p in pair:
+                t = fixed.get(p.uid)
+                if t is not None and (t - 1) / size in free_blocks:
+                    block_of[k] = (t - 1) / size
+                    free_blocks.remove(block_of[k])
+                    break
+            if block_of[k] is not None:
+                break
+
+    rows = [k for k in range(len(matches)) if block_of[k] is None]
+    columns = sorted(free_blocks)
+    # one repeat costs more than any placement of the blocks
+    repeat = blocks * blocks + 1
+    costs = []
+    for k in rows:
+        played = {}
+        for pair in matches[k]:
+            for p in pair:
+                for t in p.tables_played:
+                    if t:
+                        played[(t - 1) / size] = played.get((t - 1) / size, 0) + 1
+        costs.append(dict((j, repeat * played.get(b, 0) + abs(b - k))
+                          for j, b in enumerate(columns)))
+    for k, column in zip(rows, min_cost_assignment(costs, len(columns), progress)):
+        block_of[k] = columns[column]
+
+    assigned = []
+    repeats = 0
+    for match, b in zip(matches, block_of):
+        numbers, match_repeats = _assign(match, range(b * size + 1, (b + 1) * size + 1),
+                                         fixed)
+        assigned.extend(numbers)
+        repeats += match_repeats
+    return assigned, repeats
+
+
+def min_cost_assignment(costs, m, progress = None):
+    """
+    Hungarian algorithm (shortest augmenting paths with potentials).
+
+    `costs` is a list of n <= m sparse rows, dicts {column: cost}, missing
+    columns cost 0. Returns the assigned column for each row.
+
+    Each row is added by a Dijkstra-like search which stops at the first
+    free column it reaches, so with mostly zero costs it takes O(m) per row.
+
+    `progress` is called as progress(done, total) before each row is added,
+    it may raise an exception to abort the computation.
+    """
+    n = len(costs)
+    # 1-based, row/column 0 is the virtual start of the augmenting path
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        if progress is not None:
+            progress(i - 1, n)
+        p[0] = i
+        j0 = 0
+        minv = [INF] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = costs[i0 - 1]
+            ui0 = u[i0]
+            delta = INF
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row.get(j - 1, 0) - ui0 - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    # on ties prefer free columns, which end the search
+                    if minv[j] < delta or (minv[j] == delta and p[j] == 0
+                                           and p[j1] != 0):
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assignment = [None] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
@@ -0,0 +1,382 @@
+"""
+Team events.
+
+Teams of `size` players (by Player.team) are paired against each other by
+the team standings. Each pairing of two teams plays `size` individual
+games on a contiguous block of tables (the top pairing on tables
+1..size, the next one on size+1..2*size, ...), and the games roll up into
+the team results:
+    mp     - match points, WIN for the team which won more games of the
+             match, DRAW for both if they won the same number, counted
+             once all the games of the match are reported
+    games  - individual games won
+    sos    - sum of the match points of the team's opponents
+    cp/kp  - sums of the members' CP and KP
+
+The games are ordinary rounds of the Tournament, so results entry, saving
+and the journal work as for individual events, and the team state is
+rebuilt from them (see TeamTournament.rebuild). Team results are kept in
+arrays by team index and updated incrementally: a reported game only
+recounts its own match, and the SoS of the opponents of a team whose
+match points changed.
+"""
+
+import random
+from array import array
+
+import pairing
+import tables
+from lookup import normalize
+from controller import TournamentException, NotEnoughTables, UnknownRound, \
+                       UnknownTable
+
+# match points
+WIN = 2
+DRAW = 1
+LOSS = 0
+
+TIEBREAKERS = ("mp", "games", "sos", "cp", "kp")
+
+
+class PlayersWithoutTeam(TournamentException):
+    pass
+
+class TeamSizeMismatch(TournamentException):
+    pass
+
+
+class Team(object):
+    def __init__(self, name, key):
+        self.name = name
+        # normalized name, see lookup.normalize
+        self.key = key
+        # set by TeamTournament
+        self.index = None
+        # members in the current round, in order of registration
+        self.members = []
+
+    def __str__(self):
+        return "%s (%s)" % (self.name, ", ".join(p.name for p in self.members))
+
+    def __repr__(self):
+        return "Team(%r)" % self.name
+
+
+class TeamTournament(object):
+    """
+    Team event on top of the individual `tournament`.
+
+    Team results of the rounds are columns (arrays by team index), like the
+    player results in ResultStore:
+        opponent  - index of the opposing team, -1 for bye or not playing
+        block     - 0-based block of tables of the match, -1 if none
+        mp        - match points of the round
+        games/cp/kp - the members' games won, CP and KP in the round
+    self.matches holds {block: (team A, team B)} of every round, team A
+    being the better ranked one, whose members are players A of the games.
+    """
+
+    COLUMNS = (("opponent", -1), ("block", -1), ("mp", 0), ("games", 0),
+               ("cp", 0), ("kp", 0))
+
+    def __init__(self, tournament, size, pairing_engine = None, window = 32):
+        self.tournament = tournament
+        self.size = size
+        self.pairing_engine = pairing_engine or tournament.pairing_engine
+        # blossom engine only, see pairing.BlossomPairing
+        self.window = window
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuild the team state from the rounds of the tournament paired by
+        create_pairings (those of `size` tables a match, see
+        Tournament.round_blocks), and their team byes (see
+        Tournament.award). Other rounds have no matches. Players are in the
+        team they are in now.
+        """
+        t = self.tournament
+        self.teams = []
+        self.team_ids = {}
+        self.rounds = []
+        self.matches = []
+        self.byes = []
+        self.bye_counts = {}
+        # bitsets of the opposing team indexes
+        self.opponents = []
+        for name in TIEBREAKERS:
+            setattr(self, name, array("i"))
+
+        for p in t.results.players:
+            if p.team:
+                self._team(p.team)
+
+        for rnd, pairs in enumerate(t.pairings):
+            if t.round_blocks[rnd] != self.size:
+                self._add_round({}, None)
+                continue
+            matches = {}
+            for table in sorted(pairs):
+                block = (table - 1) / self.size
+                if block not in matches:
+                    pA, pB = pairs[table]
+                    matches[block] = (self._team(pA.team), self._team(pB.team))
+            bye = None
+            if rnd in t.team_byes:
+                bye = self._team(t.team_byes[rnd])
+            self._add_round(matches, bye)
+            for block in matches:
+                self._count_match(rnd, block)
+            if bye is not None:
+                # the members who got the bye result
+                members = [t.results.players[i] for i in t.results.credited(rnd)
+                           if normalize(t.results.players[i].team) == bye.key]
+                self._count_bye(rnd, bye, members)
+
+    def _team(self, name):
+        key = normalize(name)
+        if key not in self.team_ids:
+            team = Team(name, key)
+            team.index = len(self.teams)
+            self.team_ids[key] = team.index
+            self.teams.append(team)
+            self.opponents.append(0)
+            for name in TIEBREAKERS:
+                getattr(self, name).append(0)
+            for columns in self.rounds:
+                for column, default in self.COLUMNS:
+                    columns[column].append(default)
+        return self.teams[self.team_ids[key]]
+
+    def active_teams(self):
+        """
+        Teams of the active players, with their members set. Every active
+        player has to be in a team of exactly `size` active players.
+        """
+        t = self.tournament
+        names = []
+        keys = set()
+        for p in t.active_players:
+            if not p.team:
+                raise PlayersWithoutTeam("%s is not in a team" % p.name)
+            key = normalize(p.team)
+            if key not in keys:
+                keys.add(key)
+                names.append(p.team)
+
+        teams = []
+        wrong = []
+        for name in names:
+            team = self._team(name)
+            team.members = t.index.team(name, playing = True)
+            if len(team.members) != self.size:
+                wrong.append(u"%s (%d)" % (team.name, len(team.members)))
+            teams.append(team)
+        if wrong:
+            raise TeamSizeMismatch(u"Teams have to have %d active players: %s"
+                                   % (self.size, u", ".join(wrong)))
+        return teams
+
+    def standings(self, teams = None, rng = None):
+        """
+        Teams (all by default) ordered by TIEBREAKERS, as list of (team,
+        key) like Tournament.standings(). Teams equal in all of them are
+        ordered randomly when `rng` is given, by registration otherwise.
+        """
+        if teams is None:
+            teams = self.teams
+        keys = zip(*[getattr(self, name) for name in TIEBREAKERS])
+        if rng is not None:
+            last = dict((team.index, rng.random()) for team in teams)
+        else:
+            last = dict((team.index, -team.index) for team in teams)
+        ordered = sorted(teams, key = lambda team: (keys[team.index],
+                                                    last[team.index]),
+                         reverse = True)
+        return [(team, keys[team.index]) for team in ordered]
+
+    def penalty(self, a, b):
+        """Rate the match of teams a and b (indexes), for the engines."""
+        if self.opponents[a] >> b & 1:
+            return pairing.REMATCH
+        return 0
+
+    def create_pairings(self, progress = None):
+        """
+        Pair the active teams by the team standings and start the round of
+        the tournament with their games.
+
+        Teams are split into groups by match points and paired by the
+        engine of self.pairing_engine, rated by self.penalty (rematches
+        only). With an odd number of teams, the lowest ranked team with the
+        fewest byes gets a bye, its members get the bye result of the
+        tournament (see Tournament.award).
+
+        Within a match, players of team A are assigned their opponents from
+        team B at once, as the minimum-cost assignment of the pairing
+        penalties (see pairing.PenaltyIndex). The games get tables by the
+        block of their match (see Tournament.start_round): the better
+        ranked teams get the lower blocks, unless that repeats tables or a
+        member has a fixed table.
+
+        Returns {block: (team A, team B)}, and the bye team.
+        """
+        t = self.tournament
+        teams = self.active_teams()
+        rng = random.Random(t._round_seed(t.current_round + 1))
+
+        if t.current_round == -1:
+            ordered = list(teams)
+            rng.shuffle(ordered)
+        else:
+            ordered = [team for team, key in self.standings(teams, rng)]
+
+        bye = None
+        if len(ordered) % 2:
+            fewest = min(self.bye_counts.get(team.index, 0) for team in ordered)
+            bye = [team for team in ordered
+                   if self.bye_counts.get(team.index, 0) == fewest][-1]
+            ordered.remove(bye)
+
+        blocks = len(ordered) / 2
+        if blocks * self.size > t.tables:
+            raise NotEnoughTables("%d tables for %d matches of %d games"
+                                  % (t.tables, blocks, self.size))
+
+        groups = []
+        last_mp = None
+        for team in ordered:
+            if last_mp != self.mp[team.index]:
+                last_mp = self.mp[team.index]
+                groups.append([])
+            groups[-1].append(team)
+
+        engine = pairing.PAIRING_ENGINES[self.pairing_engine]
+        if engine is pairing.BlossomPairing:
+            engine = engine(self.window, progress = progress)
+        else:
+            engine = engine(progress = progress)
+        rank = dict((team.index, i) for i, team in enumerate(ordered))
+        team_pairs = sorted((sorted(pair, key = lambda team: rank[team.index])
+                             for pair in engine.pair(groups, self)),
+                            key = lambda pair: rank[pair[0].index])
+
+        games = []
+        for teamA, teamB in team_pairs:
+            games.extend(self._matchups(teamA, teamB))
+        pairs = t.start_round(games, None, self.size, progress)
+        if bye is not None:
+            t.award(bye.members, 1, 3, t.points / 2, bye.name)
+
+        table_of = dict((pA.index, table) for table, (pA, pB) in pairs.items())
+        matches = dict(((table_of[teamA.members[0].index] - 1) / self.size,
+                        (teamA, teamB)) for teamA, teamB in team_pairs)
+        self._add_round(matches, bye)
+        if bye is not None:
+            self._count_bye(t.current_round, bye, bye.members)
+        return matches, bye
+
+    def _matchups(self, teamA, teamB):
+        """Games of the match, as [(player A, player B)]."""
+        penalties = self.tournament.penalties
+        costs = [dict((j, penalties.penalty(pA.index, pB.index))
+                      for j, pB in enumerate(teamB.members))
+                 for pA in teamA.members]
+        assigned = tables.min_cost_assignment(costs, len(teamB.members))
+        return [(pA, teamB.members[j]) for pA, j in zip(teamA.members, assigned)]
+
+    def _add_round(self, matches, bye):
+        n = len(self.teams)
+        columns = dict((column, array("i", [default]) * n)
+                       for column, default in self.COLUMNS)
+        for block, (teamA, teamB) in matches.items():
+            for a, b in ((teamA.index, teamB.index), (teamB.index, teamA.index)):
+                columns["opponent"][a] = b
+                columns["block"][a] = block
+                self.sos[a] += self.mp[b]
+                self.opponents[a] |= 1 << b
+        self.rounds.append(columns)
+        self.matches.append(matches)
+        self.byes.append(bye)
+        if bye is not None:
+            self.bye_counts[bye.index] = self.bye_counts.get(bye.index, 0) + 1
+
+    def _set(self, rnd, i, mp, games, cp, kp):
+        """Set the team's results of the round, and update the totals."""
+        columns = self.rounds[rnd]
+        d_mp = mp - columns["mp"][i]
+        for name, value in (("mp", mp), ("games", games), ("cp", cp), ("kp", kp)):
+            getattr(self, name)[i] += value - columns[name][i]
+            columns[name][i] = value
+        if d_mp:
+            for played in self.rounds:
+                j = played["opponent"][i]
+                if j >= 0:
+                    self.sos[j] += d_mp
+
+    def _count_match(self, rnd, block):
+        """Recount the match from its games."""
+        t = self.tournament
+        teamA, teamB = self.matches[rnd][block]
+        totals = [[0, 0, 0], [0, 0, 0]]
+        reported = 0
+        for table in range(block * self.size + 1, (block + 1) * self.size + 1):
+            if table not in t.pairings[rnd]:
+                continue
+            pA, pB = t.pairings[rnd][table]
+            if not pA.has_result(rnd):
+                continue
+            reported += 1
+            for side, p in ((0, pA), (1, pB)):
+                tp, cp, kp, faction = p.result(rnd)
+                totals[side][0] += tp
+                totals[side][1] += cp
+                totals[side][2] += kp
+
+        mpA = mpB = 0
+        if reported == self.size:
+            gamesA, gamesB = totals[0][0], totals[1][0]
+            mpA = WIN if gamesA > gamesB else DRAW if gamesA == gamesB else LOSS
+            mpB = WIN if gamesB > gamesA else DRAW if gamesA == gamesB else LOSS
+        self._set(rnd, teamA.index, mpA, *totals[0])
+        self._set(rnd, teamB.index, mpB, *totals[1])
+
+    def _count_bye(self, rnd, team, members):
+        games = cp = kp = 0
+        for p in members:
+            tp, p_cp, p_kp, faction = p.result(rnd)
+            games += tp
+            cp += p_cp
+            kp += p_kp
+        self._set(rnd, team.index, WIN, games, cp, kp)
+
+    def _block(self, rnd, table):
+        if not 0 <= rnd < len(self.matches):
+            raise UnknownRound("No round %s" % (rnd + 1))
+        block = (table - 1) / self.size
+        if table < 1 or block not in self.matches[rnd]:
+            raise UnknownTable("No table %s in round %s" % (table, rnd + 1))
+        return block
+
+    def record_result(self, table, result_a, result_b):
+        """Record the game like Tournament.record_result, and recount its match."""
+        t = self.tournament
+        block = self._block(t.current_round, table)
+        t.record_result(table, result_a, result_b)
+        self._count_match(t.current_round, block)
+
+    def amend_result(self, rnd, table, result_a, result_b, reason = "",
+                     report = False):
+        """Correct the game like Tournament.amend_result, and recount its match."""
+        block = self._block(rnd, table)
+        differ = self.tournament.amend_result(rnd, table, result_a, result_b,
+                                              reason, report)
+        self._count_match(rnd, block)
+        return differ
+
+    def result_recorded(self, rnd, table):
+        """
+        Recount the match of the game on the table, after its result was
+        set directly in the tournament (GUI, result server, ...).
+        """
+        self._count_match(rnd, self._block(rnd, table))
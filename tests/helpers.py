@@ -0,0 +1,47 @@
+"""
+Tournaments for the tests, on synthetic fields (see synthetic).
+
+    python -m unittest discover tests
+"""
+
+import shutil
+import tempfile
+import unittest
+
+import synthetic
+from controller import Tournament
+
+
+def tournament(players, seed = 1, **settings):
+    """New tournament of `players` synthetic players."""
+    return Tournament(synthetic.FieldGenerator().players(players, seed),
+                      seed = seed, **settings)
+
+
+def play(t, rounds, seed = 1):
+    """Pair and play `rounds` rounds, all the results reported."""
+    games = synthetic.ResultGenerator(seed)
+    for rnd in range(rounds):
+        t.create_pairings()
+        games.play_round(t)
+
+
+def standings(t):
+    """Comparable standings of the tournament."""
+    return [(p.uid, key) for p, key in t.standings()]
+
+
+def pairings(t):
+    """Comparable pairings and byes of all the rounds."""
+    return ([sorted((table, pA.uid, pB.uid) for table, (pA, pB) in pairs.items())
+             for pairs in t.pairings], [bye and bye.uid for bye in t.byes])
+
+
+class FilesTestCase(unittest.TestCase):
+    """Test case with a temporary directory self.dir."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
@@ -0,0 +1,135 @@
+import os
+import unittest
+
+import journal
+import standings as st
+import storage
+from controller import UnknownRound, UnknownTable
+from tests.helpers import FilesTestCase, tournament, play, standings
+import synthetic
+
+
+def totals(t, rounds):
+    """(tp, sos) by uid after `rounds` rounds, counted from the results."""
+    tp = dict((p.uid, sum(p.result(r)[0] for r in range(rounds)))
+              for p in t.results.players)
+    return dict((p.uid, (tp[p.uid], sum(tp[o.uid] for o in p.opponents_played[:rounds]
+                                        if o is not None)))
+                for p in t.results.players)
+
+
+def flip(t, rnd, table, report = False):
+    """Amend the game to the opposite result."""
+    pA, pB = t.pairings[rnd][table]
+    # result() has the faction of the opponent, i.e. the other result
+    return t.amend_result(rnd, table, pB.result(rnd), pA.result(rnd), u"swapped",
+                          report)
+
+
+class AmendTest(unittest.TestCase):
+    def setUp(self):
+        self.t = tournament(30, seed = 4)
+        play(self.t, 4)
+
+    def test_totals_recomputed(self):
+        t = self.t
+        for rnd in (0, 2, 3):
+            flip(t, rnd, sorted(t.pairings[rnd])[1])
+        rounds = t.current_round + 1
+        self.assertEqual(dict((p.uid, (p.tp, p.sos)) for p in t.results.players),
+                         totals(t, rounds))
+
+    def check_snapshots(self, t):
+        for rnd in range(len(t.snapshots)):
+            store = t.results.prefix(rnd + 1)
+            players = [p for p, key in t.round_standings(rnd)]
+            self.assertEqual(t.round_standings(rnd),
+                             st.order(store, players, t.tiebreakers, t.h2h))
+
+    def test_tiebreakers(self):
+        # OSoS counts the change two opponents away, h2h reorders pairs
+        for tiebreakers in (("tp", "osos", "kp"), ("tp",), ()):
+            t = tournament(30, seed = 4, tiebreakers = tiebreakers, h2h = True)
+            play(t, 4)
+            for rnd in (0, 1, 0, 2):
+                flip(t, rnd, sorted(t.pairings[rnd])[rnd])
+                self.check_snapshots(t)
+
+    def test_snapshots(self):
+        t = self.t
+        flip(t, 1, sorted(t.pairings[1])[0])
+        self.check_snapshots(t)
+        for rnd in range(len(t.snapshots)):
+            players = [p for p, key in t.round_standings(rnd)]
+            expected = totals(t, rnd + 1)
+            for p in players:
+                self.assertEqual((t.snapshots[rnd].total("tp", p),
+                                  t.snapshots[rnd].total("sos", p)),
+                                 expected[p.uid])
+
+    def test_recorded(self):
+        t = self.t
+        table = sorted(t.pairings[2])[3]
+        pA, pB = t.pairings[2][table]
+        a, b = pA.result(2), pB.result(2)
+        flip(t, 2, table)
+        amendment = t.amendments[-1]
+        self.assertEqual((amendment["round"], amendment["table"]), (2, table))
+        self.assertEqual(amendment["previous"], (a[:3] + b[3:], b[:3] + a[3:]))
+        # the factions stay
+        self.assertEqual((pA.result(2), pB.result(2)), (b[:3] + a[3:], a[:3] + b[3:]))
+        self.assertEqual(amendment["reason"], u"swapped")
+
+    def test_unknown(self):
+        t = self.t
+        result = (1, 0, 0, u"Cryx")
+        self.assertRaises(UnknownRound, t.amend_result, 9, 1, result, result)
+        self.assertRaises(UnknownRound, t.amend_result, -1, 1, result, result)
+        self.assertRaises(UnknownTable, t.amend_result, 0, t.tables + 1,
+                          result, result)
+        self.assertEqual(t.amendments, [])
+
+    def test_report(self):
+        t = self.t
+        self.assertEqual(flip(t, 0, sorted(t.pairings[0])[1]), [])
+        changed = flip(t, 0, sorted(t.pairings[0])[0], report = True)
+        self.assertEqual(changed, [r for r in range(1, t.current_round + 1)
+                                   if not t.verify_round(r)])
+
+
+class AmendFilesTest(FilesTestCase):
+    def test_storage(self):
+        t = tournament(30, seed = 4)
+        play(t, 3)
+        flip(t, 1, sorted(t.pairings[1])[2])
+        fname = os.path.join(self.dir, "save.sqlite")
+        storage.save(t, fname)
+        loaded = storage.load(fname)
+        self.assertEqual(loaded.amendments, t.amendments)
+        self.assertEqual(standings(loaded), standings(t))
+        for rnd in range(3):
+            self.assertEqual([p.uid for p, key in loaded.round_standings(rnd)],
+                             [p.uid for p, key in t.round_standings(rnd)])
+
+    def test_journal(self):
+        save = os.path.join(self.dir, "save")
+        j = journal.Journal(save)
+        t = j.open(seed = 4)
+        t.add_players(synthetic.FieldGenerator().players(30, 4))
+        play(t, 3)
+        flip(t, 1, sorted(t.pairings[1])[2])
+        j.close()
+        for compact in (False, True):
+            j = journal.Journal(save)
+            reopened = j.open()
+            self.assertEqual(reopened.amendments, t.amendments)
+            self.assertEqual(standings(reopened), standings(t))
+            self.assertEqual([p.uid for p, key in reopened.round_standings(1)],
+                             [p.uid for p, key in t.round_standings(1)])
+            if compact:
+                j.compact()
+            j.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
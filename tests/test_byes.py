@@ -0,0 +1,42 @@
+import unittest
+
+import synthetic
+from controller import UnknownByePolicy
+from tests.helpers import tournament
+
+
+class ByeTest(unittest.TestCase):
+    def rounds(self, policy, players = 9, rounds = 12):
+        """Play the rounds, yields (bye, eligible players) of each."""
+        t = tournament(players, seed = 3, bye_policy = policy)
+        games = synthetic.ResultGenerator(3)
+        for rnd in range(rounds):
+            counts = dict(t.bye_counts)
+            fewest = min(counts.get(p.uid, 0) for p in t.active_players)
+            eligible = [p for p in t.active_players if counts.get(p.uid, 0) == fewest]
+            tp = dict((p.uid, p.tp) for p in t.active_players)
+            t.create_pairings()
+            yield t.byes[rnd], eligible, tp
+            games.play_round(t)
+
+    def test_fewest_byes_first(self):
+        for policy in ("lowest", "random", "fewest"):
+            for bye, eligible, tp in self.rounds(policy):
+                self.assertIn(bye, eligible, policy)
+
+    def test_lowest_group(self):
+        for policy in ("lowest", "random"):
+            for bye, eligible, tp in self.rounds(policy):
+                self.assertEqual(tp[bye.uid], min(tp[p.uid] for p in eligible), policy)
+
+    def test_even_field(self):
+        for bye, eligible, tp in self.rounds("random", players = 10, rounds = 3):
+            self.assertEqual(bye, None)
+
+    def test_unknown_policy(self):
+        t = tournament(9, bye_policy = "youngest")
+        self.assertRaises(UnknownByePolicy, t.create_pairings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import StringIO
+import sys
+import unittest
+
+import cli
+from tests.helpers import FilesTestCase
+
+
+class CliTest(FilesTestCase):
+    def run_cli(self, *argv):
+        """(exit code, stdout, stderr) of the command on the state in self.dir"""
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO.StringIO(), StringIO.StringIO()
+        try:
+            code = cli.main(["--state", os.path.join(self.dir, "save")] + list(argv))
+            return code, sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+    def test_round(self):
+        for i in range(4):
+            self.assertEqual(self.run_cli("register", "P%d" % i, "Cryx")[0], 0)
+        code, out, err = self.run_cli("next-round")
+        self.assertEqual(code, 0)
+        self.assertTrue(out.startswith("Round 1\n"))
+        code, out, err = self.run_cli("next-round")
+        self.assertEqual(code, 1)
+        self.assertEqual(err, "error: Results for tables [1, 2] are not filled\n")
+
+    def test_unreadable_save(self):
+        with open(os.path.join(self.dir, "save.sqlite"), "wb") as f:
+            f.write("(dp0\n")
+        code, out, err = self.run_cli("standings")
+        self.assertEqual(code, 1)
+        self.assertTrue(err.startswith("error: "), err)
+
+
+if __name__ == "__main__":
+    unittest.main()
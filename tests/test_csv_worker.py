@@ -0,0 +1,67 @@
+import os
+import StringIO
+import sys
+import unittest
+
+import cli
+import csv_worker
+from tests.helpers import FilesTestCase
+
+
+ROSTER = u"""\ufeffJoza Skladanka;Cygnar;Brno;CZ
+Misa Kunrt;Circle Orboros, menoth;Brno;CZ
+;Cryx;Brno;CZ
+Pavel Novak;Warmachine;Praha;CZ
+joza skladanka;Khador;BRNO;CZ
+
+Jan Dvorak;;Praha;CZ
+Petr Svoboda;Cryx
+"""
+
+
+class IterPlayersTest(FilesTestCase):
+    def write(self, name, text, encoding = "utf-8"):
+        fname = os.path.join(self.dir, name)
+        with open(fname, "wb") as f:
+            f.write(text.encode(encoding))
+        return fname
+
+    def test_rows(self):
+        errors = []
+        players = list(csv_worker.iter_players(self.write("players.csv", ROSTER),
+                                               errors = errors))
+        self.assertEqual([(p["name"], p["factions"], p["team"], p["country"])
+                          for p in players],
+                         [(u"Joza Skladanka", [u"Cygnar"], u"Brno", u"CZ"),
+                          (u"Misa Kunrt", [u"Circle", u"Menoth"], u"Brno", u"CZ"),
+                          (u"Jan Dvorak", [u""], u"Praha", u"CZ"),
+                          (u"Petr Svoboda", [u"Cryx"], u"", u"")])
+        self.assertEqual(errors, [(3, "Name is missing"),
+                                  (4, "Unknown faction Warmachine"),
+                                  (5, "Duplicate player joza skladanka (BRNO)")])
+
+    def test_encoding(self):
+        fname = self.write("players.csv", u"Jan Ve\u010de\u0159e;Cryx\n", "cp1250")
+        errors = []
+        self.assertEqual(list(csv_worker.iter_players(fname, errors = errors)), [])
+        self.assertEqual(errors, [(1, "Not a valid utf-8 text")])
+        players = list(csv_worker.iter_players(fname, "cp1250"))
+        self.assertEqual(players[0]["name"], u"Jan Ve\u010de\u0159e")
+
+    def test_empty_factions_results(self):
+        # the results default to the first faction of the player
+        roster = self.write("players.csv", u"".join(u"P%d;;;\n" % i for i in range(4)))
+        state = os.path.join(self.dir, "save")
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = StringIO.StringIO()
+        try:
+            self.assertEqual(cli.main(["--state", state, "import", roster]), 0)
+            self.assertEqual(cli.main(["--state", state, "next-round"]), 0)
+            results = self.write("results.csv", u"1;1;2;3;0;1;2\n2;0;0;0;1;1;1\n")
+            self.assertEqual(cli.main(["--state", state, "results", results]), 0)
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import os
+import threading
+import unittest
+
+import journal
+from controller import Player
+from tests.helpers import FilesTestCase, play, standings, pairings
+import synthetic
+
+
+def state(t):
+    return (standings(t), pairings(t), t.table_repeats, t.round_tables,
+            t.tables, t.current_round, list(t.results.sos),
+            [p.is_playing for p in t.results.players])
+
+
+class JournalTest(FilesTestCase):
+    def open(self, **options):
+        self.journal = journal.Journal(os.path.join(self.dir, "save"), **options)
+        return self.journal.open(seed = 3)
+
+    def start(self, players = 21, **options):
+        t = self.open(**options)
+        t.add_players(synthetic.FieldGenerator().players(players, 3))
+        return t
+
+    def test_reopen(self):
+        t = self.start()
+        play(t, 2)
+        t.edit_player(t.players["1"], u"Renamed", ["Cryx"], u"Team", u"CZ")
+        t.drop_player(t.players["2"])
+        play(t, 2, seed = 2)
+        expected = state(t)
+        self.journal.close()
+        self.assertEqual(state(self.open()), expected)
+
+    def test_settings(self):
+        save = os.path.join(self.dir, "save")
+        self.journal = journal.Journal(save)
+        t = self.journal.open(seed = 3, late_join = (1, 0, 0), bye_policy = "lowest")
+        t.add_players(synthetic.FieldGenerator().players(21, 3))
+        play(t, 1)
+        self.journal.close()
+        # the settings are not in the events, but in the first snapshot
+        self.journal = journal.Journal(save)
+        t = self.journal.open()
+        self.assertEqual((t.seed, t.late_join, t.bye_policy), (3, (1, 0, 0), "lowest"))
+        self.assertTrue(t.verify_round(0))
+
+    def test_crash_with_partial_event(self):
+        t = self.start(sync_every = 4)
+        play(t, 3)
+        expected = state(t)
+        # crash in the middle of writing an event, without close()
+        self.journal.f.write('{"op":"clear","se')
+        self.journal.f.flush()
+        t = self.open()
+        self.assertEqual(state(t), expected)
+        # and the torn line is gone, new events follow the complete ones
+        t.drop_player(t.players["3"])
+        expected = state(t)
+        self.journal.close()
+        self.assertEqual(state(self.open()), expected)
+
+    def test_compaction(self):
+        t = self.start(compact_every = 7)
+        play(t, 3)
+        expected = state(t)
+        self.assertLess(self.journal.uncompacted, 7)
+        self.journal.close()
+        self.assertEqual(state(self.open()), expected)
+
+    def test_compaction_after_reopen(self):
+        t = self.start(compact_every = 0)
+        play(t, 1)
+        self.journal.compact()
+        play(t, 1, seed = 2)
+        self.journal.close()
+
+        t = self.open(compact_every = 5)
+        size = os.path.getsize(self.journal.journal_file)
+        opened = self.journal.seq
+        for uid in range(100, 105):
+            t.add_player(Player(u"Late %d" % uid, ["Cryx"], uid = uid))
+        # the events replayed on open count, so the journal compacted
+        self.assertLess(os.path.getsize(self.journal.journal_file), size)
+        self.assertGreater(self.journal.snapshot_seq, opened)
+        expected = state(t)
+        self.journal.close()
+        self.assertEqual(state(self.open()), expected)
+
+    def test_crash_during_compaction(self):
+        t = self.start(compact_every = 0)
+        play(t, 2)
+        with open(self.journal.journal_file, "rb") as f:
+            events = f.read()
+        self.journal.compact()
+        # the snapshot is written, but the journal was not emptied
+        with open(self.journal.journal_file, "ab") as f:
+            f.write(events)
+        expected = state(t)
+        self.journal.close()
+        self.assertEqual(state(self.open()), expected)
+
+    def test_crash_before_journal_replaced(self):
+        t = self.start(compact_every = 0)
+        play(t, 2)
+        compaction = self.journal.begin_compaction()
+        play(t, 1, seed = 2)
+        expected = state(t)
+
+        def rename(src, dst):
+            if dst == self.journal.journal_file:
+                raise OSError("crash")
+            os_rename(src, dst)
+        os_rename = journal.os.rename
+        journal.os.rename = rename
+        try:
+            self.assertRaises(OSError, self.journal.finish_compaction, compaction)
+        finally:
+            journal.os.rename = os_rename
+        # the new snapshot and the whole old journal
+        self.journal.sync()
+        self.assertEqual(state(self.open()), expected)
+
+    def test_fixed_tables(self):
+        t = self.start()
+        t.set_fixed_table(t.players["1"], 3)
+        t.set_fixed_table(t.players["2"], 5)
+        t.set_fixed_table(t.players["1"], None)
+        play(t, 1)
+        self.journal.close()
+        t = self.open()
+        self.assertEqual(t.fixed_tables, {"2": 5})
+        self.assertIn(t.players["2"], t.pairings[0][5])
+        self.assertTrue(t.verify_round(0))
+
+    def test_background_compaction(self):
+        t = self.start(compact_every = 0)
+        play(t, 2)
+        compaction = self.journal.begin_compaction()
+        play(t, 1, seed = 2)
+        thread = threading.Thread(target = self.journal.finish_compaction,
+                                  args = (compaction,))
+        thread.start()
+        play(t, 1, seed = 3)
+        thread.join()
+        expected = state(t)
+        self.journal.close()
+        self.assertEqual(state(self.open()), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import unittest
+
+import journal
+import storage
+from controller import Player
+from tests.helpers import FilesTestCase, tournament, standings, pairings
+import synthetic
+
+
+def late(uid):
+    return Player(u"Late %d" % uid, ["Cryx"], uid = uid)
+
+
+class LateJoinTest(unittest.TestCase):
+    def setUp(self):
+        self.t = tournament(20, seed = 3, late_join = (0, 0, 10))
+        self.games = synthetic.ResultGenerator(3)
+
+    def play(self, rounds = 1):
+        for rnd in range(rounds):
+            self.t.create_pairings()
+            self.games.play_round(self.t)
+
+    def test_credits(self):
+        t = self.t
+        self.play(2)
+        t.add_player(late(100))
+        t.add_players([late(101)], late_join = (1, 0, 0))
+        self.assertEqual((t.players["100"].tp, t.players["100"].kp), (0, 20))
+        self.assertEqual(t.players["101"].tp, 2)
+        self.assertEqual(t.players["100"].opponents_played, [None, None])
+
+        self.play()
+        self.assertEqual(t.players["100"].kp - 20, t.players["100"].result(2)[2])
+        self.assertTrue(t.players["100"].opponents_played[2] is not None)
+
+    def test_before_start(self):
+        t = self.t
+        t.add_player(late(100))
+        self.play()
+        self.assertTrue(t.players["100"].opponents_played[0] is not None)
+
+    def test_active_players(self):
+        t = self.t
+        self.play()
+        t.drop_player(t.players["3"])
+        t.add_players([late(100), late(101)])
+        self.play()
+        self.assertNotIn("3", [p.uid for pair in t.pairings[1].values() for p in pair])
+        t.reenter_player(t.players["3"])
+        t.drop_player(t.players["5"])
+        t.add_player(late(102))
+        self.assertEqual([p.index for p in t.active_players],
+                         sorted(p.index for p in t.results.players if p.is_playing))
+        self.play()
+        paired = [p.uid for pair in t.pairings[2].values() for p in pair]
+        if t.byes[2]:
+            paired.append(t.byes[2].uid)
+        self.assertEqual(sorted(paired), sorted(p.uid for p in t.active_players))
+
+    def test_tables_grow(self):
+        t = self.t
+        self.play()
+        t.add_players([late(uid) for uid in range(100, 106)])
+        self.assertEqual(t.tables, 13)
+        self.play(2)
+        self.assertEqual(t.round_tables, [10, 13, 13])
+        for rnd in range(3):
+            self.assertTrue(t.verify_round(rnd), rnd)
+
+    def test_tables_kept(self):
+        t = tournament(20, seed = 3, tables = 15)
+        t.add_player(late(100))
+        self.assertEqual(t.tables, 15)
+
+
+class LateJoinFilesTest(FilesTestCase):
+    def build(self, t):
+        games = synthetic.ResultGenerator(3)
+        t.create_pairings()
+        games.play_round(t)
+        t.drop_player(t.players["3"])
+        t.add_players([late(100), late(101)])
+        t.create_pairings()
+        games.play_round(t)
+        t.reenter_player(t.players["3"])
+        t.add_players([late(uid) for uid in range(102, 106)], late_join = (1, 0, 0))
+        t.create_pairings()
+        games.play_round(t)
+        t.create_pairings()
+        return t
+
+    def check(self, loaded, t):
+        self.assertEqual(standings(loaded), standings(t))
+        self.assertEqual(pairings(loaded), pairings(t))
+        self.assertEqual([p.uid for p in loaded.active_players],
+                         [p.uid for p in t.active_players])
+        self.assertEqual((loaded.joined, loaded.round_tables, loaded.tables),
+                         (t.joined, t.round_tables, t.tables))
+        for rnd in range(len(t.snapshots)):
+            self.assertEqual(len(loaded.snapshots[rnd]), len(t.snapshots[rnd]))
+            self.assertEqual([p.uid for p, key in loaded.round_standings(rnd)],
+                             [p.uid for p, key in t.round_standings(rnd)])
+        for rnd in range(t.current_round + 1):
+            self.assertTrue(loaded.verify_round(rnd), rnd)
+
+    def test_storage(self):
+        t = self.build(tournament(20, seed = 3, late_join = (0, 0, 10)))
+        fname = os.path.join(self.dir, "save.sqlite")
+        storage.save(t, fname)
+        self.check(storage.load(fname), t)
+
+    def test_journal(self):
+        save = os.path.join(self.dir, "save")
+        j = journal.Journal(save)
+        t = j.open(seed = 3, late_join = (0, 0, 10))
+        t.add_players(synthetic.FieldGenerator().players(20, 3))
+        self.build(t)
+        j.close()
+        for compact in (False, True):
+            j = journal.Journal(save)
+            self.check(j.open(), t)
+            if compact:
+                j.compact()
+            j.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
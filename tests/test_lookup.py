@@ -0,0 +1,79 @@
+import unittest
+
+import lookup
+from controller import Player, Tournament
+
+
+def roster():
+    return [Player(u"Jan Nov\xe1k", [u"Cryx"], u"Prague Wolves", u"CZ", uid = "1"),
+            Player(u"Janet Smith", [u"Khador", u"Cygnar"], u"", u"UK", uid = "2"),
+            Player(u"Tom Jansen", [u"Cryx"], u"Prague Wolves", u"NL", uid = "3"),
+            Player(u"Anna Smithers", [u"Menoth"], u"Team UK", u"UK", uid = "4")]
+
+
+def uids(players):
+    return [p.uid for p in players]
+
+
+class PlayerIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.t = Tournament(roster())
+        self.index = self.t.index
+
+    def test_normalize(self):
+        self.assertEqual(lookup.normalize(u"  Jan   NOV\xc1K "), u"jan novak")
+        self.assertEqual(lookup.normalize(None), u"")
+
+    def test_search(self):
+        self.assertEqual(uids(self.index.search(u"jan")), ["1", "2", "3"])
+        self.assertEqual(uids(self.index.search(u"SMITH")), ["2", "4"])
+        self.assertEqual(uids(self.index.search(u"novak")), ["1"])
+        self.assertEqual(self.index.search(u"x"), [])
+
+    def test_fields(self):
+        self.assertEqual(uids(self.index.team(u"prague  wolves")), ["1", "3"])
+        self.assertEqual(uids(self.index.faction(u"cryx")), ["1", "3"])
+        self.assertEqual(uids(self.index.faction(u"Cygnar")), ["2"])
+        self.assertEqual(uids(self.index.country(u"uk")), ["2", "4"])
+        self.assertEqual(self.index.team(u"Prague"), [])
+
+    def test_query(self):
+        query = lambda text: uids(self.index.query(text))
+        self.assertEqual(query(u""), ["1", "2", "3", "4"])
+        self.assertEqual(query(u"jan faction:cryx"), ["1", "3"])
+        self.assertEqual(query(u'team:"Prague Wolves" country:nl'), ["3"])
+        self.assertEqual(query(u'"team:team uk"'), ["4"])
+        # not a field, a name prefix
+        self.assertEqual(query(u"smith colour:red"), [])
+        self.assertEqual(query(u"smith country:CZ"), [])
+        self.assertEqual(lookup._terms(u' a  "b c"d  e'), [u"a", u"b cd", u"e"])
+
+    def test_consistency(self):
+        p = self.t.players["1"]
+        self.t.edit_player(p, u"Jan Dvo\u0159\xe1k", [u"Khador"], u"", u"CZ")
+        self.assertEqual(uids(self.index.search(u"novak")), [])
+        self.assertEqual(uids(self.index.search(u"dvorak")), ["1"])
+        self.assertEqual(uids(self.index.search(u"jan")), ["1", "2", "3"])
+        self.assertEqual(uids(self.index.faction(u"Khador")), ["1", "2"])
+        self.assertEqual(uids(self.index.team(u"Prague Wolves")), ["3"])
+        self.assertNotIn(0, self.index.factions[u"cryx"])
+
+        self.t.add_player(Player(u"Jana Kralova", [u"Cryx"], u"", u"CZ", uid = "5"))
+        self.assertEqual(uids(self.index.query(u"jan country:cz")), ["1", "5"])
+        # the index is the same as built from scratch
+        rebuilt = lookup.PlayerIndex()
+        rebuilt.add_players(self.t.results.players)
+        for name in ("names", "teams", "factions", "countries", "keys"):
+            self.assertEqual(getattr(self.index, name), getattr(rebuilt, name), name)
+
+    def test_playing(self):
+        self.t.drop_player(self.t.players["2"])
+        self.assertEqual(uids(self.index.search(u"jan")), ["1", "2", "3"])
+        self.assertEqual(uids(self.index.search(u"jan", playing = True)), ["1", "3"])
+        self.assertEqual(uids(self.index.query(u"country:uk", playing = True)), ["4"])
+        self.t.reenter_player(self.t.players["2"])
+        self.assertEqual(uids(self.index.country(u"uk", playing = True)), ["2", "4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
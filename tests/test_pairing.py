@@ -0,0 +1,125 @@
+import random
+import unittest
+
+import pairing
+from tests.helpers import tournament, play
+
+
+def brute_force(n, edges, maxcardinality):
+    """Best (cardinality, weight) of all the matchings, for small graphs."""
+    weight = {}
+    for i, j, w in edges:
+        weight[i, j] = weight[j, i] = w
+
+    def best(free):
+        if not free:
+            return (0, 0)
+        v, rest = free[0], free[1:]
+        result = best(rest)
+        for u in rest:
+            if (v, u) in weight:
+                cardinality, total = best([x for x in rest if x != u])
+                if not maxcardinality:
+                    cardinality = -1
+                result = max(result, (cardinality + 1, total + weight[v, u]))
+        return result
+
+    return best(range(n))
+
+
+def matched(mate, edges, maxcardinality):
+    weight = dict(((i, j), w) for i, j, w in edges)
+    weight.update(((j, i), w) for i, j, w in edges)
+    pairs = [(i, j) for i, j in enumerate(mate) if i < j]
+    total = sum(weight[pair] for pair in pairs)
+    return (len(pairs), total) if maxcardinality else (0, total)
+
+
+class MaxWeightMatchingTest(unittest.TestCase):
+    def test_against_brute_force(self):
+        rng = random.Random(1)
+        for case in range(300):
+            n = rng.randint(2, 8)
+            edges = [(i, j, rng.randint(1, 20)) for i in range(n)
+                     for j in range(i + 1, n) if rng.random() < 0.6]
+            if not edges:
+                continue
+            for maxcardinality in (False, True):
+                mate = pairing.max_weight_matching(edges, maxcardinality)
+                for i, j in enumerate(mate):
+                    if j >= 0:
+                        self.assertEqual(mate[j], i)
+                self.assertEqual(matched(mate, edges, maxcardinality),
+                                 brute_force(n, edges, maxcardinality),
+                                 (edges, maxcardinality))
+
+    def test_big_blossom(self):
+        # the whole odd cycle shrinks into one blossom of 3001 vertices
+        edges = [(i, (i + 1) % 3001, 1) for i in range(3001)]
+        mate = pairing.max_weight_matching(edges, maxcardinality = True)
+        self.assertEqual(sum(1 for j in mate if j >= 0), 3000)
+
+
+class BlossomPairingTest(unittest.TestCase):
+    def test_perfect_without_rematches(self):
+        t = tournament(64, pairing_engine = "blossom")
+        play(t, 6)
+        for rnd, pairs in enumerate(t.pairings):
+            players = [p.uid for pair in pairs.values() for p in pair]
+            self.assertEqual(len(players), 64)
+            self.assertEqual(len(set(players)), 64)
+        played = set()
+        for pairs in t.pairings:
+            for pA, pB in pairs.values():
+                game = frozenset((pA.uid, pB.uid))
+                self.assertNotIn(game, played)
+                played.add(game)
+
+    def test_not_worse_than_greedy(self):
+        t = tournament(40)
+        play(t, 3)
+        groups, count = t._ordered_players()
+        if sum(len(group) for group in groups) % 2:
+            t._select_bye(groups)
+        cost = lambda pairs: sum(t.penalties.penalty(pA.index, pB.index)
+                                 for pA, pB in pairs)
+        blossom = pairing.BlossomPairing(window = None).pair(
+            [list(group) for group in groups], t.penalties)
+        greedy = pairing.GreedyPairing().pair(
+            [list(group) for group in groups], t.penalties)
+        self.assertLessEqual(cost(blossom), cost(greedy))
+
+    def test_window_rematches(self):
+        t = tournament(4)
+        players = t.results.players
+        t.penalties.add_game(players[0], players[1])
+        t.penalties.add_game(players[2], players[3])
+        engine = pairing.BlossomPairing(window = 1)
+        engine.pair([list(players)], t.penalties)
+        self.assertEqual(engine.counters["window_rematches"], 2)
+        engine = pairing.BlossomPairing(window = None)
+        engine.pair([list(players)], t.penalties)
+        self.assertEqual(engine.counters["window_rematches"], 0)
+
+    def test_fallback_to_whole_graph(self):
+        t = tournament(4)
+        players = t.results.players
+        t.penalties.add_game(players[0], players[1])
+        t.penalties.add_game(players[2], players[3])
+        engine = pairing.BlossomPairing(window = 1)
+        pairs = engine.pair([list(players)], t.penalties)
+        self.assertEqual(engine.counters["fallbacks"], 1)
+        self.assertEqual(sorted(sorted(p.index for p in pair) for pair in pairs),
+                         [[0, 2], [1, 3]])
+
+    def test_no_fallback_without_rematch(self):
+        t = tournament(40)
+        engine = pairing.BlossomPairing(window = 2)
+        engine.pair([list(t.results.players)], t.penalties)
+        self.assertEqual(engine.counters["fallbacks"], 0)
+        # only the edges of the window were evaluated
+        self.assertEqual(engine.counters["penalty_evaluations"], 39 + 38)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from controller import Player, PlayerUidCollision, Tournament
+
+
+def roster(count, first = 0):
+    return [Player(u"P%d" % i, ["Cryx"], u"Team %d" % (i % 3), uid = str(i))
+            for i in range(first, first + count)]
+
+
+class AddPlayersTest(unittest.TestCase):
+    def test_summary(self):
+        t = Tournament()
+        self.assertEqual(t.add_players(roster(21)),
+                         {"added": 21, "players": 21, "tables": 10})
+        self.assertEqual(t.add_players(iter(roster(4, 21))),
+                         {"added": 4, "players": 25, "tables": 12})
+        self.assertEqual([p.index for p in t.active_players], range(25))
+        self.assertEqual(len(t.index.team(u"Team 1")), 8)
+
+    def test_collision_adds_nobody(self):
+        t = Tournament(roster(5))
+        for players in (roster(3, 4), roster(2, 10) + roster(1, 10)):
+            self.assertRaises(PlayerUidCollision, t.add_players, players)
+            self.assertEqual(sorted(t.players), [str(i) for i in range(5)])
+            self.assertEqual(len(t.results.players), 5)
+        self.assertRaises(PlayerUidCollision, t.add_player, roster(1, 2)[0])
+
+    def test_same_as_one_by_one(self):
+        bulk = Tournament(roster(30), seed = 1)
+        single = Tournament(seed = 1)
+        for p in roster(30):
+            single.add_player(p)
+        self.assertEqual(bulk.tables, single.tables)
+        bulk.create_pairings()
+        single.create_pairings()
+        self.assertEqual(sorted((table, pA.uid, pB.uid)
+                                for table, (pA, pB) in bulk.pairings[0].items()),
+                         sorted((table, pA.uid, pB.uid)
+                                for table, (pA, pB) in single.pairings[0].items()))
+
+    def test_tables(self):
+        # set explicitly, the table count is kept unless there are more players
+        t = Tournament(roster(10), tables = 8)
+        self.assertEqual(t.tables, 8)
+        t.add_players(roster(10, 10))
+        self.assertEqual(t.tables, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+from tests.helpers import tournament, play, pairings
+
+
+class ReplayTest(unittest.TestCase):
+    def test_same_seed_same_tournament(self):
+        for policy in ("random", "lowest", "fewest"):
+            a = tournament(33, seed = 5, bye_policy = policy)
+            b = tournament(33, seed = 5, bye_policy = policy)
+            play(a, 4)
+            play(b, 4)
+            self.assertEqual(pairings(a), pairings(b))
+
+    def test_verify_all_rounds(self):
+        for engine in ("blossom", "greedy"):
+            t = tournament(41, pairing_engine = engine)
+            play(t, 5)
+            for rnd in range(5):
+                self.assertTrue(t.verify_round(rnd), (engine, rnd))
+
+    def test_replay_next_round(self):
+        t = tournament(20)
+        play(t, 2)
+        pairs, bye = t.replay_round(2)
+        t.create_pairings()
+        self.assertEqual(sorted((table, pA.uid, pB.uid) for table, (pA, pB) in pairs.items()),
+                         sorted((table, pA.uid, pB.uid)
+                                for table, (pA, pB) in t.pairings[2].items()))
+
+    def test_changed_pairing_detected(self):
+        t = tournament(20)
+        play(t, 3)
+        pairs = t.pairings[1]
+        tables = sorted(pairs)
+        (a1, b1), (a2, b2) = pairs[tables[0]], pairs[tables[1]]
+        pairs[tables[0]], pairs[tables[1]] = (a1, a2), (b1, b2)
+        self.assertFalse(t.verify_round(1))
+        self.assertTrue(t.verify_round(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
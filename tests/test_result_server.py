@@ -0,0 +1,84 @@
+import httplib
+import json
+import unittest
+
+import result_server
+from controller import Player
+from tests.helpers import tournament
+
+
+class ResultServerTest(unittest.TestCase):
+    def setUp(self):
+        self.t = tournament(8, seed = 2)
+        self.t.create_pairings()
+        self.desk = result_server.ResultDesk(self.t)
+        self.recorded = []
+        self.desk.listeners.append(lambda rnd, table: self.recorded.append((rnd, table)))
+        self.server = result_server.start(self.desk, "127.0.0.1", 0)
+
+    def tearDown(self):
+        result_server.stop(self.server)
+
+    def request(self, method, path, body = None):
+        """(status, JSON response)"""
+        conn = httplib.HTTPConnection(*self.server.server_address)
+        try:
+            if body is not None and not isinstance(body, str):
+                body = json.dumps(body)
+            conn.request(method, path, body)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    def result(self, version, rnd = 1, tp = 1):
+        pA, pB = self.t.pairings[0][1]
+        return {"round": rnd, "version": version, "a": [tp, 3, 20, pA.factions[0]],
+                "b": [1 - tp, 1, 5]}
+
+    def test_round(self):
+        status, data = self.request("GET", "/round")
+        self.assertEqual(status, 200)
+        self.assertEqual(data["round"], 1)
+        self.assertEqual([table["table"] for table in data["tables"]], [1, 2, 3, 4])
+        self.assertEqual(self.request("GET", "/tables/9")[0], 404)
+
+    def test_submit(self):
+        self.assertEqual(self.request("POST", "/tables/1", self.result(0)),
+                         (200, {"table": 1, "version": 1}))
+        pA, pB = self.t.pairings[0][1]
+        self.assertEqual(pA.result(0), (1, 3, 20, pB.factions[0]))
+        self.assertEqual(self.recorded, [(0, 1)])
+        status, data = self.request("GET", "/tables/1")
+        self.assertEqual((data["version"], data["a"]["result"]),
+                         (1, [1, 3, 20, pA.factions[0]]))
+
+        # a station which did not see the result can't overwrite it
+        status, data = self.request("POST", "/tables/1", self.result(0, tp = 0))
+        self.assertEqual(status, 409)
+        self.assertEqual(pA.tp, 1)
+        self.assertEqual(self.request("POST", "/tables/1", self.result(1, tp = 0))[0], 200)
+        self.assertEqual(pA.tp, 0)
+
+    def test_stale_round(self):
+        status, data = self.request("POST", "/tables/1", self.result(0, rnd = 2))
+        self.assertEqual((status, data["round"]), (409, 1))
+        self.assertEqual(self.recorded, [])
+
+    def test_invalid(self):
+        result = self.result(0)
+        result["a"][3] = u"Nobody plays this"
+        bad = [result, dict(self.result(0), a = [1, -3, 20]),
+               dict(self.result(0), b = "1 0 0"), {"round": 1}, "not json"]
+        for body in bad:
+            self.assertEqual(self.request("POST", "/tables/1", body)[0], 400, body)
+        self.assertEqual(self.request("POST", "/tables/7", self.result(0))[0], 404)
+        self.assertFalse(self.t.pairings[0][1][0].has_result(0))
+
+    def test_player_without_factions(self):
+        p = Player(u"P", [u""])
+        self.assertEqual(result_server._parse_result([1, 2, 3], p), (1, 2, 3, u""))
+
+
+if __name__ == "__main__":
+    unittest.main()
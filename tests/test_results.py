@@ -0,0 +1,72 @@
+import unittest
+
+import results
+from controller import Player
+from tests.helpers import tournament, play
+
+
+def totals(store):
+    return [list(getattr(store, name)) for name in ("tp", "cp", "kp", "sos")]
+
+
+class ResultStoreTest(unittest.TestCase):
+    def test_running_totals(self):
+        t = tournament(31, seed = 2)
+        play(t, 4)
+        # overwrite a result of the current round
+        table = sorted(t.pairings[3])[0]
+        t.record_result(table, (0, 0, 0, u"Cryx"), (1, 5, 50, u"Cryx"))
+        expected = totals(t.results)
+        t.results.recompute_totals()
+        self.assertEqual(totals(t.results), expected)
+
+    def test_prefix(self):
+        t = tournament(31, seed = 2)
+        play(t, 4)
+        for rnd in range(3):
+            store = t.results.prefix(rnd + 1)
+            self.assertEqual(len(store.rounds), rnd + 1)
+            for name in ("tp", "sos", "cp", "kp"):
+                self.assertEqual(list(getattr(store, name)),
+                                 list(t.snapshots[rnd].totals[name]))
+
+    def test_player_view(self):
+        t = tournament(4, seed = 2)
+        t.create_pairings()
+        table = sorted(t.pairings[0])[0]
+        pA, pB = t.pairings[0][table]
+        self.assertFalse(pA.has_result(0))
+        t.record_result(table, (1, 3, 40, u"Cryx"), (0, 2, 10, u"Khador"))
+        self.assertTrue(pA.has_result(0))
+        self.assertEqual(pA.result(0), (1, 3, 40, u"Khador"))
+        self.assertEqual(pB.result(0), (0, 2, 10, u"Cryx"))
+        self.assertEqual((pA.opponents_played, pA.tables_played, pA.factions_played),
+                         ([pB], [table], [u"Khador"]))
+        self.assertEqual((pA.tp, pA.cp, pA.kp, pA.sos), (1, 3, 40, 0))
+        self.assertEqual(pB.sos, 1)
+        self.assertFalse(hasattr(pA, "__dict__"))
+
+    def test_late_players(self):
+        store = results.ResultStore()
+        store.add_players([Player(u"A", "Cryx"), Player(u"B", "Cryx")])
+        store.add_round()
+        store.add_game(0, 0, 1, 1)
+        store.set_result(0, 0, 1, 2, 3, u"Cryx")
+        p = Player(u"C", "Cryx")
+        store.add_player(p)
+        self.assertEqual(p.index, 2)
+        self.assertEqual(p.opponents_played, [None])
+        self.assertEqual(store.rounds[0]["state"][2], results.NOT_PAIRED)
+        self.assertEqual(totals(store), [[1, 0, 0], [2, 0, 0], [3, 0, 0], [0, 1, 0]])
+
+    def test_factions(self):
+        store = results.ResultStore()
+        self.assertEqual(store.faction_id(None), -1)
+        self.assertEqual(store.faction_name(-1), None)
+        fid = store.faction_id(u"Cryx")
+        self.assertEqual(store.faction_id(u"Cryx"), fid)
+        self.assertEqual(store.faction_name(fid), u"Cryx")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import unittest
+
+import season
+from tests.helpers import FilesTestCase, tournament, play
+
+
+def event(seed, players = 10, rename = None):
+    """Three rounds on the same synthetic field, player 1 renamed to `rename`."""
+    t = tournament(players, seed = seed)
+    if rename:
+        t.players["1"].name = rename
+    play(t, 3, seed)
+    return t
+
+
+def ranking(s):
+    return sorted((r["name"], round(r["points"], 6), r["tp"], r["events"],
+                   r["games"], r["wins"], r["best_rank"]) for r in s.standings())
+
+
+class SeasonTest(FilesTestCase):
+    def setUp(self):
+        FilesTestCase.setUp(self)
+        self.opened = []
+        self.season = self.open("season.sqlite")
+
+    def tearDown(self):
+        for s in self.opened:
+            s.close()
+        FilesTestCase.tearDown(self)
+
+    def open(self, name):
+        s = season.Season(os.path.join(self.dir, name))
+        self.opened.append(s)
+        return s
+
+    def test_totals(self):
+        events = [event(seed) for seed in range(4)]
+        for i, t in enumerate(events):
+            self.season.add_tournament(t, u"E%d" % i)
+        self.season.remove_event(u"E1")
+        # the same as adding only the remaining events
+        rebuilt = self.open("rebuilt.sqlite")
+        for i, t in enumerate(events):
+            if i != 1:
+                rebuilt.add_tournament(t, u"E%d" % i)
+        self.assertEqual(ranking(self.season), ranking(rebuilt))
+        self.assertEqual(sorted(self.season.factions()), sorted(rebuilt.factions()))
+        self.assertEqual([e["name"] for e in self.season.events()], [u"E0", u"E2", u"E3"])
+        self.assertRaises(season.UnknownEvent, self.season.remove_event, u"E1")
+
+    def test_entries(self):
+        t = event(1)
+        self.season.add_tournament(t, u"E")
+        p, key = t.standings()[0]
+        entry, = self.season.player(p.name)
+        self.assertEqual((entry["event"], entry["rank"], entry["points"], entry["tp"]),
+                         (u"E", 1, 100.0, p.tp))
+        self.assertEqual(entry["games"], 3)
+        self.assertEqual(self.season.player(u"Nobody"), [])
+        self.assertEqual(sum(f["games"] for f in self.season.factions()), 30)
+
+    def test_standings(self):
+        for seed in range(3):
+            self.season.add_tournament(event(seed, players = 8 + seed), u"E%d" % seed)
+        rows = self.season.standings()
+        keys = [(r["points"], r["tp"], r["sos"]) for r in rows]
+        self.assertEqual(keys, sorted(keys, reverse = True))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(self.season.standings(top = 3), rows[:3])
+        self.assertEqual(sorted(r["name"] for r in self.season.standings(min_events = 3)),
+                         sorted(u"Player %d" % i for i in range(1, 9)))
+
+    def test_duplicate_event(self):
+        self.season.add_tournament(event(1), u"E")
+        self.assertRaises(season.DuplicateEvent, self.season.add_tournament,
+                          event(2), u"E")
+
+    def test_identity(self):
+        self.assertEqual(season.identity(u"  Jan  Nov\xe1k ", u"CZ"),
+                         season.identity(u"jan novak", u"cz"))
+        self.assertNotEqual(season.identity(u"Jan", u"CZ"), season.identity(u"Jan"))
+        t = event(1)
+        t.players["2"].name = u"player 1 "
+        self.assertRaises(season.IdentityConflict, self.season.add_tournament, t, u"E")
+        self.assertEqual(self.season.events(), [])
+
+    def test_alias(self):
+        self.season.add_tournament(event(1), u"A")
+        self.season.add_tournament(event(2, rename = u"Plaeyr 1"), u"B")
+        self.assertEqual(len(self.season.standings()), 11)
+        self.season.alias(u"Plaeyr 1", u"", u"Player 1", u"")
+        rows = self.season.standings()
+        self.assertEqual(len(rows), 10)
+        row, = [r for r in rows if r["name"] == u"Player 1"]
+        self.assertEqual((row["events"], row["games"]), (2, 6))
+        self.assertEqual(len(self.season.player(u"Plaeyr 1")), 2)
+        # events added later follow the alias
+        self.season.add_tournament(event(3, rename = u"Plaeyr 1"), u"C")
+        row, = [r for r in self.season.standings() if r["name"] == u"Player 1"]
+        self.assertEqual((row["events"], row["games"]), (3, 9))
+
+    def test_alias_same_event(self):
+        self.season.add_tournament(event(1), u"A")
+        self.assertRaises(season.IdentityConflict, self.season.alias,
+                          u"Player 2", u"", u"Player 1", u"")
+
+    def test_field_points(self):
+        self.assertEqual([season.field_points(rank, 4) for rank in range(1, 5)],
+                         [100.0, 75.0, 50.0, 25.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
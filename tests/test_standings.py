@@ -0,0 +1,69 @@
+import random
+import unittest
+
+import standings
+from controller import Player, Tournament
+from tests.helpers import tournament, play
+
+
+class StandingsTest(unittest.TestCase):
+    def test_order(self):
+        t = tournament(21, seed = 2, tiebreakers = ("tp", "sos", "osos", "kp"))
+        play(t, 4)
+        # the same as sorting the player objects one by one
+        osos = dict((p.uid, sum(o.sos for o in p.opponents_played if o is not None))
+                    for p in t.players.values())
+        expected = sorted(t.results.players, key = lambda p:
+                          ((p.tp, p.sos, osos[p.uid], p.kp), -p.index), reverse = True)
+        self.assertEqual([(p.uid, key) for p, key in t.standings()],
+                         [(p.uid, (p.tp, p.sos, osos[p.uid], p.kp)) for p in expected])
+
+    def test_random_ties(self):
+        t = tournament(8, tiebreakers = ())
+        ordered = [p.uid for p, key in t.standings(rng = random.Random(1))]
+        self.assertEqual(sorted(ordered), sorted(t.players))
+        self.assertNotEqual(ordered, [p.uid for p, key in t.standings()])
+        self.assertEqual([p.uid for p, key in t.standings(rng = random.Random(1))],
+                         ordered)
+
+    def head_to_head(self, h2h):
+        """Two players equal in CP, the second one won their game."""
+        t = Tournament([Player(u"A", [u"Cryx"], uid = "a"),
+                        Player(u"B", [u"Cryx"], uid = "b")],
+                       tiebreakers = ("cp",), h2h = h2h)
+        t.create_pairings()
+        table, (pA, pB) = t.pairings[0].items()[0]
+        if pA.uid == "a":
+            t.record_result(table, (0, 2, 0, u"Cryx"), (1, 2, 0, u"Cryx"))
+        else:
+            t.record_result(table, (1, 2, 0, u"Cryx"), (0, 2, 0, u"Cryx"))
+        return t
+
+    def test_head_to_head(self):
+        t = self.head_to_head(True)
+        a, b = t.players["a"], t.players["b"]
+        self.assertEqual((standings.head_to_head(t.results, b.index, a.index),
+                          standings.head_to_head(t.results, a.index, b.index)), (1, -1))
+        self.assertEqual([p.uid for p, key in t.standings()], ["b", "a"])
+        self.assertEqual([p.uid for p, key in self.head_to_head(False).standings()],
+                         ["a", "b"])
+
+    def test_snapshot(self):
+        t = tournament(15, seed = 3, h2h = True)
+        play(t, 3)
+        expected = [(p.uid, key) for p, key in t.standings()]
+        player = t.players["5"]
+        totals = [player.tp, player.sos, player.cp, player.kp]
+        # closed by pairing the next round
+        self.assertEqual(len(t.snapshots), 2)
+        t.create_pairings()
+        snapshot = t.snapshots[2]
+        self.assertEqual(len(snapshot), 15)
+        self.assertEqual([(p.uid, key) for p, key in snapshot.rows(t.results.players)],
+                         expected)
+        self.assertEqual([snapshot.total(name, player) for name in standings.Snapshot.TOTALS],
+                         totals)
+
+
+if __name__ == "__main__":
+    unittest.main()
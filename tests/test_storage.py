@@ -0,0 +1,145 @@
+import json
+import os
+import sqlite3
+import StringIO
+import sys
+import unittest
+
+import storage
+from tests.helpers import FilesTestCase, tournament, play, standings, pairings
+
+
+# tables of the version 1 save files
+SCHEMA_V1 = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE players (idx INTEGER PRIMARY KEY, uid TEXT UNIQUE, name TEXT,
+    factions TEXT, team TEXT, country TEXT, is_playing INTEGER);
+CREATE TABLE rounds (rnd INTEGER PRIMARY KEY, bye INTEGER, table_repeats INTEGER);
+CREATE TABLE pairings (rnd INTEGER, table_no INTEGER, a INTEGER, b INTEGER,
+    PRIMARY KEY (rnd, table_no));
+CREATE TABLE results (rnd INTEGER, idx INTEGER, tp INTEGER, cp INTEGER,
+    kp INTEGER, faction TEXT, PRIMARY KEY (rnd, idx));
+CREATE TABLE fixed_tables (uid TEXT PRIMARY KEY, table_no INTEGER);
+"""
+
+SAVE_P = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "save.p")
+
+
+class StorageTest(FilesTestCase):
+    def setUp(self):
+        FilesTestCase.setUp(self)
+        self.fname = os.path.join(self.dir, "save.sqlite")
+
+    def test_round_trip(self):
+        t = tournament(25, seed = 2, bye_policy = "lowest", h2h = True)
+        play(t, 3)
+        t.set_fixed_table(t.players["3"], 7)
+        t.drop_player(t.players["4"])
+        t.create_pairings()
+        storage.save(t, self.fname)
+        loaded = storage.load(self.fname)
+        self.assertEqual(standings(loaded), standings(t))
+        self.assertEqual(pairings(loaded), pairings(t))
+        for name in storage.SETTINGS + ("fixed_tables", "table_repeats",
+                                        "current_round", "bye_counts"):
+            self.assertEqual(getattr(loaded, name), getattr(t, name), name)
+        self.assertFalse(loaded.players["4"].is_playing)
+        # saving again replaces the content
+        storage.save(loaded, self.fname)
+        self.assertEqual(standings(storage.load(self.fname)), standings(t))
+
+    def test_partial_reads(self):
+        t = tournament(10, seed = 2)
+        play(t, 2)
+        storage.save(t, self.fname)
+        f = storage.TournamentFile(self.fname)
+        try:
+            self.assertEqual(f.round_count(), 2)
+            self.assertEqual(f.meta()["seed"], 2)
+            self.assertEqual([row["uid"] for row in f.players()],
+                             [p.uid for p in t.results.players])
+            pairs, bye = f.round(1)
+            self.assertEqual(pairs, dict((table, (pA.index, pB.index))
+                                         for table, (pA, pB) in t.pairings[1].items()))
+            self.assertEqual(f.results(1)[0], t.results.players[0].result(1))
+        finally:
+            f.close()
+
+    def write_v1(self, t):
+        rows = storage.dump(t)
+        conn = sqlite3.connect(self.fname)
+        conn.executescript(SCHEMA_V1)
+        rows["meta"] = [(key, json.dumps(1) if key == "schema_version" else value)
+                        for key, value in rows["meta"]]
+        rows["players"] = [row[:7] for row in rows["players"]]
+        rows["rounds"] = [row[:3] for row in rows["rounds"]]
+        with conn:
+            for table in ("meta", "players", "rounds", "pairings", "results",
+                          "fixed_tables"):
+                if rows[table]:
+                    marks = ", ".join("?" * len(rows[table][0]))
+                    conn.executemany("INSERT INTO %s VALUES (%s)" % (table, marks),
+                                     rows[table])
+        conn.close()
+
+    def test_version_1(self):
+        t = tournament(20, seed = 2)
+        play(t, 3)
+        self.write_v1(t)
+        loaded = storage.load(self.fname)
+        self.assertEqual(standings(loaded), standings(t))
+        self.assertEqual(pairings(loaded), pairings(t))
+        self.assertEqual(loaded.round_tables, [10] * 3)
+        self.assertEqual(loaded.round_blocks, [1] * 3)
+        # upgraded in place when written
+        storage.save(loaded, self.fname)
+        f = storage.TournamentFile(self.fname)
+        try:
+            self.assertEqual(f.version, storage.SCHEMA_VERSION)
+        finally:
+            f.close()
+        self.assertEqual(pairings(storage.load(self.fname)), pairings(t))
+
+    def test_newer_version(self):
+        t = tournament(4)
+        storage.save(t, self.fname)
+        conn = sqlite3.connect(self.fname)
+        with conn:
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'schema_version'",
+                         (json.dumps(storage.SCHEMA_VERSION + 1),))
+        conn.close()
+        self.assertRaises(storage.UnsupportedSaveVersion, storage.load, self.fname)
+
+
+class PickleTest(FilesTestCase):
+    def test_import(self):
+        t = storage.import_pickle(SAVE_P)
+        self.assertEqual((len(t.players), len(t.pairings), t.tables), (9, 2, 4))
+        self.assertEqual([p.uid for p, key in t.standings()][:3], ["5", "2", "4"])
+        self.assertEqual([bye.uid for bye in t.byes], ["3", "8"])
+        self.assertEqual(t.players["3"].opponents_played[1].uid, "5")
+
+    def test_legacy_save_file(self):
+        self.assertRaises(storage.LegacySaveFile, storage.load, SAVE_P)
+
+    def test_foreign_globals(self):
+        fname = os.path.join(self.dir, "evil.p")
+        with open(fname, "wb") as f:
+            f.write("cos\nsystem\n(S'echo owned'\ntR.")
+        self.assertRaises(storage.LegacySaveFile, storage.import_pickle, fname)
+
+    def test_convert(self):
+        fname = os.path.join(self.dir, "save.sqlite")
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            self.assertEqual(storage.main(["convert", SAVE_P, fname]), 0)
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(standings(storage.load(fname)),
+                         standings(storage.import_pickle(SAVE_P)))
+
+
+if __name__ == "__main__":
+    unittest.main()
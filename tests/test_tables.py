@@ -0,0 +1,77 @@
+import itertools
+import random
+import unittest
+
+import tables
+from tests.helpers import tournament, play
+
+
+class FakePlayer(object):
+    def __init__(self, uid, tables_played = ()):
+        self.uid = uid
+        self.tables_played = list(tables_played)
+
+
+def pairs_of(played):
+    """Pairs of players who played on the tables `played` [(a's, b's)]."""
+    return [[FakePlayer(2 * i, a), FakePlayer(2 * i + 1, b)]
+            for i, (a, b) in enumerate(played)]
+
+
+class MinCostAssignmentTest(unittest.TestCase):
+    def test_brute_force(self):
+        rng = random.Random(1)
+        for case in range(200):
+            m = rng.randint(1, 6)
+            n = rng.randint(1, m)
+            costs = [dict((j, rng.randint(0, 5)) for j in range(m) if rng.random() < .6)
+                     for i in range(n)]
+            assigned = tables.min_cost_assignment(costs, m)
+            self.assertEqual(len(set(assigned)), n)
+            best = min(sum(row.get(j, 0) for row, j in zip(costs, columns))
+                       for columns in itertools.permutations(range(m), n))
+            self.assertEqual(sum(row.get(j, 0) for row, j in zip(costs, assigned)),
+                             best, (costs, assigned))
+
+
+class AssignTablesTest(unittest.TestCase):
+    def test_no_repeats_when_possible(self):
+        # every pair played on all the tables but one, a different one each
+        played = [([t for t in range(1, 5) if t != k], []) for k in range(1, 5)]
+        assigned, repeats = tables.assign_tables(pairs_of(played), 4)
+        self.assertEqual(assigned, [1, 2, 3, 4])
+        self.assertEqual(repeats, 0)
+
+    def test_repeats_counted(self):
+        played = [([1], [1]), ([1], [])]
+        assigned, repeats = tables.assign_tables(pairs_of(played), 2)
+        self.assertEqual(sorted(assigned), [1, 2])
+        self.assertEqual(repeats, 1)
+
+    def test_fixed(self):
+        pairs = pairs_of([([], [])] * 3)
+        fixed = {1: 3, 4: 3, 5: 1}
+        assigned, repeats = tables.assign_tables(pairs, 5, fixed)
+        # the first one asking for table 3 gets it
+        self.assertEqual(assigned[0], 3)
+        self.assertEqual(assigned[2], 1)
+        self.assertEqual(len(set(assigned)), 3)
+
+    def test_blocks(self):
+        played = [([1], []), ([2], []), ([], []), ([], [])]
+        assigned, repeats = tables.assign_blocks(pairs_of(played), 2, 4)
+        # the first match played on block 0, so the matches swap the blocks
+        self.assertEqual(sorted(assigned[:2]), [3, 4])
+        self.assertEqual(sorted(assigned[2:]), [1, 2])
+        self.assertEqual(repeats, 0)
+
+    def test_tournament(self):
+        t = tournament(600, seed = 2)
+        play(t, 5)
+        self.assertEqual(t.table_repeats, [0] * 5)
+        for pairs in t.pairings:
+            self.assertEqual(sorted(pairs), range(1, 301))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import unittest
+
+import journal
+import storage
+import teams
+from controller import Player
+from tests.helpers import FilesTestCase, tournament, play
+
+
+def field(count, size, first = 0):
+    """`count` teams of `size` players."""
+    return [Player(u"P%d_%d" % (k, m), ["Cryx"], team = u"Team %d" % k,
+                   uid = k * size + m)
+            for k in range(first, first + count) for m in range(size)]
+
+
+def play_round(tt, winners):
+    """Record the round, team A wins the games of the blocks in `winners`."""
+    t = tt.tournament
+    matches, bye = tt.create_pairings()
+    for table in sorted(t.pairings[t.current_round]):
+        won = (table - 1) / tt.size in winners
+        tt.record_result(table, (int(won), 1, 10, u"Cryx"),
+                         (int(not won), 0, 5, u"Cryx"))
+    return matches, bye
+
+
+def state(tt):
+    return ([(team.name, key) for team, key in tt.standings()],
+            [team and team.name for team in tt.byes],
+            [dict((block, (a.name, b.name)) for block, (a, b) in matches.items())
+             for matches in tt.matches])
+
+
+class TeamTest(unittest.TestCase):
+    def test_match_points(self):
+        t = tournament(0, seed = 2)
+        t.add_players(field(4, 3))
+        tt = teams.TeamTournament(t, 3)
+        matches, bye = play_round(tt, [0])
+        self.assertEqual(bye, None)
+        (winner, loser), (a, b) = matches[0], matches[1]
+        self.assertEqual((tt.mp[winner.index], tt.games[winner.index]), (teams.WIN, 3))
+        self.assertEqual((tt.mp[loser.index], tt.games[loser.index]), (teams.LOSS, 0))
+        self.assertEqual(tt.mp[b.index], teams.WIN)
+
+        # a draw, and the match counts only once all its games are reported
+        tt.create_pairings()
+        rnd = t.current_round
+        block, (a, b) = sorted(tt.matches[rnd].items())[0]
+        tables = range(block * 3 + 1, block * 3 + 4)
+        tt.record_result(tables[0], (1, 0, 0, u"Cryx"), (0, 0, 0, u"Cryx"))
+        tt.record_result(tables[1], (0, 0, 0, u"Cryx"), (1, 0, 0, u"Cryx"))
+        self.assertEqual(tt.rounds[rnd]["mp"][a.index], 0)
+        tt.record_result(tables[2], (0, 0, 0, u"Cryx"), (0, 0, 0, u"Cryx"))
+        self.assertEqual((tt.rounds[rnd]["mp"][a.index], tt.rounds[rnd]["mp"][b.index]),
+                         (teams.DRAW, teams.DRAW))
+
+    def test_bye(self):
+        t = tournament(0, seed = 2)
+        t.add_players(field(5, 3))
+        tt = teams.TeamTournament(t, 3)
+        byes = []
+        for rnd in range(3):
+            matches, bye = play_round(tt, [0])
+            self.assertEqual(t.team_byes[rnd], bye.name)
+            self.assertEqual(tt.rounds[rnd]["mp"][bye.index], teams.WIN)
+            byes.append(bye)
+        self.assertEqual(len(set(byes)), 3)
+        self.assertEqual(state(teams.TeamTournament(t, 3)), state(tt))
+
+    def test_late_team_has_no_bye(self):
+        # a team registered late is credited for the missed round, not a bye
+        t = tournament(0, seed = 2, late_join = (1, 0, 0))
+        t.add_players(field(4, 3))
+        tt = teams.TeamTournament(t, 3)
+        play_round(tt, [0])
+        t.add_players(field(2, 3, first = 4))
+        tt = teams.TeamTournament(t, 3)
+        late = tt.teams[tt.team_ids["team 4"]]
+        self.assertEqual(tt.byes, [None])
+        self.assertEqual(tt.mp[late.index], 0)
+
+    def test_individual_rounds_first(self):
+        t = tournament(0, seed = 2)
+        t.add_players(field(4, 3))
+        play(t, 2)
+        tt = teams.TeamTournament(t, 3)
+        self.assertEqual(tt.matches, [{}, {}])
+        self.assertEqual([team.name for team in tt.teams],
+                         [u"Team %d" % k for k in range(4)])
+        play_round(tt, [0, 1])
+        self.assertEqual(len(tt.matches[2]), 2)
+        self.assertEqual(state(teams.TeamTournament(t, 3)), state(tt))
+
+
+class TeamFilesTest(FilesTestCase):
+    def test_storage_and_journal(self):
+        save = os.path.join(self.dir, "save")
+        j = journal.Journal(save, compact_every = 0)
+        t = j.open(seed = 2)
+        t.add_players(field(5, 3))
+        play(t, 1)
+        tt = teams.TeamTournament(t, 3)
+        for rnd in range(3):
+            play_round(tt, [rnd % 2])
+        expected = state(tt)
+        j.close()
+
+        t = journal.Journal(save).open()
+        self.assertEqual(state(teams.TeamTournament(t, 3)), expected)
+        fname = os.path.join(self.dir, "copy.sqlite")
+        storage.save(t, fname)
+        t = storage.load(fname)
+        self.assertEqual(state(teams.TeamTournament(t, 3)), expected)
+        self.assertEqual(t.round_blocks, [1, 3, 3, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()